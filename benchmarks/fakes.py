@@ -0,0 +1,319 @@
+"""
+Local stand-ins for Discord and Gemini used by the offline benchmarks
+Fake client/guild/channel/message objects with synthetic history and
+configurable latency, plus a scripted ADK model emitting text and tool calls
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import AsyncGenerator, Dict, List, Optional
+
+import discord
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import types
+
+# Stage name -> list of latencies in seconds, filled by the fakes and the harness
+StageTimings = Dict[str, List[float]]
+
+_ids = itertools.count(1)
+_stall_rng = random.Random(0)
+
+
+def record(timings: Optional[StageTimings], stage: str, started: float) -> None:
+    if timings is not None:
+        timings.setdefault(stage, []).append(time.perf_counter() - started)
+
+
+class FakeUser:
+    def __init__(self, user_id: int, name: str, bot: bool = False):
+        self.id = user_id
+        self.display_name = name
+        self.name = name
+        self.bot = bot
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.id}>"
+
+    def mentioned_in(self, message) -> bool:
+        return self.mention in message.content
+
+    def __eq__(self, other) -> bool:
+        return getattr(other, "id", None) == self.id
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+
+class FakeMessage:
+    def __init__(self, author, channel, content: str, created_at: datetime):
+        self.id = discord.utils.time_snowflake(created_at) + next(_ids) % 4096
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.content = content
+        self.created_at = created_at
+
+    async def edit(self, content: str) -> "FakeMessage":
+        started = time.perf_counter()
+        await self.channel.write_slot()
+        await asyncio.sleep(self.channel.write_latency)
+        self.content = content
+        record(self.channel.timings, "discord_edit", started)
+        return self
+
+
+class FakeChannel:
+    """
+    Text channel with synthetic history served page by page. With a write
+    limit, sends and edits past `write_limit` per `write_window` seconds
+    wait like discord.py does when it hits the channel's rate limit.
+    """
+
+    def __init__(
+        self,
+        channel_id: int,
+        name: str,
+        guild,
+        page_latency: float,
+        write_latency: float,
+        timings: Optional[StageTimings] = None,
+        write_limit: int = 0,
+        write_window: float = 5.0,
+    ):
+        self.id = channel_id
+        self.name = name
+        self.guild = guild
+        self.page_latency = page_latency
+        self.write_latency = write_latency
+        self.timings = timings
+        self.messages: List[FakeMessage] = []  # Oldest first
+        self.history_pages = 0
+        self.sent: List[FakeMessage] = []
+        self.write_limit = write_limit
+        self.write_window = write_window
+        self._writes: deque = deque()
+        self.rate_limited = 0
+
+    async def write_slot(self) -> None:
+        """Wait until the channel's rate limit allows another write"""
+        if not self.write_limit:
+            return
+        while True:
+            now = time.monotonic()
+            while self._writes and self._writes[0] <= now - self.write_window:
+                self._writes.popleft()
+            if len(self._writes) < self.write_limit:
+                self._writes.append(now)
+                return
+            self.rate_limited += 1
+            await asyncio.sleep(self._writes[0] + self.write_window - now)
+
+    def populate(self, authors: List[FakeUser], count: int, hours: float) -> None:
+        now = datetime.now(timezone.utc)
+        step = timedelta(hours=hours) / max(count, 1)
+        for i in range(count, 0, -1):
+            self.messages.append(
+                FakeMessage(
+                    random.choice(authors),
+                    self,
+                    f"message {i} in #{self.name} "
+                    + "lorem ipsum " * random.randint(1, 12),
+                    now - step * i,
+                )
+            )
+
+    def permissions_for(self, member):
+        return discord.Permissions(read_message_history=True)
+
+    async def history(self, limit=100, before=None, after=None, oldest_first=None):
+        def bound(value):
+            if value is None:
+                return None
+            if isinstance(value, datetime):
+                if value.tzinfo is None:
+                    value = value.astimezone()
+                return discord.utils.time_snowflake(value)
+            return value.id
+
+        low, high = bound(after), bound(before)
+        if oldest_first is None:
+            oldest_first = after is not None
+        selected = [
+            m
+            for m in self.messages
+            if (low is None or m.id > low) and (high is None or m.id < high)
+        ]
+        if not oldest_first:
+            selected.reverse()
+        if limit is not None:
+            selected = selected[:limit]
+
+        for index, message in enumerate(selected):
+            if index % 100 == 0:
+                # Discord returns history in pages of 100
+                started = time.perf_counter()
+                await asyncio.sleep(self.page_latency)
+                self.history_pages += 1
+                record(self.timings, "discord_history_page", started)
+            yield message
+
+    async def send(self, content: str) -> FakeMessage:
+        started = time.perf_counter()
+        await self.write_slot()
+        await asyncio.sleep(self.write_latency)
+        message = FakeMessage(self.guild.me, self, content, datetime.now(timezone.utc))
+        self.sent.append(message)
+        record(self.timings, "discord_send", started)
+        return message
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int, me: FakeUser):
+        self.id = guild_id
+        self.me = me
+        self.text_channels: List[FakeChannel] = []
+
+
+class FakeClient:
+    """Just enough of discord.Client for the tools"""
+
+    def __init__(self, guilds: List[FakeGuild], user: FakeUser):
+        self.guilds = guilds
+        self.user = user
+
+    def get_channel(self, channel_id: int):
+        for guild in self.guilds:
+            for channel in guild.text_channels:
+                if channel.id == channel_id:
+                    return channel
+        return None
+
+
+def build_guild(
+    channels: int,
+    messages_per_channel: int,
+    hours: float,
+    authors: List[FakeUser],
+    bot_user: FakeUser,
+    page_latency: float,
+    write_latency: float,
+    timings: Optional[StageTimings] = None,
+    write_limit: int = 0,
+) -> FakeGuild:
+    guild = FakeGuild(1, bot_user)
+    for index in range(channels):
+        channel = FakeChannel(
+            1000 + index,
+            f"channel-{index}",
+            guild,
+            page_latency=page_latency,
+            write_latency=write_latency,
+            timings=timings,
+            write_limit=write_limit,
+        )
+        channel.populate(authors, messages_per_channel, hours)
+        guild.text_channels.append(channel)
+    return guild
+
+
+class ScriptedLlm(BaseLlm):
+    """
+    Deterministic stand-in for Gemini.
+
+    Prompts mentioning "cherche"/"search" trigger a search_user_messages call,
+    prompts mentioning "compare" one search per user plus a get_time_ago call
+    in the same response, prompts mentioning "heure"/"time" a get_current_time
+    call; everything else (and every tool result) gets a plain text answer,
+    streamed in chunks when the runner asks for SSE.
+    """
+
+    first_token_latency: float = 0.3
+    chunk_latency: float = 0.02
+    answer_chunks: int = 8
+    search_user_ids: List[str] = []
+    # Share of calls stalling for stall_latency before answering
+    stall_rate: float = 0.0
+    stall_latency: float = 30.0
+    calls: int = 0
+    stalls: int = 0
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        self.calls += 1
+        if self.stall_rate and _stall_rng.random() < self.stall_rate:
+            self.stalls += 1
+            await asyncio.sleep(self.stall_latency)
+        await asyncio.sleep(self.first_token_latency)
+
+        last = llm_request.contents[-1] if llm_request.contents else None
+        parts = last.parts if last and last.parts else []
+        prompt = " ".join(part.text for part in parts if part.text).lower()
+        answered_tool = any(part.function_response for part in parts)
+
+        if not answered_tool and ("compare" in prompt):
+            # One search per person plus a time lookup, in a single response
+            yield self._calls(
+                [
+                    (
+                        "search_user_messages",
+                        {"user_ids": [user_id], "channel_id": "", "hours_back": 48},
+                    )
+                    for user_id in self.search_user_ids
+                ]
+                + [("get_time_ago", {"hours": 48})]
+            )
+            return
+        if not answered_tool and ("cherche" in prompt or "search" in prompt):
+            yield self._call(
+                "search_user_messages",
+                {"user_ids": self.search_user_ids, "channel_id": "", "hours_back": 48},
+            )
+            return
+        if not answered_tool and ("heure" in prompt or "time" in prompt):
+            yield self._call("get_current_time", {})
+            return
+
+        chunks = [
+            f"Voici un morceau de reponse numero {i}. "
+            for i in range(self.answer_chunks)
+        ]
+        if stream:
+            for chunk in chunks:
+                yield LlmResponse(
+                    content=types.Content(role="model", parts=[types.Part(text=chunk)]),
+                    partial=True,
+                )
+                await asyncio.sleep(self.chunk_latency)
+        else:
+            await asyncio.sleep(self.chunk_latency * len(chunks))
+        yield LlmResponse(
+            content=types.Content(
+                role="model", parts=[types.Part(text="".join(chunks))]
+            ),
+            turn_complete=True,
+        )
+
+    @staticmethod
+    def _call(name: str, args: dict) -> LlmResponse:
+        return ScriptedLlm._calls([(name, args)])
+
+    @staticmethod
+    def _calls(calls: List[tuple]) -> LlmResponse:
+        return LlmResponse(
+            content=types.Content(
+                role="model",
+                parts=[
+                    types.Part(function_call=types.FunctionCall(name=name, args=args))
+                    for name, args in calls
+                ],
+            ),
+            turn_complete=True,
+        )
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Memory footprint benchmark of the bot under sustained traffic
+Starts a fresh interpreter per mode ("default", and "low" with LOW_MEMORY)
+that drives src/bot.py's on_message with fake Discord objects and a scripted
+model: rounds of mentions from users never seen before, each followed by the
+periodic session cleanup. Prints RSS, traced Python memory and the cache sizes
+after every round (memory should level off once the caches are full) and the
+per-subsystem breakdown of the last round.
+
+Run with: python -m benchmarks.footprint --rounds 8 --requests 300
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+MODES = {"default": {}, "low": {"LOW_MEMORY": "true"}}
+
+PROMPTS = [
+    "donne moi un conseil pour mes revisions de {topic} ({n})",
+    "comment m'organiser pour le projet {topic} ? ({n})",
+    "tu peux me resumer {topic} en deux phrases ({n})",
+]
+TOPICS = ["maths", "physique", "histoire", "anglais", "code", "sport"]
+
+
+async def child(rounds: int, requests: int, concurrency: int) -> dict:
+    from benchmarks.fakes import (
+        FakeClient,
+        FakeMessage,
+        FakeUser,
+        ScriptedLlm,
+        build_guild,
+    )
+    from src import bot, footprint
+    from src.agent import agent as agent_module
+    from src.agent.tools import tools
+
+    bot_user = FakeUser(999, "advisor", bot=True)
+    guild = build_guild(
+        4, 200, 24, [FakeUser(1, "seed")], bot_user, page_latency=0.0, write_latency=0.0
+    )
+    bot.client._connection.user = bot_user
+    tools.set_discord_client(FakeClient([guild], bot_user))
+    agent_module.advisory_agent.model = ScriptedLlm(
+        model="scripted", first_token_latency=0.0, chunk_latency=0.0
+    )
+    agent = await bot._get_agent()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_request(index):
+        author = FakeUser(100_000 + index, f"user{index}")
+        channel = guild.text_channels[index % len(guild.text_channels)]
+        prompt = PROMPTS[index % len(PROMPTS)].format(
+            topic=TOPICS[index % len(TOPICS)], n=index
+        )
+        message = FakeMessage(
+            author,
+            channel,
+            f"{bot_user.mention} {prompt}",
+            datetime.now(timezone.utc),
+        )
+        async with semaphore:
+            await bot.on_message(message)
+
+    samples = []
+    started = time.perf_counter()
+    for round_index in range(rounds):
+        first = round_index * requests
+        await asyncio.gather(*(one_request(first + i) for i in range(requests)))
+        # What the periodic cleanup task does between rounds
+        await agent.cleanup_old_sessions()
+        gc.collect()
+        rss, peak = footprint.rss_bytes()
+        samples.append(
+            {
+                "requests": first + requests,
+                "rss_mb": rss / 2**20,
+                "traced_mb": tracemalloc.get_traced_memory()[0] / 2**20,
+                "sessions": agent.get_session_count(),
+                "response_cache": (
+                    agent.response_cache.stats()["entries"]
+                    if agent.response_cache is not None
+                    else 0
+                ),
+            }
+        )
+    subsystems = footprint.subsystem_sizes(tracemalloc.take_snapshot())
+    return {
+        "samples": samples,
+        "elapsed_s": time.perf_counter() - started,
+        "subsystems_mb": {
+            name: size / 2**20
+            for name, size in sorted(subsystems.items(), key=lambda item: -item[1])
+        },
+    }
+
+
+def run_child(mode: str, args) -> dict:
+    env = dict(
+        os.environ,
+        SESSION_STORE_PATH="",
+        MESSAGE_ARCHIVE_PATH="",
+        RESPONSE_CACHE_ENABLED="true",
+        USER_BURST="1000000",
+        CHANNEL_BURST="1000000",
+        FOOTPRINT_TRACE="true",
+        FOOTPRINT_LOG_INTERVAL="0",
+        LOG_LEVEL="ERROR",
+        **MODES[mode],
+    )
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.footprint", "--child"]
+        + ["--rounds", str(args.rounds), "--requests", str(args.requests)]
+        + ["--concurrency", str(args.concurrency)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=300, help="per round")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        result = asyncio.run(child(args.rounds, args.requests, args.concurrency))
+        print(json.dumps(result))
+        return
+
+    print(
+        f"📊 Footprint benchmark: {args.rounds} rounds of {args.requests} "
+        f"requests from new users"
+    )
+    for mode in MODES:
+        result = run_child(mode, args)
+        print(f"   {mode} ({result['elapsed_s']:.0f} s)")
+        print(
+            f"     {'requests':>8}{'rss MB':>9}{'traced MB':>11}"
+            f"{'sessions':>10}{'cached answers':>16}"
+        )
+        for sample in result["samples"]:
+            print(
+                f"     {sample['requests']:>8}{sample['rss_mb']:>9.1f}"
+                f"{sample['traced_mb']:>11.1f}{sample['sessions']:>10}"
+                f"{sample['response_cache']:>16}"
+            )
+        top = list(result["subsystems_mb"].items())[:6]
+        print(
+            "     traced by subsystem: "
+            + ", ".join(f"{name} {size:.1f} MB" for name, size in top)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the on_message -> agent turn -> Discord edit pipeline
+Drives src/bot.py's on_message against fake Discord objects and a scripted
+model (see benchmarks/fakes.py), so it needs neither GOOGLE_API_KEY nor a
+Discord connection. Reports throughput, per-stage latency percentiles and
+memory growth, and saves the results as JSON for comparison between commits.
+
+Run with: python -m benchmarks.pipeline --requests 200 --concurrency 20
+Compare:  python -m benchmarks.pipeline --compare benchmarks/results/<old>.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+# Keep the benchmark self-contained: no archive on disk unless asked for
+os.environ.setdefault("MESSAGE_ARCHIVE_PATH", "")
+os.environ.setdefault("SESSION_STORE_PATH", "")
+# Measure the pipeline itself rather than the per-user/channel rate limits
+os.environ.setdefault("USER_BURST", "1000000")
+os.environ.setdefault("CHANNEL_BURST", "1000000")
+
+from benchmarks.fakes import (  # noqa: E402
+    FakeClient,
+    FakeMessage,
+    FakeUser,
+    ScriptedLlm,
+    build_guild,
+    record,
+)
+
+PROMPTS = [
+    "salut",
+    "cherche les derniers messages de {name}",
+    "quelle heure il est ?",
+    "donne moi un conseil pour mes revisions",
+    "search what {name} said recently",
+]
+
+# Extra mentions when a request is split into a burst (--burst)
+FOLLOW_UPS = [
+    "et aussi",
+    "stp",
+    "c'est pour demain",
+    "merci d'avance",
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "mean_ms": statistics.fmean(values) * 1000 if values else 0.0,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def timed_tool(func, timings):
+    """Wrap an agent tool so its latency is recorded, keeping its signature"""
+
+    if asyncio.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                record(timings, f"tool_{func.__name__}", started)
+
+    else:
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(timings, f"tool_{func.__name__}", started)
+
+    return wrapper
+
+
+async def run_benchmark(args):
+    from src import bot, metrics
+    from src.agent import agent as agent_module
+    from src.agent.hedge import hedged
+    from src.agent.tools import tools
+
+    random.seed(args.seed)
+    timings = {}
+
+    bot_user = FakeUser(999, "advisor", bot=True)
+    authors = [FakeUser(10_000 + i, f"user{i}") for i in range(args.users)]
+    guild = build_guild(
+        args.channels,
+        args.history,
+        args.history_hours,
+        authors,
+        bot_user,
+        page_latency=args.page_latency,
+        write_latency=args.write_latency,
+        timings=timings,
+        write_limit=args.channel_write_limit,
+    )
+    fake_client = FakeClient([guild], bot_user)
+
+    # Point the bot and the tools at the fakes
+    bot.client._connection.user = bot_user
+    tools.set_discord_client(fake_client)
+    model = ScriptedLlm(
+        model="scripted",
+        first_token_latency=args.model_latency,
+        chunk_latency=args.chunk_latency,
+        search_user_ids=[str(authors[0].id), str(authors[1 % len(authors)].id)],
+        stall_rate=args.model_stall_rate,
+        stall_latency=args.model_stall,
+    )
+    # Hedged like the real model (unless MODEL_HEDGE_PERCENTILE=0)
+    agent_module.advisory_agent.model = hedged(model)
+    agent_module.advisory_agent.tools = [
+        timed_tool(tool, timings) for tool in agent_module.advisory_agent.tools
+    ]
+
+    discord_agent = agent_module.discord_agent
+    stream_advice = discord_agent.stream_advice
+
+    async def timed_stream_advice(user_id, message):
+        started = time.perf_counter()
+        first = True
+        async for chunk in stream_advice(user_id, message):
+            if first:
+                record(timings, "agent_first_chunk", started)
+                first = False
+            yield chunk
+        record(timings, "agent_turn", started)
+
+    discord_agent.stream_advice = timed_stream_advice
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one_request(index):
+        author = random.choice(authors)
+        channel = random.choice(guild.text_channels)
+        prompt = random.choice(PROMPTS).format(name=author.display_name)
+        async with semaphore:
+            started = time.perf_counter()
+            mentions = []
+            for part in range(args.burst):
+                if part:
+                    # The user adds to their question a moment later
+                    await asyncio.sleep(args.burst_gap)
+                    prompt = random.choice(FOLLOW_UPS)
+                message = FakeMessage(
+                    author,
+                    channel,
+                    f"{bot_user.mention} {prompt}",
+                    datetime.now(timezone.utc),
+                )
+                mentions.append(asyncio.create_task(bot.on_message(message)))
+            await asyncio.gather(*mentions)
+            record(timings, "on_message", started)
+
+    if args.trace_memory:
+        tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull if args.quiet else None):
+            await asyncio.gather(*(one_request(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    memory_after, memory_peak = tracemalloc.get_traced_memory()
+    if args.trace_memory:
+        tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    histograms = metrics.snapshot()["histograms"]
+    if "outbound.queue_delay" in histograms:
+        # Time writes waited in the outbound scheduler (bucketed estimate)
+        queue_stage = {"outbound_queue": histograms["outbound.queue_delay"]}
+    else:
+        queue_stage = {}
+    counters = metrics.snapshot()["counters"]
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": vars(args),
+        "elapsed_s": elapsed,
+        "throughput_rps": args.requests / elapsed,
+        "stages": {
+            **{name: summarize(values) for name, values in sorted(timings.items())},
+            **queue_stage,
+        },
+        "counters": {
+            "model_calls": model.calls,
+            "history_pages": sum(c.history_pages for c in guild.text_channels),
+            "discord_writes": sum(
+                len(timings.get(stage, []))
+                for stage in ("discord_send", "discord_edit")
+            ),
+            "sessions": discord_agent.get_session_count(),
+            "admission_queued": metrics.snapshot()["counters"].get(
+                "admission.queued", 0
+            ),
+            "coalesced_mentions": metrics.snapshot()["counters"].get(
+                "coalesce.merged", 0
+            ),
+            "model_stalls": model.stalls,
+            "model_hedges": counters.get("model.hedges", 0),
+            "hedge_wins": counters.get("model.hedge_wins", 0),
+            "turn_timeouts": counters.get("bot.turn_timeouts", 0),
+            "turns_reasked": counters.get("coalesce.stopped_reasked", 0),
+            "writes_saved": counters.get("outbound.writes_saved", 0),
+            "placeholders_skipped": counters.get("outbound.placeholders_skipped", 0),
+            "rate_limited_writes": sum(c.rate_limited for c in guild.text_channels),
+            "admission_rejected": sum(
+                value
+                for name, value in metrics.snapshot()["counters"].items()
+                if name.startswith("admission.rejected_")
+            ),
+        },
+        "memory": {
+            "traced_growth_kb": (memory_after - memory_before) / 1024,
+            "traced_peak_kb": memory_peak / 1024,
+            "max_rss_growth_kb": rss_after - rss_before,
+        },
+    }
+
+
+def print_report(results, baseline=None):
+    print(f"📊 Pipeline benchmark @ {results['commit']}")
+    print(
+        f"   {results['config']['requests']} requests, "
+        f"concurrency {results['config']['concurrency']}: "
+        f"{results['elapsed_s']:.2f}s, {results['throughput_rps']:.1f} req/s"
+    )
+    print("-" * 72)
+    print(f"{'stage':<28}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in results["stages"].items():
+        line = (
+            f"{name:<28}{stats['count']:>7}{stats['p50_ms']:>10.1f}"
+            f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}"
+        )
+        if baseline and name in baseline["stages"]:
+            old = baseline["stages"][name]["p95_ms"]
+            if old:
+                line += f"   p95 {(stats['p95_ms'] - old) / old:+.0%}"
+        print(line)
+    print("-" * 72)
+    for name, value in results["counters"].items():
+        print(f"{name:<28}{value:>7}")
+    memory = results["memory"]
+    print(
+        f"memory: +{memory['traced_growth_kb']:.0f} KB traced "
+        f"(peak {memory['traced_peak_kb']:.0f} KB), "
+        f"max RSS +{memory['max_rss_growth_kb']} KB"
+    )
+    if baseline:
+        delta = (results["throughput_rps"] - baseline["throughput_rps"]) / baseline[
+            "throughput_rps"
+        ]
+        print(f"throughput vs {baseline['commit']}: {delta:+.0%}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=30)
+    parser.add_argument("--channels", type=int, default=8)
+    parser.add_argument(
+        "--history", type=int, default=2000, help="messages per channel"
+    )
+    parser.add_argument("--history-hours", type=float, default=240)
+    parser.add_argument("--page-latency", type=float, default=0.08)
+    parser.add_argument("--write-latency", type=float, default=0.05)
+    parser.add_argument("--model-latency", type=float, default=0.3)
+    parser.add_argument("--chunk-latency", type=float, default=0.02)
+    parser.add_argument(
+        "--model-stall-rate",
+        type=float,
+        default=0.0,
+        help="share of model calls that stall (e.g. 0.05)",
+    )
+    parser.add_argument(
+        "--model-stall", type=float, default=60.0, help="seconds a stall lasts"
+    )
+    parser.add_argument(
+        "--channel-write-limit",
+        type=int,
+        default=0,
+        help="writes per 5 s per channel before Discord makes us wait (e.g. 5)",
+    )
+    parser.add_argument(
+        "--burst", type=int, default=1, help="mentions per request, sent in a row"
+    )
+    parser.add_argument(
+        "--burst-gap", type=float, default=0.5, help="seconds between them"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", help="JSON output path (default: benchmarks/results/)"
+    )
+    parser.add_argument("--compare", help="previous JSON results to compare against")
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="track allocations with tracemalloc (slows everything down)",
+    )
+    parser.add_argument(
+        "--verbose", dest="quiet", action="store_false", help="keep bot/agent output"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.quiet:
+        logging.getLogger("google_adk").setLevel(logging.ERROR)
+    results = asyncio.run(run_benchmark(args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    output = args.output or os.path.join(
+        "benchmarks",
+        "results",
+        f"pipeline-{results['commit']}-{datetime.now():%Y%m%d-%H%M%S}.json",
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
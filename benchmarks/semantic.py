@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the semantic message index
+Writes a synthetic archive (random chatter plus a few planted messages about
+one topic) straight into index files, then measures topic query latency with
+and without author/channel/time pre-filters, batched queries, and whether the
+planted messages come out on top.
+
+Run with: python -m benchmarks.semantic --messages 1000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from src.agent.tools.semantic import META_DTYPE, SEMANTIC_DIM, SemanticIndex, embed
+
+WORDS = (
+    "salut ca va quoi demain soir cours prof maths physique pizza film serie "
+    "match foot jeu valorant minecraft train bus retard pluie soleil vacances "
+    "musique concert week end boulot stage projet code bug serveur discord "
+    "manger dormir sortir ciné resto anniversaire cadeau voiture permis velo"
+).split()
+PLANTED = [
+    "qui vient au tournoi d'echecs samedi ?",
+    "le tournoi d'échecs est reporté",
+    "j'ai perdu en finale du tournoi d echecs",
+    "inscriptions ouvertes pour le tournoi d'echecs du club",
+]
+QUERY = "tournoi d'échecs"
+
+
+def chatter(rng: random.Random) -> str:
+    return " ".join(rng.choices(WORDS, k=rng.randint(3, 20)))
+
+
+def write_archive(prefix: str, count: int, users: int, channels: int, planted: int):
+    """Index files for `count` messages over the last year"""
+    rng = random.Random(0)
+    np_rng = np.random.default_rng(0)
+    # Embedding is ~50 us per message: embed a pool and reuse its rows
+    pool = embed([chatter(rng) for _ in range(min(count, 20000))])
+    needles = embed(PLANTED)
+    now = time.time()
+    needle_rows = set(rng.sample(range(count), planted))
+
+    with open(f"{prefix}.vec{SEMANTIC_DIM}", "wb") as vectors_file, open(
+        f"{prefix}.vec{SEMANTIC_DIM}.meta", "wb"
+    ) as meta_file:
+        for start in range(0, count, 100000):
+            size = min(100000, count - start)
+            vectors = pool[np_rng.integers(0, len(pool), size)]
+            for row in needle_rows:
+                if start <= row < start + size:
+                    vectors[row - start] = needles[row % len(needles)]
+            meta = np.zeros(size, dtype=META_DTYPE)
+            meta["message_id"] = np.arange(start, start + size)
+            meta["author_id"] = np_rng.integers(0, users, size)
+            meta["channel_id"] = np_rng.integers(0, channels, size)
+            meta["created_at"] = np.sort(now - np_rng.random(size) * 365 * 86400)
+            vectors_file.write(vectors.tobytes())
+            meta_file.write(meta.tobytes())
+    return needle_rows
+
+
+def measure(index: SemanticIndex, repeats: int, queries=(QUERY,), **filters):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        results = index.search(list(queries), k=10, **filters)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--channels", type=int, default=20)
+    parser.add_argument("--planted", type=int, default=40)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    sample = [chatter(random.Random(1)) for _ in range(5000)]
+    started = time.perf_counter()
+    embed(sample)
+    embed_us = (time.perf_counter() - started) / len(sample) * 1e6
+
+    with tempfile.TemporaryDirectory() as directory:
+        prefix = os.path.join(directory, "messages")
+        needles = write_archive(
+            prefix, args.messages, args.users, args.channels, args.planted
+        )
+        index = SemanticIndex(prefix)
+        size_mb = os.path.getsize(index.vectors_path) / 2**20
+        print(
+            f"{len(index)} messages, dim {index.dim}, {size_mb:.0f} MB of "
+            f"vectors, embedding {embed_us:.0f} us/message"
+        )
+        measure(index, 2)  # Warm the page cache
+
+        cases = [
+            ("no filter", {}),
+            ("one user", {"author_ids": [7]}),
+            ("one channel", {"channel_id": 3}),
+            ("last 24 h", {"since": time.time() - 86400}),
+            ("channel + 30 days", {"channel_id": 3, "since": time.time() - 30 * 86400}),
+        ]
+        print(f"{'query':<22}{'p50 ms':>9}{'max ms':>9}")
+        for name, filters in cases:
+            timings, results = measure(index, args.repeats, **filters)
+            print(f"{name:<22}{statistics.median(timings):>9.1f}{max(timings):>9.1f}")
+            if not filters:
+                top = results[0]
+                hits = sum(1 for message_id, _ in top if message_id in needles)
+                print(f"  planted messages in the top {len(top)}: {hits}")
+
+        queries = [QUERY] + [chatter(random.Random(seed)) for seed in range(7)]
+        timings, _ = measure(index, max(1, args.repeats // 4), queries=queries)
+        print(
+            f"{'batch of 8, per query':<22}"
+            f"{statistics.median(timings) / len(queries):>9.1f}"
+            f"{max(timings) / len(queries):>9.1f}"
+        )
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
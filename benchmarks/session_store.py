@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the SQLite session store against ADK's in-memory one
+Simulates many users taking turns (user message, tool call, tool result and
+answer events per turn), then a restart, and reports append and lookup
+latencies, restart cost and resident memory for both backends.
+
+Run with: python -m benchmarks.session_store --users 2000 --turns 5
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from src.agent.session_store import SqliteSessionService
+
+APP_NAME = "bench"
+
+
+def turn_events(turn: int):
+    """Events a turn with one tool call appends to a session"""
+    return [
+        Event(
+            author="user",
+            invocation_id=f"turn-{turn}",
+            content=types.Content(
+                role="user", parts=[types.Part(text=f"question {turn} " * 8)]
+            ),
+        ),
+        Event(
+            author="agent",
+            invocation_id=f"turn-{turn}",
+            content=types.Content(
+                role="model",
+                parts=[
+                    types.Part(
+                        function_call=types.FunctionCall(
+                            name="search_user_messages", args={"hours_back": 48}
+                        )
+                    )
+                ],
+            ),
+        ),
+        Event(
+            author="agent",
+            invocation_id=f"turn-{turn}",
+            content=types.Content(
+                role="user",
+                parts=[
+                    types.Part(
+                        function_response=types.FunctionResponse(
+                            name="search_user_messages",
+                            response={"result": "message " * 150},
+                        )
+                    )
+                ],
+            ),
+        ),
+        Event(
+            author="agent",
+            invocation_id=f"turn-{turn}",
+            content=types.Content(
+                role="model", parts=[types.Part(text=f"answer {turn} " * 40)]
+            ),
+        ),
+    ]
+
+
+def percentile_ms(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))] * 1000
+
+
+async def simulate(service, users: int, turns: int, active: int):
+    """
+    Run `turns` turns for every user, then one more turn for `active` users.
+
+    Returns:
+        Lists of append and get_session latencies in seconds
+    """
+    appends, lookups = [], []
+
+    async def one_turn(user_id: str, turn: int):
+        started = time.perf_counter()
+        session = await service.get_session(
+            app_name=APP_NAME, user_id=user_id, session_id=user_id
+        )
+        if session is None:
+            session = await service.create_session(
+                app_name=APP_NAME, user_id=user_id, session_id=user_id
+            )
+        lookups.append(time.perf_counter() - started)
+        for event in turn_events(turn):
+            started = time.perf_counter()
+            await service.append_event(session, event)
+            appends.append(time.perf_counter() - started)
+
+    for turn in range(turns):
+        for user in range(users):
+            await one_turn(f"user{user}", turn)
+    for user in random.sample(range(users), min(active, users)):
+        await one_turn(f"user{user}", turns)
+    return appends, lookups
+
+
+async def measure(name, make_service, args, restart=None):
+    gc.collect()
+    tracemalloc.start()
+    service = make_service()
+    started = time.perf_counter()
+    appends, lookups = await simulate(service, args.users, args.turns, args.active)
+    elapsed = time.perf_counter() - started
+    resident = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"\n{name}")
+    print(f"   {args.users} users x {args.turns} turns: {elapsed:.2f}s")
+    print(
+        f"   append_event   p50 {percentile_ms(appends, 50):.3f} ms   "
+        f"p95 {percentile_ms(appends, 95):.3f} ms"
+    )
+    print(
+        f"   get_session    p50 {percentile_ms(lookups, 50):.3f} ms   "
+        f"p95 {percentile_ms(lookups, 95):.3f} ms"
+    )
+    print(f"   resident after run: {resident / 1024 / 1024:.1f} MB")
+
+    if restart is not None:
+        await restart(service, args)
+
+
+async def sqlite_restart(service, args):
+    """Reopen the store as after a deploy and resume a few users"""
+    path = service.path
+    service.close()
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    reopened = SqliteSessionService(path, hot_set_size=args.hot_set)
+    opened = time.perf_counter() - started
+
+    resumes = []
+    for user in random.sample(range(args.users), min(args.active, args.users)):
+        started = time.perf_counter()
+        session = await reopened.get_session(
+            app_name=APP_NAME, user_id=f"user{user}", session_id=f"user{user}"
+        )
+        resumes.append(time.perf_counter() - started)
+        assert session is not None and len(session.events) >= 4 * args.turns
+    resident = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    hot = reopened.hot_count()
+    reopened.close()
+
+    print(f"   restart: reopen {opened * 1000:.1f} ms, all conversations kept")
+    print(
+        f"   resume (cold) p50 {percentile_ms(resumes, 50):.3f} ms   "
+        f"p95 {percentile_ms(resumes, 95):.3f} ms"
+    )
+    print(
+        f"   resident after resuming {len(resumes)} users: "
+        f"{resident / 1024 / 1024:.1f} MB (hot set {hot})"
+    )
+    print(f"   on disk: {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument(
+        "--active", type=int, default=100, help="users speaking after the run"
+    )
+    parser.add_argument("--hot-set", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    random.seed(args.seed)
+    print("📊 Session store benchmark")
+
+    await measure("InMemorySessionService", InMemorySessionService, args)
+    print("   restart: all conversations lost")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.db")
+        await measure(
+            f"SqliteSessionService (hot set {args.hot_set})",
+            lambda: SqliteSessionService(path, hot_set_size=args.hot_set),
+            args,
+            restart=sqlite_restart,
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Stress test for DiscordAdvisoryAgent session locking
+Fires many concurrent users at a stub runner (no Gemini, no Discord) and checks
+that different users run in parallel while turns of one user stay ordered
+
+Run with: python -m benchmarks.session_stress
+"""
+
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+# The stub runner has its own session service, don't create the on-disk store
+os.environ.setdefault("SESSION_STORE_PATH", "")
+
+from src.agent.agent import DiscordAdvisoryAgent  # noqa: E402
+
+TURN_LATENCY = 0.05  # Simulated model latency per turn (seconds)
+SESSION_LATENCY = 0.01  # Simulated session creation latency (seconds)
+
+
+class StubSessionService:
+    """Session service that only hands out IDs"""
+
+    def __init__(self):
+        self.created = 0
+
+    async def get_session(self, app_name, user_id, session_id):
+        return None
+
+    async def create_session(self, app_name, user_id, session_id=None):
+        await asyncio.sleep(SESSION_LATENCY)
+        self.created += 1
+        return SimpleNamespace(id=session_id or f"session-{user_id}", user_id=user_id)
+
+
+class StubRunner:
+    """Runner echoing the prompt after a fixed delay, recording overlaps"""
+
+    def __init__(self):
+        self.app_name = "stress"
+        self.session_service = StubSessionService()
+        self.active = set()
+        self.overlaps = 0
+        self.order = {}
+
+    async def run_async(self, user_id, session_id, new_message, run_config=None):
+        if session_id in self.active:
+            self.overlaps += 1
+        self.active.add(session_id)
+        try:
+            await asyncio.sleep(TURN_LATENCY)
+            text = new_message.parts[0].text
+            self.order.setdefault(user_id, []).append(text)
+            yield SimpleNamespace(
+                content=SimpleNamespace(parts=[SimpleNamespace(text=text)])
+            )
+        finally:
+            self.active.discard(session_id)
+
+
+async def run_round(users: int, turns_per_user: int):
+    agent = DiscordAdvisoryAgent()
+    agent.runner = StubRunner()
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            agent.get_advice(f"user{u}", f"turn {t}")
+            for t in range(turns_per_user)
+            for u in range(users)
+        )
+    )
+    elapsed = time.perf_counter() - start
+
+    runner = agent.runner
+    ordered = all(
+        turns == [f"turn {t}" for t in range(turns_per_user)]
+        for turns in runner.order.values()
+    )
+    return elapsed, runner, ordered, len(agent.user_locks)
+
+
+async def main():
+    turns_per_user = 3
+    print("🧪 Session locking stress test")
+    print(f"   {turns_per_user} turns/user, {TURN_LATENCY * 1000:.0f} ms per turn")
+    print("=" * 60)
+
+    for users in (10, 100, 250, 500):
+        elapsed, runner, ordered, leftover_locks = await run_round(
+            users, turns_per_user
+        )
+        throughput = users * turns_per_user / elapsed
+        print(
+            f"{users:>4} users: {elapsed:6.3f}s  {throughput:8.0f} turns/s  "
+            f"sessions={runner.session_service.created}  "
+            f"overlaps={runner.overlaps}  ordered={ordered}  "
+            f"leftover_locks={leftover_locks}"
+        )
+        assert runner.overlaps == 0, "Turns of the same session overlapped"
+        assert ordered, "Turns of a user ran out of order"
+        assert runner.session_service.created == users
+        assert leftover_locks == 0, "Per-user locks were not cleaned up"
+
+    print("\n🎉 Throughput scales with the number of users; wall time stays flat.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
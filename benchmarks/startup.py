@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark of the bot process
+Starts fresh interpreters that import src.bot, simulate the gateway handshake
+(login, connect, READY) with a sleep, then answer one mention with a scripted
+model. "eager" builds the agent before connecting, as src.bot used to at
+import time (and without preloading what the first turn imports); "lazy" is
+the current startup path, building it in a thread while the handshake runs. Reports the src.bot import time, time to on_ready, time
+until the agent is ready and time to the first answer.
+
+Run with: python -m benchmarks.startup --runs 5 --handshake 1.0
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MODES = ["eager", "lazy"]
+MILESTONES = ["import_bot", "on_ready", "agent_ready", "first_answer"]
+
+
+async def child(mode: str, handshake: float) -> dict:
+    started = time.perf_counter()
+    from src import bot, startup
+
+    def since_start():
+        return (time.perf_counter() - started) * 1000
+
+    timings = {"import_bot": since_start()}
+    if mode == "eager":
+        # What importing src.bot used to do
+        from src.agent.agent import discord_agent as agent
+
+        timings["agent_ready"] = since_start()
+        await asyncio.sleep(handshake)
+        timings["on_ready"] = since_start()
+    else:
+        await bot.setup_hook()
+        await asyncio.sleep(handshake)
+        timings["on_ready"] = since_start()
+        agent = await bot._get_agent()
+        timings["agent_ready"] = since_start()
+
+    from benchmarks.fakes import ScriptedLlm
+    from src.agent.agent import advisory_agent
+
+    advisory_agent.model = ScriptedLlm(model="scripted", first_token_latency=0.0)
+    async for _ in agent.stream_advice("startup", "salut"):
+        pass
+    timings["first_answer"] = since_start()
+    timings["phases"] = startup.report_lines()
+    return timings
+
+
+def run_child(mode: str, handshake: float) -> dict:
+    env = dict(
+        os.environ, SESSION_STORE_PATH="", MESSAGE_ARCHIVE_PATH="", LOG_LEVEL="ERROR"
+    )
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child", mode]
+        + ["--handshake", str(handshake)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--handshake", type=float, default=1.0, help="simulated gateway connect (s)"
+    )
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        print(json.dumps(asyncio.run(child(args.child, args.handshake))))
+        return
+
+    print(f"📊 Startup benchmark: {args.runs} runs, {args.handshake}s handshake")
+    for mode in MODES:
+        runs = [run_child(mode, args.handshake) for _ in range(args.runs)]
+        medians = {
+            name: statistics.median(run[name] for run in runs) for name in MILESTONES
+        }
+        print(
+            f"   {mode:<6} "
+            + "   ".join(f"{name} {medians[name]:6.0f} ms" for name in MILESTONES)
+        )
+        print(f"          last run phases: {', '.join(runs[-1]['phases'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark of model responses calling several tools at once
+Asks the agent to compare 1, 2, 4... people: the scripted model answers with
+one search_user_messages call per person plus a get_time_ago call, all in the
+same response, against a fake guild with paged history latency. For each size
+it reports the turn time next to the sum of the tool calls' durations and the
+slowest one: with the calls running concurrently the turn tracks the slowest.
+
+Run with: python -m benchmarks.tool_fanout --people 1 2 4 8 --turns 5
+"""
+
+import argparse
+import asyncio
+import functools
+import os
+import statistics
+import time
+
+# Keep the benchmark self-contained: sessions in memory, no archive
+os.environ.setdefault("SESSION_STORE_PATH", "")
+os.environ.setdefault("MESSAGE_ARCHIVE_PATH", "")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+from benchmarks.fakes import (  # noqa: E402
+    FakeClient,
+    FakeUser,
+    ScriptedLlm,
+    build_guild,
+)
+
+
+def spanned_tool(func, spans):
+    """Wrap an agent tool so each call's duration is recorded"""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            spans.append(time.perf_counter() - started)
+
+    return wrapper
+
+
+async def run(args) -> None:
+    from src.agent import agent as agent_module
+    from src.agent.tools import tools
+
+    bot_user = FakeUser(999, "advisor", bot=True)
+    authors = [FakeUser(100 + i, f"user{i}") for i in range(max(args.people))]
+    guild = build_guild(
+        args.channels,
+        args.messages,
+        48,
+        authors,
+        bot_user,
+        page_latency=args.page_latency,
+        write_latency=0.0,
+    )
+    tools.set_discord_client(FakeClient([guild], bot_user))
+    model = ScriptedLlm(model="scripted", first_token_latency=0.0, chunk_latency=0.0)
+    agent_module.advisory_agent.model = model
+    spans = []
+    # Every tool the agent has is a coroutine function (see tools.dispatch)
+    agent_module.advisory_agent.tools = [
+        spanned_tool(tool, spans) for tool in agent_module.advisory_agent.tools
+    ]
+    agent = agent_module.discord_agent
+
+    print(
+        f"📊 Tool fan-out: {args.channels} channels x {args.messages} messages, "
+        f"{args.page_latency * 1000:.0f} ms per history page"
+    )
+    print(f"   {'people':>6}{'calls':>7}{'turn s':>9}{'sum s':>8}{'slowest s':>11}")
+    for people in args.people:
+        model.search_user_ids = [str(author.id) for author in authors[:people]]
+        turns, sums, slowest = [], [], []
+        for index in range(args.turns):
+            tools._history_cache.clear()  # Every turn pages the history again
+            spans.clear()
+            started = time.perf_counter()
+            async for _ in agent.stream_advice(
+                f"bench{people}-{index}", "compare ces personnes"
+            ):
+                pass
+            turns.append(time.perf_counter() - started)
+            sums.append(sum(spans))
+            slowest.append(max(spans))
+        print(
+            f"   {people:>6}{people + 1:>7}{statistics.median(turns):>9.2f}"
+            f"{statistics.median(sums):>8.2f}{statistics.median(slowest):>11.2f}"
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--people", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--turns", type=int, default=5, help="per size")
+    parser.add_argument("--channels", type=int, default=4)
+    parser.add_argument("--messages", type=int, default=1500, help="per channel")
+    parser.add_argument("--page-latency", type=float, default=0.1)
+    return parser.parse_args()
+
+
+def main():
+    asyncio.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
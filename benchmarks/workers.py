@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Benchmark of agent turns in the gateway process versus a worker pool
+Runs the same burst of turns (scripted model, one proxied search tool call on
+some of them) in-process and with 1, 2, 4... worker processes, and reports
+throughput, turn latency and how late the gateway's event loop runs while the
+turns are in flight (what Discord heartbeats and message events would see).
+
+Run with: python -m benchmarks.workers --turns 400 --workers 0 1 2 4
+"""
+
+import argparse
+import asyncio
+import functools
+import logging
+import os
+import random
+import time
+
+# Keep the benchmark self-contained: sessions in memory, no archive
+os.environ.setdefault("SESSION_STORE_PATH", "")
+os.environ.setdefault("MESSAGE_ARCHIVE_PATH", "")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+from src.agent.tools.tools import search_user_messages  # noqa: E402
+
+PROMPTS = [
+    "salut",
+    "cherche les derniers messages de momo",
+    "quelle heure il est ?",
+    "donne moi un conseil pour mes revisions",
+]
+
+
+@functools.wraps(search_user_messages)
+async def fake_search(*args, **kwargs) -> str:
+    """Stands in for the archive search, which runs in the gateway"""
+    await asyncio.sleep(float(os.getenv("BENCH_TOOL_LATENCY", "0.005")))
+    return "Found 3 messages:\n" + "a1 c1 1h ago: some archived message\n" * 3
+
+
+def setup() -> None:
+    """Point the agent at the scripted model (runs in every process)"""
+    from benchmarks.fakes import ScriptedLlm
+    from src.agent.agent import advisory_agent
+
+    advisory_agent.model = ScriptedLlm(
+        model="scripted",
+        first_token_latency=float(os.getenv("BENCH_MODEL_LATENCY", "0.05")),
+        chunk_latency=0.0,
+        search_user_ids=["123456789012345678"],
+    )
+    advisory_agent.tools = [
+        fake_search if tool.__name__ == "search_user_messages" else tool
+        for tool in advisory_agent.tools
+    ]
+
+
+def percentile_ms(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))] * 1000
+
+
+async def watch_loop(lags, stop, interval=0.01):
+    """Record how late a 10 ms ticker wakes up"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run(workers: int, args):
+    from src.agent.agent import discord_agent
+    from src.workers import WorkerPool
+
+    pool = None
+    if workers:
+        pool = WorkerPool(
+            workers, gateway_tools=[fake_search], setup="benchmarks.workers:setup"
+        )
+        await pool.start()
+    agent = pool or discord_agent
+
+    async def turn(user_id: str, prompt: str, latencies):
+        started = time.perf_counter()
+        async for _ in agent.stream_advice(user_id, prompt):
+            pass
+        latencies.append(time.perf_counter() - started)
+
+    try:
+        # Warm up every worker (imports, first session)
+        await asyncio.gather(
+            *(turn(f"warmup{i}", "salut", []) for i in range(max(4, workers * 4)))
+        )
+
+        rng = random.Random(args.seed)
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies, lags = [], []
+
+        async def limited(index):
+            async with semaphore:
+                await turn(
+                    f"user{rng.randrange(args.users)}", rng.choice(PROMPTS), latencies
+                )
+
+        stop = asyncio.Event()
+        watcher = asyncio.create_task(watch_loop(lags, stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(limited(i) for i in range(args.turns)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await watcher
+    finally:
+        if pool:
+            pool.close()
+
+    label = f"{workers} workers" if workers else "in-process"
+    print(
+        f"   {label:<12} {args.turns / elapsed:7.1f} turns/s   "
+        f"turn p50 {percentile_ms(latencies, 50):6.1f} ms  "
+        f"p95 {percentile_ms(latencies, 95):6.1f} ms   "
+        f"loop lag p50 {percentile_ms(lags, 50):5.1f} ms  "
+        f"p99 {percentile_ms(lags, 99):5.1f} ms  "
+        f"max {max(lags) * 1000:6.1f} ms"
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    logging.basicConfig(level=os.environ["LOG_LEVEL"])
+    setup()
+    print(
+        f"📊 Worker pool benchmark: {args.turns} turns, {args.concurrency} "
+        f"concurrent, {os.cpu_count()} CPUs"
+    )
+    for workers in args.workers:
+        await run(workers, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,225 @@
+"""
+Admission control for agent turns
+Sits between on_message and the agent: per-user and per-channel token buckets,
+a global cap on in-flight turns, and a bounded queue served fairly across users
+that sheds load with an immediate reply once full
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .metrics import increment, observe, set_gauge
+
+# Agent turns running at once
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "8"))
+# Turns waiting for a slot; past this, new mentions are turned away
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "32"))
+# Token buckets: sustained requests per minute, and burst size
+USER_RATE_PER_MINUTE = float(os.getenv("USER_RATE_PER_MINUTE", "6"))
+USER_BURST = int(os.getenv("USER_BURST", "3"))
+CHANNEL_RATE_PER_MINUTE = float(os.getenv("CHANNEL_RATE_PER_MINUTE", "30"))
+CHANNEL_BURST = int(os.getenv("CHANNEL_BURST", "10"))
+
+# Idle buckets are dropped once this many are tracked
+_MAX_BUCKETS = 10000
+
+
+class Rejected(Exception):
+    """A turn refused by admission control; `reason` says which limit hit"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate` tokens per second"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> bool:
+        self._refill(time.monotonic())
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def refund(self) -> None:
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def is_full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.burst
+
+
+class Ticket:
+    """
+    A reserved place for one agent turn.
+
+    Use as an async context manager and call `wait()` before running the
+    turn; leaving the block releases the slot (or the queue position if the
+    turn never started).
+    """
+
+    def __init__(self, controller: "AdmissionController", user_id: str):
+        self.controller = controller
+        self.user_id = user_id
+        self.granted = asyncio.get_running_loop().create_future()
+        self.created = time.perf_counter()
+        self.released = False
+
+    @property
+    def queued(self) -> bool:
+        """Whether the turn has to wait for a slot"""
+        return not self.granted.done()
+
+    async def wait(self) -> None:
+        await asyncio.shield(self.granted)
+        observe("admission.wait", (time.perf_counter() - self.created) * 1000)
+
+    async def __aenter__(self) -> "Ticket":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.controller._release(self)
+
+
+class AdmissionController:
+    """
+    Gate in front of DiscordAdvisoryAgent.
+
+    `reserve()` either raises Rejected right away (rate limited or queue
+    full) or returns a Ticket. Waiting tickets are served by start-time fair
+    queueing: each user's next turn is tagged one step after their previous
+    one, so a user with many queued turns can't starve the others.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        user_rate_per_minute: float = USER_RATE_PER_MINUTE,
+        user_burst: int = USER_BURST,
+        channel_rate_per_minute: float = CHANNEL_RATE_PER_MINUTE,
+        channel_burst: int = CHANNEL_BURST,
+    ):
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.user_limit = (user_rate_per_minute / 60, user_burst)
+        self.channel_limit = (channel_rate_per_minute / 60, channel_burst)
+        self._user_buckets: Dict[str, TokenBucket] = {}
+        self._channel_buckets: Dict[str, TokenBucket] = {}
+        self.in_flight = 0
+        self._queue: List[Tuple[int, int, Ticket]] = []
+        self._queued = 0
+        self._seq = itertools.count()
+        # Virtual time of the last dispatched ticket, and last tag per user
+        # with turns still waiting
+        self._clock = 0
+        self._user_tags: Dict[str, int] = {}
+        self._user_waiting: Dict[str, int] = {}
+
+    def reserve(self, user_id: str, channel_id: Optional[str] = None) -> Ticket:
+        """
+        Admit a turn or raise Rejected("user_rate" | "channel_rate" | "busy")
+        """
+        if self.in_flight >= self.max_concurrent and self._queued >= self.queue_size:
+            self._reject("busy")
+
+        user_bucket = self._bucket(self._user_buckets, user_id, self.user_limit)
+        if not user_bucket.take():
+            self._reject("user_rate")
+        if channel_id is not None:
+            channel_bucket = self._bucket(
+                self._channel_buckets, channel_id, self.channel_limit
+            )
+            if not channel_bucket.take():
+                user_bucket.refund()
+                self._reject("channel_rate")
+
+        ticket = Ticket(self, user_id)
+        increment("admission.admitted")
+        if self.in_flight < self.max_concurrent and not self._queued:
+            self._grant(ticket)
+        else:
+            tag = max(self._clock, self._user_tags.get(user_id, 0)) + 1
+            self._user_tags[user_id] = tag
+            self._user_waiting[user_id] = self._user_waiting.get(user_id, 0) + 1
+            heapq.heappush(self._queue, (tag, next(self._seq), ticket))
+            self._queued += 1
+            increment("admission.queued")
+        self._update_gauges()
+        return ticket
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": self.in_flight, "queued": self._queued}
+
+    def _reject(self, reason: str) -> None:
+        increment(f"admission.rejected_{reason}")
+        raise Rejected(reason)
+
+    def _bucket(self, buckets, key: str, limit) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) >= _MAX_BUCKETS:
+                # A full bucket is the same as a fresh one, forget them
+                for idle in [k for k, b in buckets.items() if b.is_full()]:
+                    del buckets[idle]
+            bucket = buckets[key] = TokenBucket(*limit)
+        return bucket
+
+    def _grant(self, ticket: Ticket) -> None:
+        self.in_flight += 1
+        ticket.granted.set_result(None)
+
+    def _dequeued(self, ticket: Ticket) -> None:
+        self._queued -= 1
+        waiting = self._user_waiting[ticket.user_id] - 1
+        if waiting:
+            self._user_waiting[ticket.user_id] = waiting
+        else:
+            del self._user_waiting[ticket.user_id]
+            del self._user_tags[ticket.user_id]
+
+    def _dispatch(self) -> None:
+        while self._queue and self.in_flight < self.max_concurrent:
+            tag, _, ticket = heapq.heappop(self._queue)
+            if ticket.released:
+                # Abandoned while waiting, already accounted for
+                continue
+            self._clock = tag
+            self._dequeued(ticket)
+            self._grant(ticket)
+
+    def _release(self, ticket: Ticket) -> None:
+        if ticket.released:
+            return
+        ticket.released = True
+        if ticket.granted.done():
+            self.in_flight -= 1
+        else:
+            # Left before its turn came, its heap entry is skipped later
+            self._dequeued(ticket)
+            ticket.granted.cancel()
+        self._dispatch()
+        self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        set_gauge("admission.in_flight", self.in_flight)
+        set_gauge("admission.queue_depth", self._queued)
@@ -2,22 +2,101 @@ from __future__ import annotations
 
 import os
 import asyncio
+import importlib
+import logging
+import time
+import uuid
 from datetime import datetime
-from dotenv import load_dotenv
+from typing import AsyncIterator, Optional
 from google.adk.agents import Agent
-from google.adk.runners import InMemoryRunner
-from google.genai.types import Part, UserContent
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.artifacts import InMemoryArtifactService
+from google.adk.events import Event
+from google.adk.memory import InMemoryMemoryService
+from google.adk.runners import InMemoryRunner, Runner
+from google.genai.types import (
+    Content,
+    FunctionResponse,
+    ModelContent,
+    Part,
+    UserContent,
+)
 
 # Import our custom tools
+from ..event_loop import iterate_in_thread
+from ..metrics import increment, observe, span
+from .cache import ResponseCache, normalize_prompt
+from .compaction import compact_history_callback
+from .hedge import hedged
+from .locks import KeyedLock
+from .router import IntentRouter
+from .session_store import SqliteSessionService
+from .sessions import SessionManager, event_size
 from .tools.tools import DISCORD_TOOLS
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Session retention limits
+SESSION_TTL_HOURS = float(os.getenv("SESSION_TTL_HOURS", "24"))
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "500"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(50 * 1024 * 1024)))
+SESSION_CLEANUP_INTERVAL = int(os.getenv("SESSION_CLEANUP_INTERVAL", "600"))
+
+# On-disk session store (empty to keep sessions in memory only)
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", "data/sessions.db")
+# Sessions kept loaded in memory, the rest are read back from disk on demand
+SESSION_HOT_SET = int(os.getenv("SESSION_HOT_SET", "200"))
+
+# Opt-in answer cache
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+# Answers built from message searches go stale quickly
+RESPONSE_CACHE_TOOL_TTL = float(os.getenv("RESPONSE_CACHE_TOOL_TTL", "60"))
+
+# Answer greetings and time questions locally, without a model call
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+
+# Answers using these tools depend on the current time and are never cached
+TIME_SENSITIVE_TOOLS = {"get_current_time", "get_time_ago"}
+
+# ADK modules a runner imports lazily during its first turn (flows, auth,
+# Gemini client...), about 0.7s that would otherwise delay the first answer
+FIRST_TURN_MODULES = (
+    "google.adk.flows.llm_flows.auto_flow",
+    "google.adk.flows.llm_flows.single_flow",
+    "google.adk.auth.auth_preprocessor",
+    "google.adk.models.google_llm",
+    "google.adk.workflow._workflow",
+    "google.adk.workflow._llm_agent_wrapper",
+    "google.adk.workflow._node_runner_utils",
+    "google.adk.tools.google_search_tool",
+    "google.adk.tools.vertex_ai_search_tool",
+    "google.adk.a2a.agent",
+)
+
+# Prompts whose answer doesn't depend on the conversation so far
+CONTEXT_FREE_PROMPTS = {
+    normalize_prompt(prompt)
+    for prompt in (
+        "Salut! Comment puis-je t'aider aujourd'hui?",  # Empty mention in bot.py
+        "salut",
+        "bonjour",
+        "bonsoir",
+        "coucou",
+        "cc",
+        "yo",
+        "hello",
+        "hi",
+        "hey",
+    )
+}
 
 # Create the advisory agent
 advisory_agent = Agent(
     name="discord_advisory_agent",
-    model="gemini-2.5-flash-lite-preview-06-17",
+    # Slow calls get a duplicate request (see hedge.py)
+    model=hedged("gemini-2.5-flash-lite-preview-06-17"),
     instruction="""
     You are a helpful advisory agent for Discord users. Your role is to provide thoughtful, 
     constructive advice on any topic users ask about. Be concise but informative, friendly 
@@ -31,38 +110,36 @@ advisory_agent = Agent(
     - If you don't know something, admit it and suggest ways to find out
     - Keep responses reasonably short for Discord chat
 
-    Configuration (mapping of the names to the corresponding ids):
-    - Younes / Optique : 221351940867620864
-    - Redwane / Vodou : 219561114235699201
-    - Spirod / Yacoob: 175257023795953664
-    - Nouh : 294201974390390794
-    - Tahar / Flakas / Jailbreaker : 173025197622951936
-    - Idris : 306827479484465172
-    - Moha : 1154765469715284008
-    - Toufik: 175267594637541378
-    - Momo All / Momo / Mohamed / Corbonoireaud / Corbeau : 186182405831262208
-    - Seif / Seifeddine : 278643800031625217
-    - Hamza : 377456001013645314
-    - Dawoud / Skewik : 725088213563080897
-    - Belom / Alan : 173894591706169344
-    - Yassine / Haw : 1081988913847083038
-    - Iliass / Spinhit : 175253847005069312
-    - Mehdi Carillo / Mehdi : 954414422867189851
-    
     Available Tools:
     - get_current_time(): Get current date and time
     - get_time_ago(): Calculate time from X hours/days/minutes ago
-    - search_user_messages(): Search for messages from specific users (placeholder for now)
-    - parse_user_mention(): Convert user names/mentions to Discord IDs
+    - resolve_user(): Convert user names, nicknames or mentions to Discord IDs
+    - search_user_messages(): Search for messages from specific users
+    - search_messages_by_topic(): Find archived messages about a topic, most relevant first
+    - get_activity_stats(): Message counts per user/channel, peak hours and daily activity over a time window
     
     Use these tools when users ask about time, dates, or want to search for messages from specific people.
+    When people are named, call resolve_user first to get their IDs.
+    For questions like "who talked the most" or "when is X usually active", use get_activity_stats rather than searching messages.
+    For questions about a subject ("what did people say about the exam"), use search_messages_by_topic.
     """,
     description="An advisory agent that provides helpful advice and guidance to Discord users on various topics.",
     tools=DISCORD_TOOLS,  # Add our custom tools here
+    # Keep the history sent with each model call within a token budget
+    before_model_callback=compact_history_callback,
 )
 
 # Create a runner for the agent
-runner = InMemoryRunner(agent=advisory_agent)
+if SESSION_STORE_PATH:
+    runner = Runner(
+        app_name="discord_advisory",
+        agent=advisory_agent,
+        artifact_service=InMemoryArtifactService(),
+        session_service=SqliteSessionService(SESSION_STORE_PATH, SESSION_HOT_SET),
+        memory_service=InMemoryMemoryService(),
+    )
+else:
+    runner = InMemoryRunner(agent=advisory_agent)
 
 
 class DiscordAdvisoryAgent:
@@ -70,8 +147,61 @@ class DiscordAdvisoryAgent:
 
     def __init__(self):
         self.runner = runner
-        self.sessions = {}  # Store user sessions
-        self.session_lock = asyncio.Lock()  # Prevent race conditions
+        # Store user sessions, bounded by TTL and LRU budgets
+        self.sessions = SessionManager(
+            ttl_seconds=SESSION_TTL_HOURS * 3600,
+            max_sessions=SESSION_MAX_COUNT,
+            max_bytes=SESSION_MAX_BYTES,
+        )
+        self.eviction_counts = {"ttl": 0, "lru": 0}
+        # One lock per user: different users never wait on each other, and
+        # turns of the same user run one at a time in arrival order
+        self.user_locks = KeyedLock()
+        self.response_cache = (
+            ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+            if RESPONSE_CACHE_ENABLED
+            else None
+        )
+        self.router = IntentRouter() if FAST_PATH_ENABLED else None
+
+    async def _get_or_create_session(self, user_id: str):
+        """
+        Get the user's session: from the session table, else from the session
+        service (persisted by a previous run), else create it on first contact
+        """
+        session = self.sessions.get(user_id)
+        if session is not None:
+            logger.debug("Using existing session for user %s", user_id)
+            return session
+
+        # Each user has a single session, keyed by their ID
+        session = await self.runner.session_service.get_session(
+            app_name=self.runner.app_name, user_id=user_id, session_id=user_id
+        )
+        if session is not None:
+            logger.debug("Resuming stored session for user %s", user_id)
+            increment("agent.sessions_resumed")
+        else:
+            logger.debug("Creating new session for user %s", user_id)
+            # Try to create session - this might not be async in all ADK versions
+            session = self.runner.session_service.create_session(
+                app_name=self.runner.app_name, user_id=user_id, session_id=user_id
+            )
+            # If it returns a coroutine, await it
+            if hasattr(session, "__await__"):
+                session = await session
+            increment("agent.sessions_created")
+            logger.debug("Session created successfully for user %s", user_id)
+
+        self.sessions.add(user_id, session)
+        events = getattr(session, "events", None)
+        if events:
+            self.sessions.record_turn(
+                user_id, len(events), sum(event_size(event) for event in events)
+            )
+            # Only the IDs are kept here, the runner reads the history itself
+            session.events = []
+        return session
 
     async def get_advice(self, user_id: str, message: str) -> str:
         """
@@ -84,88 +214,457 @@ class DiscordAdvisoryAgent:
         Returns:
             The agent's response as a string
         """
+        response_parts = [chunk async for chunk in self._answer(user_id, message)]
+
+        # Combine all response parts
+        full_response = "".join(response_parts)
+        logger.debug("Final response length: %d characters", len(full_response))
+
+        return full_response if full_response else "Desole chui occupe."
+
+    async def stream_advice(self, user_id: str, message: str) -> AsyncIterator[str]:
+        """
+        Stream the agent's answer to a user's message as the model generates it
+
+        Args:
+            user_id: Discord user ID
+            message: The user's message/query
+
+        Yields:
+            Successive pieces of the response text
+        """
+        async for chunk in self._answer(user_id, message, streaming=True):
+            yield chunk
+
+    async def _cache_key(self, user_id: str, message: str):
+        """
+        Cache key for a prompt. Answers given without prior conversation are
+        shared between users; otherwise they are only reused for the same user
+        at the same point of their conversation. The user's session is loaded
+        first (it may only be on disk), so callers must hold the user's lock.
+        """
+        normalized = normalize_prompt(message)
+        if normalized in CONTEXT_FREE_PROMPTS:
+            return (normalized, None)
+        await self._get_or_create_session(user_id)
+        if not self.sessions.has_history(user_id):
+            return (normalized, None)
+        return (normalized, user_id, self.sessions.history_version(user_id))
+
+    async def _answer(
+        self, user_id: str, message: str, streaming: bool = False
+    ) -> AsyncIterator[str]:
+        """
+        Answer a trivial prompt locally, serve it from the response cache, or
+        run a turn and cache it
+        """
+        route = self.router.route(message) if self.router is not None else None
+        if route is not None:
+            increment(f"router.{route.intent}")
+            started = time.perf_counter()
+            async with self.user_locks.hold(user_id):
+                await self._record_exchange(user_id, message, route.reply)
+            observe("router.answer", (time.perf_counter() - started) * 1000)
+            yield route.reply
+            return
+        if self.router is not None:
+            increment("router.misses")
+
+        turn = {"tools": set(), "ok": False}
+        response_parts = []
+        wait_started = time.perf_counter()
+        async with self.user_locks.hold(user_id):
+            observe("agent.lock_wait", (time.perf_counter() - wait_started) * 1000)
+            # Keyed under the lock, so no other turn of the user adds history
+            # between the key and the answer cached under it
+            cache_key = None
+            if self.response_cache is not None:
+                try:
+                    cache_key = await self._cache_key(user_id, message)
+                except Exception as e:
+                    logger.error("Failed to load the session for caching: %s", e)
+            if cache_key is not None:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    logger.debug("Response cache hit for user %s", user_id)
+                    increment("agent.cache_hits")
+                    await self._record_exchange(user_id, message, cached)
+                    yield cached
+                    return
+                increment("agent.cache_misses")
+
+            with span("agent.turn"):
+                async for chunk in self._run_turn(user_id, message, streaming, turn):
+                    response_parts.append(chunk)
+                    yield chunk
+
+            # The turn moved the conversation on: an answer tied to it is only
+            # replayed if the same question comes right after it
+            if cache_key is not None and cache_key[1] is not None and turn["ok"]:
+                cache_key = (*cache_key[:2], self.sessions.history_version(user_id))
+
+        if cache_key is not None and turn["ok"] and response_parts:
+            if turn["tools"] & TIME_SENSITIVE_TOOLS:
+                ttl = 0
+            elif turn["tools"]:
+                ttl = RESPONSE_CACHE_TOOL_TTL
+            else:
+                ttl = RESPONSE_CACHE_TTL
+            self.response_cache.put(cache_key, "".join(response_parts), ttl)
+
+    async def _run_turn(
+        self,
+        user_id: str,
+        message: str,
+        streaming: bool = False,
+        turn: Optional[dict] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Run one agent turn, yielding response text; callers must hold the
+        user's lock. If given, `turn` collects the names of the tools called
+        and whether the turn completed without error.
+        """
+        turn = turn if turn is not None else {"tools": set(), "ok": False}
+        yielded = False
+        session = None
         try:
-            print(f"[DEBUG] Processing message for user {user_id}: {message[:50]}...")
-
-            # Use lock to prevent race conditions on session creation
-            async with self.session_lock:
-                # Get or create session for this user
-                if user_id not in self.sessions:
-                    print(f"[DEBUG] Creating new session for user {user_id}")
-                    try:
-                        # Try to create session - this might not be async in all ADK versions
-                        session = self.runner.session_service.create_session(
-                            app_name=self.runner.app_name, user_id=user_id
-                        )
-                        # If it returns a coroutine, await it
-                        if hasattr(session, "__await__"):
-                            session = await session
-                        self.sessions[user_id] = session
-                        print(
-                            f"[DEBUG] Session created successfully for user {user_id}"
-                        )
-                    except Exception as session_error:
-                        print(f"[ERROR] Failed to create session: {session_error}")
-                        return "Desole, je n'arrive pas a initialiser une session."
-                else:
-                    session = self.sessions[user_id]
-                    print(f"[DEBUG] Using existing session for user {user_id}")
+            logger.debug("Processing message for user %s: %.50s...", user_id, message)
+
+            try:
+                with span("agent.session_lookup"):
+                    session = await self._get_or_create_session(user_id)
+            except Exception as session_error:
+                logger.error("Failed to create session: %s", session_error)
+                yield "Desole, je n'arrive pas a initialiser une session."
+                return
 
             # Create user content
             content = UserContent(parts=[Part(text=message)])
-            print(f"[DEBUG] Created UserContent, starting ADK processing...")
 
-            # Get response from agent using proper async pattern
-            response_parts = []
+            # In SSE mode the model's text arrives as partial events, followed
+            # by one non-partial event aggregating the same text. Tools are
+            # coroutine functions (see tools/dispatch.py), run on the loop
+            run_config = RunConfig(
+                streaming_mode=StreamingMode.SSE if streaming else StreamingMode.NONE
+            )
+            streamed = False
+            event_count = 0
+            history_size = 0
+            last_event = time.perf_counter()
             try:
                 # Use async iteration pattern as shown in ADK docs
                 async for event in self.runner.run_async(
-                    user_id=session.user_id, session_id=session.id, new_message=content
+                    user_id=session.user_id,
+                    session_id=session.id,
+                    new_message=content,
+                    run_config=run_config,
                 ):
-                    print(f"[DEBUG] Received event from ADK runner")
-                    for part in event.content.parts:
-                        if hasattr(part, "text") and part.text:
-                            response_parts.append(part.text)
-                            print(f"[DEBUG] Added response part: {part.text[:30]}...")
+                    now = time.perf_counter()
+                    observe("agent.adk_event", (now - last_event) * 1000)
+                    last_event = now
+                    text = _event_text(event)
+                    if getattr(event, "partial", False):
+                        if text:
+                            streamed = True
+                            yielded = True
+                            yield text
+                        continue
+
+                    event_count += 1
+                    history_size += event_size(event)
+                    turn["tools"].update(_event_tool_names(event))
+                    if streamed:
+                        # Already yielded chunk by chunk
+                        streamed = False
+                    elif text:
+                        yielded = True
+                        yield text
             except AttributeError as attr_error:
-                print(f"[ERROR] AttributeError in run_async: {attr_error}")
-                # Fallback to synchronous method if async not available
-                print("[DEBUG] Falling back to synchronous runner.run()")
-                for event in self.runner.run(
-                    user_id=session.user_id, session_id=session.id, new_message=content
+                logger.error("AttributeError in run_async: %s", attr_error)
+                # Fallback to synchronous method if async not available,
+                # consumed on a thread so the loop keeps serving other users
+                logger.debug("Falling back to synchronous runner.run()")
+                async for event in iterate_in_thread(
+                    lambda: self.runner.run(
+                        user_id=session.user_id,
+                        session_id=session.id,
+                        new_message=content,
+                    )
                 ):
-                    for part in event.content.parts:
-                        if hasattr(part, "text") and part.text:
-                            response_parts.append(part.text)
+                    event_count += 1
+                    history_size += event_size(event)
+                    turn["tools"].update(_event_tool_names(event))
+                    text = _event_text(event)
+                    if text:
+                        yielded = True
+                        yield text
+
+            # The user message is stored in the history too
+            self.sessions.record_turn(
+                user_id, event_count + 1, history_size + len(message)
+            )
+            turn["ok"] = True
 
-            # Combine all response parts
-            full_response = "".join(response_parts)
-            print(f"[DEBUG] Final response length: {len(full_response)} characters")
+        except asyncio.CancelledError:
+            # Deadline passed, message deleted or question asked again
+            increment("agent.turns_cancelled")
+            if session is not None:
+                await self._close_interrupted_turn(session)
+            raise
 
-            return full_response if full_response else "Desole chui occupe."
+        except Exception as e:
+            logger.exception("Unexpected error in get_advice: %s", e)
+            increment("agent.turn_errors")
+            yield "\n\nOups ca marche pas." if yielded else "Oups ca marche pas."
+
+    async def _record_exchange(self, user_id: str, message: str, reply: str):
+        """
+        Append a prompt answered without the model (fast path or response
+        cache), and its answer, to the user's session so later turns see them;
+        callers must hold the user's lock
+        """
+        try:
+            session = await self._get_or_create_session(user_id)
+            invocation_id = f"e-{uuid.uuid4()}"
+            events = [
+                Event(
+                    invocation_id=invocation_id,
+                    author="user",
+                    content=UserContent(parts=[Part(text=message)]),
+                ),
+                Event(
+                    invocation_id=invocation_id,
+                    author=advisory_agent.name,
+                    content=ModelContent(parts=[Part(text=reply)]),
+                ),
+            ]
+            for event in events:
+                await self.runner.session_service.append_event(session, event)
+            # Only the IDs are kept here, the runner reads the history itself
+            session.events = []
+            self.sessions.record_turn(
+                user_id, len(events), sum(event_size(event) for event in events)
+            )
+        except Exception as e:
+            logger.error("Failed to record an answer given without the model: %s", e)
 
+    async def _close_interrupted_turn(self, session):
+        """
+        End the history of a cancelled turn with a model message, answering
+        the tool calls it left open, so that later turns send a valid history
+        to the model; callers must hold the user's lock
+        """
+        try:
+            stored = await self.runner.session_service.get_session(
+                app_name=self.runner.app_name,
+                user_id=session.user_id,
+                session_id=session.id,
+            )
+            if stored is None or not stored.events:
+                return
+            last = stored.events[-1]
+            if last.author != "user" and not (
+                last.get_function_calls() or last.get_function_responses()
+            ):
+                return  # Cancelled after the answer was stored
+            calls = {}
+            for event in reversed(stored.events):
+                for response in event.get_function_responses():
+                    calls.setdefault(response.id, None)
+                for call in event.get_function_calls():
+                    calls.setdefault(call.id, call)
+                if event.author == "user":
+                    break
+            events = []
+            open_calls = [call for call in calls.values() if call is not None]
+            if open_calls:
+                events.append(
+                    Event(
+                        invocation_id=last.invocation_id,
+                        author=advisory_agent.name,
+                        content=Content(
+                            role="user",
+                            parts=[
+                                Part(
+                                    function_response=FunctionResponse(
+                                        id=call.id,
+                                        name=call.name,
+                                        response={"error": "Interrupted"},
+                                    )
+                                )
+                                for call in open_calls
+                            ],
+                        ),
+                    )
+                )
+            events.append(
+                Event(
+                    invocation_id=last.invocation_id,
+                    author=advisory_agent.name,
+                    content=ModelContent(parts=[Part(text="(Reponse interrompue)")]),
+                )
+            )
+            for event in events:
+                await self.runner.session_service.append_event(session, event)
+            session.events = []
+            self.sessions.record_turn(
+                session.user_id,
+                len(events),
+                sum(event_size(event) for event in events),
+            )
         except Exception as e:
-            print(f"[ERROR] Unexpected error in get_advice: {e}")
-            print(f"[ERROR] Error type: {type(e)}")
-            import traceback
+            logger.error("Failed to close an interrupted turn: %s", e)
 
-            traceback.print_exc()
-            return "Oups ca marche pas."
+    async def _release_session(self, session, reason: str):
+        """
+        Evicted sessions are deleted once idle past the TTL; sessions evicted
+        to stay within budget are only unloaded from memory when they are
+        persisted on disk
+        """
+        store = self.runner.session_service
+        if reason == "lru" and isinstance(store, SqliteSessionService):
+            store.unload(self.runner.app_name, session.user_id, session.id)
+        else:
+            await self._delete_runner_session(session)
+
+    async def _delete_runner_session(self, session):
+        """Drop a session from the runner's session service"""
+        try:
+            result = self.runner.session_service.delete_session(
+                app_name=self.runner.app_name,
+                user_id=session.user_id,
+                session_id=session.id,
+            )
+            if hasattr(result, "__await__"):
+                await result
+            # The in-memory service keeps an empty dict per user ever seen
+            users = getattr(self.runner.session_service, "sessions", {}).get(
+                self.runner.app_name, {}
+            )
+            if users.get(session.user_id) == {}:
+                del users[session.user_id]
+        except Exception as e:
+            logger.error("Failed to delete session %s: %s", session.id, e)
 
-    def clear_user_session(self, user_id: str):
+    async def clear_user_session(self, user_id: str):
         """Clear a user's session (useful for starting fresh)"""
-        if user_id in self.sessions:
-            print(f"[DEBUG] Clearing session for user {user_id}")
-            del self.sessions[user_id]
+        async with self.user_locks.hold(user_id):
+            entry = self.sessions.pop(user_id)
+            if entry is not None:
+                logger.debug("Clearing session for user %s", user_id)
+                await self._delete_runner_session(entry.session)
 
     def get_session_count(self) -> int:
         """Get the number of active sessions"""
         return len(self.sessions)
 
-    async def cleanup_old_sessions(self, max_age_hours: int = 24):
-        """Clean up old sessions to prevent memory leaks"""
-        # This is a placeholder - in production you'd track session creation times
-        print(f"[DEBUG] Current active sessions: {len(self.sessions)}")
+    async def cleanup_old_sessions(self, max_age_hours: Optional[float] = None) -> dict:
+        """
+        Evict sessions idle for longer than the TTL, then least recently used
+        ones until the count and size budgets are met.
+
+        Args:
+            max_age_hours: Override for the idle TTL (default: SESSION_TTL_HOURS)
+
+        Returns:
+            Eviction counts for this pass and the current session footprint
+        """
+        evictions = self.sessions.select_evictions(
+            busy=lambda user_id: self.user_locks.pending(user_id) > 0,
+            ttl_seconds=None if max_age_hours is None else max_age_hours * 3600,
+        )
+        evicted = {"ttl": 0, "lru": 0}
+        for user_id, entry, reason in evictions:
+            await self._release_session(entry.session, reason)
+            evicted[reason] += 1
+            self.eviction_counts[reason] += 1
+            increment(f"agent.sessions_evicted_{reason}")
+
+        store = self.runner.session_service
+        if isinstance(store, SqliteSessionService):
+            # Sessions stored by a previous run and never resumed since
+            purged = store.purge_idle(
+                SESSION_TTL_HOURS * 3600
+                if max_age_hours is None
+                else max_age_hours * 3600
+            )
+            evicted["ttl"] += purged
+            self.eviction_counts["ttl"] += purged
+            logger.info(
+                "Session store: %d sessions loaded in memory", store.hot_count()
+            )
+
+        footprint = self.sessions.footprint()
+        if self.router is not None:
+            routed = self.router.stats()
+            logger.info(
+                "Fast path: %d answered locally / %d sent to the model (%.0f%%)",
+                routed["hits"],
+                routed["misses"],
+                routed["hit_rate"] * 100,
+            )
+        if self.response_cache is not None:
+            cache = self.response_cache.stats()
+            logger.info(
+                "Response cache: %d entries, %d hits / %d misses (%.0f%%)",
+                cache["entries"],
+                cache["hits"],
+                cache["misses"],
+                cache["hit_rate"] * 100,
+            )
+        logger.info(
+            "Sessions: %d active, %d events, ~%d KB; evicted %d by TTL, %d by LRU "
+            "(total %d/%d)",
+            footprint["sessions"],
+            footprint["events"],
+            footprint["bytes"] // 1024,
+            evicted["ttl"],
+            evicted["lru"],
+            self.eviction_counts["ttl"],
+            self.eviction_counts["lru"],
+        )
+        return {"evicted": evicted, **footprint}
+
+    async def run_session_cleanup(
+        self, interval_seconds: int = SESSION_CLEANUP_INTERVAL
+    ):
+        """Periodically evict old sessions; meant to run as a background task"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.cleanup_old_sessions()
+            except Exception as e:
+                logger.error("Session cleanup failed: %s", e)
+
+
+def preload() -> None:
+    """Import ahead of time what the first agent turn would import"""
+    for module in FIRST_TURN_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            # Internal ADK layout, may move between versions
+            logger.debug("Could not preload %s: %s", module, e)
+
+
+def _event_text(event) -> str:
+    """Concatenated text parts of an ADK event"""
+    if not event.content or not event.content.parts:
+        return ""
+    return "".join(
+        part.text for part in event.content.parts if getattr(part, "text", None)
+    )
+
+
+def _event_tool_names(event) -> list:
+    """Names of the tools an ADK event asks to call"""
+    if not event.content or not event.content.parts:
+        return []
+    return [
+        part.function_call.name
+        for part in event.content.parts
+        if getattr(part, "function_call", None)
+    ]
 
 
 # Create the global agent instance
@@ -0,0 +1,165 @@
+"""
+Conversation history compaction
+Keeps the prompt sent to the model within a token budget by shrinking bulky
+tool outputs in older turns, then folding the oldest turns into a short
+extractive summary, while the most recent turns are sent verbatim
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import List, Optional, Tuple
+
+from google.genai import types
+
+from ..metrics import increment
+
+logger = logging.getLogger(__name__)
+
+# Approximate token budget for the conversation history of one model call
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "6000"))
+# Number of most recent turns always kept verbatim
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "3"))
+# Older tool results and answers are cut to this many characters
+OLD_PART_CHARS = int(os.getenv("HISTORY_OLD_PART_CHARS", "300"))
+# Dropped user messages are quoted in the summary up to this many characters
+SUMMARY_QUOTE_CHARS = 80
+# Most recent dropped user messages quoted in the summary
+SUMMARY_MAX_QUESTIONS = int(os.getenv("HISTORY_SUMMARY_QUESTIONS", "10"))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for French/English)"""
+    return len(text) // 4 + 1
+
+
+def _part_text(part: types.Part) -> str:
+    if part.text:
+        return part.text
+    if part.function_call:
+        return f"{part.function_call.name}({part.function_call.args or ''})"
+    if part.function_response:
+        return str(part.function_response.response or "")
+    return ""
+
+
+def content_tokens(content: types.Content) -> int:
+    return sum(estimate_tokens(_part_text(part)) for part in content.parts or [])
+
+
+def _is_user_message(content: types.Content) -> bool:
+    """A user-authored message (as opposed to a tool result sent as role=user)"""
+    return content.role == "user" and any(part.text for part in content.parts or [])
+
+
+def split_turns(contents: List[types.Content]) -> List[List[types.Content]]:
+    """Group contents into turns, each starting with a user message"""
+    turns: List[List[types.Content]] = []
+    for content in contents:
+        if not turns or _is_user_message(content):
+            turns.append([])
+        turns[-1].append(content)
+    return turns
+
+
+def _shrink(content: types.Content, max_chars: int) -> types.Content:
+    """Copy of a content with long text and tool results truncated"""
+    parts = []
+    for part in content.parts or []:
+        if part.function_response:
+            response = str(part.function_response.response or "")
+            if len(response) > max_chars:
+                part = types.Part(
+                    function_response=types.FunctionResponse(
+                        id=part.function_response.id,
+                        name=part.function_response.name,
+                        response={"result": response[:max_chars] + " [...]"},
+                    )
+                )
+        elif part.text and len(part.text) > max_chars:
+            part = types.Part(text=part.text[:max_chars] + " [...]")
+        parts.append(part)
+    return types.Content(role=content.role, parts=parts)
+
+
+def _summary(dropped: List[List[types.Content]]) -> str:
+    questions = []
+    for turn in dropped[-SUMMARY_MAX_QUESTIONS:] if SUMMARY_MAX_QUESTIONS else []:
+        text = " ".join(part.text for part in turn[0].parts or [] if part.text)
+        text = " ".join(text.split())
+        if len(text) > SUMMARY_QUOTE_CHARS:
+            text = text[:SUMMARY_QUOTE_CHARS] + "..."
+        questions.append(f"- {text}")
+    return (
+        f"[Contexte: {len(dropped)} echange(s) plus ancien(s) omis. "
+        "Questions posees auparavant:]\n" + "\n".join(questions)
+    )
+
+
+def compact_contents(
+    contents: List[types.Content],
+    budget: int = HISTORY_TOKEN_BUDGET,
+    keep_turns: int = HISTORY_KEEP_TURNS,
+) -> Tuple[List[types.Content], int]:
+    """
+    Fit a conversation into `budget` tokens.
+
+    The last `keep_turns` turns are kept as-is (the current turn is never
+    touched). Older turns first get their tool results and long answers
+    truncated, then the oldest ones are replaced by a summary quoting the
+    last SUMMARY_MAX_QUESTIONS of their questions until the history,
+    summary included, fits.
+
+    Returns:
+        The compacted contents and the estimated number of tokens saved
+    """
+    before = sum(content_tokens(content) for content in contents)
+    if before <= budget:
+        return contents, 0
+
+    turns = split_turns(contents)
+    keep = max(1, keep_turns)
+    older = [[_shrink(c, OLD_PART_CHARS) for c in turn] for turn in turns[:-keep]]
+    recent = turns[-keep:]
+
+    def size(groups):
+        return sum(content_tokens(c) for turn in groups for c in turn)
+
+    def summary_size(dropped):
+        return estimate_tokens(_summary(dropped)) if dropped else 0
+
+    older_sizes = [size([turn]) for turn in older]
+    total = sum(older_sizes) + size(recent)
+    dropped = []
+    while older and total + summary_size(dropped) > budget:
+        dropped.append(older.pop(0))
+        total -= older_sizes.pop(0)
+
+    if size(recent) > budget:
+        # Even the recent turns are too big: shrink all but the current one
+        recent = [
+            [_shrink(c, OLD_PART_CHARS) for c in turn] for turn in recent[:-1]
+        ] + [recent[-1]]
+
+    kept = [content for turn in older + recent for content in turn]
+    if dropped:
+        first = kept[0]
+        kept[0] = types.Content(
+            role=first.role,
+            parts=[types.Part(text=_summary(dropped))] + list(first.parts or []),
+        )
+
+    after = sum(content_tokens(content) for content in kept)
+    return kept, before - after
+
+
+def compact_history_callback(callback_context, llm_request) -> Optional[object]:
+    """ADK before_model_callback bounding the history sent with each model call"""
+    contents, saved = compact_contents(llm_request.contents)
+    if saved > 0:
+        llm_request.contents = contents
+        increment("compaction.runs")
+        increment("compaction.tokens_saved", saved)
+        logger.debug("Compacted history, saved ~%d tokens", saved)
+    return None
@@ -0,0 +1,64 @@
+"""
+Turn deadlines
+Each agent turn runs under a deadline kept in a context variable, so the
+model and the tools it calls (on the loop, or in the gateway for turns run by
+a worker) know how much time is left; searches stop early and return partial
+results rather than keeping the user waiting
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Tuple
+
+# Seconds an agent turn may take before the bot answers with what it has
+AGENT_TURN_TIMEOUT = float(os.getenv("AGENT_TURN_TIMEOUT", "45"))
+# Seconds of the turn kept for the model to answer after its tool calls
+TOOL_DEADLINE_MARGIN = float(os.getenv("TOOL_DEADLINE_MARGIN", "10"))
+
+# time.monotonic() deadlines of the current turn and of its tool calls, None
+# outside turns
+_deadline: ContextVar[Optional[Tuple[float, float]]] = ContextVar(
+    "turn_deadline", default=None
+)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float], tool_seconds: Optional[float] = None):
+    """
+    Run the block (and the tasks it starts) under a deadline `seconds` away.
+    Tools get `tool_seconds`, by default TOOL_DEADLINE_MARGIN less (a third of
+    the turn at most).
+    """
+    if seconds is None:
+        yield
+        return
+    seconds = max(0.0, seconds)
+    if tool_seconds is None:
+        tool_seconds = seconds - min(TOOL_DEADLINE_MARGIN, seconds / 3)
+    now = time.monotonic()
+    token = _deadline.set((now + seconds, now + min(tool_seconds, seconds)))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def _left(index: int) -> Optional[float]:
+    deadlines = _deadline.get()
+    if deadlines is None:
+        return None
+    return max(0.0, deadlines[index] - time.monotonic())
+
+
+def time_left() -> Optional[float]:
+    """Seconds left in the current turn (None without a deadline)"""
+    return _left(0)
+
+
+def tool_time_left() -> Optional[float]:
+    """Seconds a tool may still spend, leaving the model time to answer"""
+    return _left(1)
@@ -0,0 +1,195 @@
+"""
+Hedged model calls
+Wraps the agent's model so that a call still without a first response after
+the recent p95 latency gets a duplicate request: whichever answers first is
+used and the other is cancelled. A call failing before answering is retried
+the same way. Hedges are limited to a share of the calls, so a slow model
+isn't sent twice the load.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, AsyncGenerator, Optional, Union
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.models.registry import LLMRegistry
+from pydantic import PrivateAttr
+
+from ..metrics import increment, observe
+from .deadline import time_left
+
+# Latency percentile after which a duplicate model request is sent (0 disables)
+MODEL_HEDGE_PERCENTILE = float(os.getenv("MODEL_HEDGE_PERCENTILE", "95"))
+# Share of model calls that may be hedged or retried
+MODEL_HEDGE_BUDGET = float(os.getenv("MODEL_HEDGE_BUDGET", "0.1"))
+# Hedge delay in seconds until enough calls have been timed
+MODEL_HEDGE_DELAY = float(os.getenv("MODEL_HEDGE_DELAY", "4"))
+
+# First-response latencies kept for the percentile, and needed before using it
+_LATENCY_WINDOW = 200
+_MIN_SAMPLES = 20
+# Unused hedge budget is capped at this many hedges
+_MAX_CREDIT = 5.0
+
+_DONE = object()
+
+
+class _Attempt:
+    """One request to the model, run by a task so that attempts can race"""
+
+    def __init__(self, model: BaseLlm, request: LlmRequest, stream: bool):
+        self.started = time.monotonic()
+        # Resolved by the first response, or by the end of the call
+        self.answered: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.responses: asyncio.Queue = asyncio.Queue()
+        self.count = 0
+        self.error: Optional[Exception] = None
+        self.task = asyncio.create_task(self._run(model, request, stream))
+
+    async def _run(self, model: BaseLlm, request: LlmRequest, stream: bool) -> None:
+        try:
+            async for response in model.generate_content_async(request, stream):
+                self.count += 1
+                self.responses.put_nowait(response)
+                if not self.answered.done():
+                    self.answered.set_result(None)
+        except Exception as e:
+            self.error = e
+        self.responses.put_nowait(_DONE)
+        if not self.answered.done():
+            self.answered.set_result(None)
+
+    @property
+    def failed(self) -> bool:
+        """Whether the call failed before any response"""
+        return self.error is not None and self.count == 0
+
+    async def drain(self) -> AsyncGenerator[LlmResponse, None]:
+        while True:
+            response = await self.responses.get()
+            if response is _DONE:
+                break
+            yield response
+        if self.error is not None:
+            raise self.error
+
+    def cancel(self) -> None:
+        self.task.cancel()
+
+
+class HedgedLlm(BaseLlm):
+    """
+    Model wrapper hedging slow calls; `inner` is the model (or model name)
+    actually called
+    """
+
+    inner: Any
+    _resolved: Optional[BaseLlm] = PrivateAttr(default=None)
+    _latencies: deque = PrivateAttr(
+        default_factory=lambda: deque(maxlen=_LATENCY_WINDOW)
+    )
+    _credit: float = PrivateAttr(default=1.0)
+
+    @property
+    def model_llm(self) -> BaseLlm:
+        """The wrapped model, resolved on first use to keep startup lazy"""
+        if self._resolved is None:
+            self._resolved = (
+                self.inner
+                if isinstance(self.inner, BaseLlm)
+                else LLMRegistry.new_llm(self.inner)
+            )
+        return self._resolved
+
+    @property
+    def capabilities(self):
+        return self.model_llm.capabilities
+
+    def hedge_delay(self) -> float:
+        """Seconds without a response after which a call is hedged"""
+        if len(self._latencies) < _MIN_SAMPLES:
+            return MODEL_HEDGE_DELAY
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * MODEL_HEDGE_PERCENTILE / 100))
+        return ordered[index]
+
+    def _take_credit(self) -> bool:
+        if self._credit < 1:
+            return False
+        left = time_left()
+        if left is not None and left < self.hedge_delay():
+            # The duplicate couldn't answer before the turn's deadline anyway
+            return False
+        self._credit -= 1
+        return True
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        model = self.model_llm
+        self._credit = min(_MAX_CREDIT, self._credit + MODEL_HEDGE_BUDGET)
+        attempts = [_Attempt(model, llm_request, stream)]
+        try:
+            winner = await self._race(model, llm_request, stream, attempts)
+            for attempt in attempts:
+                if attempt is not winner:
+                    attempt.cancel()
+            if not winner.failed:
+                self._latencies.append(time.monotonic() - winner.started)
+                observe(
+                    "model.first_response", (time.monotonic() - winner.started) * 1000
+                )
+                if winner is not attempts[0]:
+                    increment("model.hedge_wins")
+            async for response in winner.drain():
+                yield response
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    async def _race(self, model, llm_request, stream, attempts) -> _Attempt:
+        """The first attempt to respond, hedging or retrying once if allowed"""
+        waiting = {attempts[0].answered: attempts[0]}
+        hedged = False
+        while True:
+            done, _ = await asyncio.wait(
+                waiting,
+                timeout=None if hedged else self.hedge_delay(),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            finished = [waiting.pop(future) for future in done]
+            for attempt in finished:
+                if not attempt.failed:
+                    return attempt
+            if not hedged:
+                hedged = True
+                if self._take_credit():
+                    # Failed: retry now; slow: race a duplicate request
+                    increment("model.retries" if finished else "model.hedges")
+                    backup = _Attempt(model, _copy_request(llm_request), stream)
+                    attempts.append(backup)
+                    waiting[backup.answered] = backup
+            if not waiting:
+                return finished[-1]  # Every attempt failed
+
+
+def _copy_request(request: LlmRequest) -> LlmRequest:
+    """A copy for a duplicate call: own contents and config, shared tools"""
+    return request.model_copy(
+        update={
+            "contents": [content.model_copy(deep=True) for content in request.contents],
+            "config": request.config.model_copy(deep=True),
+        }
+    )
+
+
+def hedged(model: Union[str, BaseLlm]) -> Union[str, BaseLlm]:
+    """The model wrapped in HedgedLlm, unless hedging is disabled"""
+    if MODEL_HEDGE_PERCENTILE <= 0:
+        return model
+    name = model if isinstance(model, str) else model.model
+    return HedgedLlm(model=name, inner=model)
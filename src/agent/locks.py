@@ -0,0 +1,48 @@
+"""
+Keyed asyncio locks
+One lock per key (e.g. Discord user ID), created on demand and dropped as
+soon as no coroutine holds or waits on it
+"""
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Hashable, List
+
+
+class KeyedLock:
+    """
+    Table of per-key locks.
+
+    Different keys never contend with each other. Waiters on the same key are
+    woken in arrival order (asyncio.Lock is FIFO), so holding the lock for a
+    whole agent turn turns it into a per-user queue of turns.
+    """
+
+    def __init__(self):
+        # key -> [lock, number of holders + waiters]
+        self._locks: Dict[Hashable, List] = {}
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable):
+        """Acquire the lock for `key` for the duration of the context"""
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def pending(self, key: Hashable) -> int:
+        """Number of coroutines holding or waiting on the lock for `key`"""
+        entry = self._locks.get(key)
+        return entry[1] if entry else 0
+
+    def __len__(self) -> int:
+        return len(self._locks)
@@ -0,0 +1,234 @@
+"""
+Fast-path intent router
+Recognizes trivial mentions (greetings, empty mentions, "what time is it",
+"what was the date 3 days ago") with compiled French/English patterns and
+answers them locally, from the time tools and canned replies, instead of
+sending them to the model
+"""
+
+from __future__ import annotations
+
+import random
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .cache import normalize_prompt
+from .tools.tools import get_current_time, get_time_ago
+
+# Polite padding allowed around a recognized request ("salut ... stp")
+_PREFIX = r"(?:(?:salut|bonjour|bonsoir|coucou|cc|yo|hey|hello|hi|dis|dis moi|eh) )*"
+_SUFFIX = (
+    r"(?: (?:stp|svp|s il te plait|s il vous plait|please|pls|merci|thanks|"
+    r"bro|frere|mec|bot|now|maintenant|actuellement|aujourd hui|today))*"
+)
+
+_NUMBER = (
+    r"(?P<n>\d{1,4}|une?|deux|trois|quatre|cinq|six|sept|huit|neuf|dix"
+    r"|an?|one|two|three|four|five|seven|eight|nine|ten)"
+)
+_UNIT_FR = r"(?P<unit>minutes?|mins?|heures?|h|jours?|j|semaines?)"
+_UNIT_EN = r"(?P<unit>minutes?|mins?|hours?|h|days?|weeks?)"
+
+_NUMBER_WORDS = {
+    "un": 1,
+    "une": 1,
+    "a": 1,
+    "an": 1,
+    "one": 1,
+    "deux": 2,
+    "two": 2,
+    "trois": 3,
+    "three": 3,
+    "quatre": 4,
+    "four": 4,
+    "cinq": 5,
+    "five": 5,
+    "six": 6,
+    "sept": 7,
+    "seven": 7,
+    "huit": 8,
+    "eight": 8,
+    "neuf": 9,
+    "nine": 9,
+    "dix": 10,
+    "ten": 10,
+}
+
+# Greetings (and the bot's placeholder for empty mentions) answered as is
+_GREETINGS = {
+    normalize_prompt(prompt): lang
+    for prompt, lang in (
+        ("Salut! Comment puis-je t'aider aujourd'hui?", "fr"),
+        ("", "fr"),
+        ("salut", "fr"),
+        ("bonjour", "fr"),
+        ("bonsoir", "fr"),
+        ("coucou", "fr"),
+        ("cc", "fr"),
+        ("yo", "fr"),
+        ("wesh", "fr"),
+        ("salut ca va", "fr"),
+        ("hello", "en"),
+        ("hi", "en"),
+        ("hey", "en"),
+        ("hi there", "en"),
+    )
+}
+_GREETING_REPLIES = {
+    "fr": [
+        "Salut! Qu'est-ce que je peux faire pour toi?",
+        "Yo! Dis moi tout, je t'ecoute.",
+        "Coucou! Une question, un conseil? Je suis la.",
+    ],
+    "en": [
+        "Hey! What can I do for you?",
+        "Hi! Ask me anything.",
+    ],
+}
+
+_ASK_FR = (
+    r"(?:c etait|on etait|c est|ca fait|ca tombait|etait ce) "
+    r"(?:quand|quel jour|quelle date|le combien)"
+    r"|(?:quand|quel jour|quelle date|le combien) (?:c etait|on etait|etait ce)"
+    r"|il etait quelle heure|quelle heure (?:il etait|etait il)"
+    r"|quand|quel jour|quelle date"
+)
+_AGO_FR = rf"(?:il y a|ya) {_NUMBER} ?{_UNIT_FR}"
+
+# (intent, language, pattern), matched against the whole normalized message
+_PATTERNS: List[Tuple[str, str, str]] = [
+    (
+        "current_time",
+        "fr",
+        r"(?:quelle heure (?:est il|il est|c est|qu il est)|il est quelle heure"
+        r"|c est quoi l heure|t as l heure|tu as l heure|vous avez l heure|l heure)",
+    ),
+    (
+        "current_date",
+        "fr",
+        r"(?:quel jour (?:on est|sommes nous|est on|c est|il est|nous sommes)"
+        r"|on est quel jour|c est quel jour|on est le combien|nous sommes le combien"
+        r"|quelle (?:est la )?date(?: (?:on est|sommes nous|est on|c est))?"
+        r"|on est quelle date|la date)",
+    ),
+    ("time_ago", "fr", rf"(?:{_ASK_FR}) {_AGO_FR}"),
+    ("time_ago", "fr", rf"{_AGO_FR} (?:{_ASK_FR})"),
+    (
+        "current_time",
+        "en",
+        r"(?:what time is it|what s the time|whats the time|what is the time"
+        r"|time|the time|do you have the time)",
+    ),
+    (
+        "current_date",
+        "en",
+        r"(?:what day is it|what s the date|whats the date|what is the date"
+        r"|what s today s date|what is today s date|what day is today|date)",
+    ),
+    (
+        "time_ago",
+        "en",
+        rf"(?:what was the (?:date|time|day)|what date was it|what day was it"
+        rf"|when was|what was) {_NUMBER} ?{_UNIT_EN} ago",
+    ),
+    (
+        "time_ago",
+        "en",
+        rf"{_NUMBER} ?{_UNIT_EN} ago (?:was|is) (?:when|what day|what date)",
+    ),
+]
+_COMPILED = [
+    (intent, lang, re.compile(_PREFIX + pattern + _SUFFIX))
+    for intent, lang, pattern in _PATTERNS
+]
+
+
+@dataclass
+class Route:
+    """A message answered without the model"""
+
+    intent: str
+    reply: str
+
+
+def _time_ago_reply(match: re.Match, lang: str) -> Optional[str]:
+    raw = match.group("n")
+    amount = int(raw) if raw.isdigit() else _NUMBER_WORDS.get(raw)
+    if not amount:
+        return None
+    unit = match.group("unit")
+    if unit.startswith("m"):
+        args, fr, en = {"minutes": amount}, "minute", "minute"
+    elif unit.startswith("h"):
+        args, fr, en = {"hours": amount}, "heure", "hour"
+    elif unit.startswith(("j", "d")):
+        args, fr, en = {"days": amount}, "jour", "day"
+    else:
+        args, fr, en = {"days": 7 * amount}, "semaine", "week"
+    if amount > 1:
+        fr, en = fr + "s", en + "s"
+    when = get_time_ago(**args)
+    if lang == "fr":
+        return f"🕒 Il y a {amount} {fr}, c'était le {when}"
+    return f"🕒 {amount} {en} ago was {when}"
+
+
+_REPLIES: Dict[str, Callable[[re.Match, str], Optional[str]]] = {
+    "current_time": lambda match, lang: (
+        f"🕒 Il est actuellement {get_current_time()}"
+        if lang == "fr"
+        else f"🕒 It is currently {get_current_time()}"
+    ),
+    "current_date": lambda match, lang: (
+        f"📅 On est le {get_current_time()}"
+        if lang == "fr"
+        else f"📅 Today is {get_current_time()}"
+    ),
+    "time_ago": _time_ago_reply,
+}
+
+
+class IntentRouter:
+    """
+    Classifies a message and answers it locally when it is trivial.
+
+    Only whole messages are matched (up to greetings and polite words around
+    them), so "quelle heure est-il a Tokyo" still goes to the model.
+    """
+
+    def __init__(self):
+        self.hits: Counter = Counter()
+        self.misses = 0
+
+    def route(self, message: str) -> Optional[Route]:
+        """The local answer to a message, or None to ask the model"""
+        route = self._classify(normalize_prompt(message))
+        if route is None:
+            self.misses += 1
+        else:
+            self.hits[route.intent] += 1
+        return route
+
+    def _classify(self, text: str) -> Optional[Route]:
+        lang = _GREETINGS.get(text)
+        if lang is not None:
+            return Route("greeting", random.choice(_GREETING_REPLIES[lang]))
+        for intent, lang, pattern in _COMPILED:
+            match = pattern.fullmatch(text)
+            if match is not None:
+                reply = _REPLIES[intent](match, lang)
+                if reply is not None:
+                    return Route(intent, reply)
+        return None
+
+    def stats(self) -> Dict[str, float]:
+        hits = sum(self.hits.values())
+        total = hits + self.misses
+        return {
+            "hits": hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            **{f"hits_{intent}": count for intent, count in self.hits.items()},
+        }
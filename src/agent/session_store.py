@@ -0,0 +1,337 @@
+"""
+Persistent ADK session service
+SQLite (WAL) backed replacement for InMemorySessionService: events are written
+as they are appended, sessions are loaded from disk when their user next
+speaks, and only a bounded LRU hot set of sessions is kept in memory
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import (
+    GetSessionConfig,
+    ListSessionsResponse,
+)
+from google.adk.sessions.state import State
+
+from ..metrics import increment, span
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id)
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions (updated_at);
+
+CREATE TABLE IF NOT EXISTS events (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    event_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id, seq)
+);
+"""
+
+SessionKey = Tuple[str, str, str]
+
+
+class SqliteSessionService(BaseSessionService):
+    """
+    Session service storing sessions and their events in SQLite.
+
+    Every non-partial event is committed when it is appended, so a restart
+    loses at most the turn in flight. Sessions are read back lazily on
+    `get_session` and cached in an LRU hot set of `hot_set_size` sessions;
+    evicting from the hot set only frees memory, the session stays on disk.
+
+    The bot keeps one session per user, so `app:` and `user:` scoped state
+    keys are stored with the session rather than shared across sessions.
+    """
+
+    def __init__(self, path: str, hot_set_size: int = 200):
+        self.path = path
+        self.hot_set_size = hot_set_size
+        self._conn: Optional[sqlite3.Connection] = None
+        self._hot: "OrderedDict[SessionKey, Session]" = OrderedDict()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """
+        The database connection, opened on first use. The service may be
+        built on another thread (the bot imports the agent off the loop) and
+        sqlite3 connections only work on the thread that opened them.
+        """
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    # ------------------------------------------------------------------
+    # BaseSessionService
+    # ------------------------------------------------------------------
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = (session_id or "").strip() or str(uuid.uuid4())
+        now = time.time()
+        session_state = {
+            key: value
+            for key, value in (state or {}).items()
+            if not key.startswith(State.TEMP_PREFIX)
+        }
+        # A leftover session with the same id (e.g. after a crash) is replaced
+        self._delete_rows(app_name, user_id, session_id)
+        self.conn.execute(
+            "INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?)",
+            (app_name, user_id, session_id, json.dumps(session_state), now, now),
+        )
+        self.conn.commit()
+
+        session = Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=session_state,
+            last_update_time=now,
+        )
+        self._remember((app_name, user_id, session_id), session)
+        return _copy(session)
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        key = (app_name, user_id, session_id)
+        session = self._hot.get(key)
+        if session is not None:
+            self._hot.move_to_end(key)
+            increment("sessions.hot_hits")
+        else:
+            session = self._load(key)
+            if session is None:
+                return None
+            self._remember(key, session)
+
+        events = session.events
+        if config is not None:
+            if config.num_recent_events is not None:
+                events = (
+                    events[-config.num_recent_events :]
+                    if config.num_recent_events
+                    else []
+                )
+            if config.after_timestamp is not None:
+                events = [e for e in events if e.timestamp >= config.after_timestamp]
+        return _copy(session, events)
+
+    async def list_sessions(
+        self, *, app_name: str, user_id: Optional[str] = None
+    ) -> ListSessionsResponse:
+        query = "SELECT user_id, session_id, state, updated_at FROM sessions"
+        query += " WHERE app_name = ?"
+        params: list = [app_name]
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        rows = self.conn.execute(query + " ORDER BY updated_at", params).fetchall()
+        return ListSessionsResponse(
+            sessions=[
+                Session(
+                    app_name=app_name,
+                    user_id=row_user,
+                    id=row_session,
+                    state=json.loads(state),
+                    last_update_time=updated_at,
+                )
+                for row_user, row_session, state, updated_at in rows
+            ]
+        )
+
+    async def delete_session(
+        self, *, app_name: str, user_id: str, session_id: str
+    ) -> None:
+        self._hot.pop((app_name, user_id, session_id), None)
+        self._delete_rows(app_name, user_id, session_id)
+        self.conn.commit()
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        key = (session.app_name, session.user_id, session.id)
+        stored = self._hot.get(key)
+        if stored is None:
+            stored = self._load(key)
+            if stored is None:
+                raise ValueError(f"Session {session.id} not found.")
+            self._remember(key, stored)
+
+        # Updates the caller's copy (including temp: state for this invocation)
+        await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+        if stored is not session:
+            stored.events.append(event)
+            stored.last_update_time = event.timestamp
+            if event.actions and event.actions.state_delta:
+                stored.state.update(event.actions.state_delta)
+
+        with span("sessions.append"):
+            self.conn.execute(
+                "INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    *key,
+                    len(stored.events),
+                    event.id,
+                    event.timestamp,
+                    event.model_dump_json(exclude_none=True),
+                ),
+            )
+            if event.actions and event.actions.state_delta:
+                self.conn.execute(
+                    "UPDATE sessions SET state = ?, updated_at = ? WHERE "
+                    "app_name = ? AND user_id = ? AND session_id = ?",
+                    (json.dumps(stored.state), event.timestamp, *key),
+                )
+            else:
+                self.conn.execute(
+                    "UPDATE sessions SET updated_at = ? WHERE "
+                    "app_name = ? AND user_id = ? AND session_id = ?",
+                    (event.timestamp, *key),
+                )
+            self.conn.commit()
+        return event
+
+    # ------------------------------------------------------------------
+    # Hot set and retention
+    # ------------------------------------------------------------------
+
+    def unload(self, app_name: str, user_id: str, session_id: str) -> None:
+        """Drop a session from memory; it is read back from disk on next use"""
+        self._hot.pop((app_name, user_id, session_id), None)
+
+    def purge_idle(self, max_idle_seconds: float) -> int:
+        """
+        Delete sessions not updated for `max_idle_seconds`, including those
+        never loaded since the last restart.
+
+        Returns:
+            Number of sessions deleted
+        """
+        cutoff = time.time() - max_idle_seconds
+        rows = self.conn.execute(
+            "SELECT app_name, user_id, session_id FROM sessions WHERE updated_at < ?",
+            (cutoff,),
+        ).fetchall()
+        for key in rows:
+            self._hot.pop(tuple(key), None)
+            self._delete_rows(*key)
+        self.conn.commit()
+        return len(rows)
+
+    def hot_count(self) -> int:
+        """Number of sessions currently held in memory"""
+        return len(self._hot)
+
+    def close(self) -> None:
+        self._hot.clear()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _remember(self, key: SessionKey, session: Session) -> None:
+        self._hot[key] = session
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.hot_set_size:
+            self._hot.popitem(last=False)
+            increment("sessions.unloaded")
+
+    def _load(self, key: SessionKey) -> Optional[Session]:
+        """Read a session and its events back from disk"""
+        with span("sessions.load"):
+            row = self.conn.execute(
+                "SELECT state, updated_at FROM sessions WHERE "
+                "app_name = ? AND user_id = ? AND session_id = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            events = [
+                Event.model_validate_json(data)
+                for (data,) in self.conn.execute(
+                    "SELECT data FROM events WHERE "
+                    "app_name = ? AND user_id = ? AND session_id = ? ORDER BY seq",
+                    key,
+                )
+            ]
+        increment("sessions.loaded")
+        app_name, user_id, session_id = key
+        return Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=json.loads(row[0]),
+            events=events,
+            last_update_time=row[1],
+        )
+
+    def _delete_rows(self, app_name: str, user_id: str, session_id: str) -> None:
+        key = (app_name, user_id, session_id)
+        self.conn.execute(
+            "DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?",
+            key,
+        )
+        self.conn.execute(
+            "DELETE FROM sessions WHERE app_name = ? AND user_id = ? "
+            "AND session_id = ?",
+            key,
+        )
+
+
+def _copy(session: Session, events=None) -> Session:
+    """
+    Copy handed to the runner: its own events list and state, sharing the
+    (immutable once appended) event objects with the hot set
+    """
+    return session.model_copy(
+        update={
+            "events": list(session.events if events is None else events),
+            "state": copy.deepcopy(session.state),
+        }
+    )
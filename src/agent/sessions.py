@@ -0,0 +1,153 @@
+"""
+Bounded session bookkeeping for DiscordAdvisoryAgent
+Tracks creation/last-use times and an approximate size per user session so
+idle or excess sessions can be evicted by TTL and LRU
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+@dataclass
+class SessionEntry:
+    """A user's ADK session plus the stats used for eviction"""
+
+    session: Any
+    created_at: float
+    last_used: float
+    events: int = 0
+    size: int = 0  # Approximate bytes of content stored in the session history
+
+
+def event_size(event) -> int:
+    """Approximate number of bytes an ADK event adds to a session's history"""
+    content = getattr(event, "content", None)
+    if not content or not content.parts:
+        return 0
+
+    size = 0
+    for part in content.parts:
+        if getattr(part, "text", None):
+            size += len(part.text)
+        if getattr(part, "function_call", None):
+            size += len(str(part.function_call.args or ""))
+        if getattr(part, "function_response", None):
+            size += len(str(part.function_response.response or ""))
+    return size
+
+
+class SessionManager:
+    """
+    LRU-ordered table of user sessions.
+
+    The manager only decides what to evict; deleting the session from the
+    runner's session service is left to the caller since that is async.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float,
+        max_sessions: int,
+        max_bytes: int,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, SessionEntry]" = OrderedDict()
+        self._total_size = 0
+
+    def get(self, user_id: str) -> Optional[Any]:
+        """Return the user's session and mark it as most recently used"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        entry.last_used = time.time()
+        self._entries.move_to_end(user_id)
+        return entry.session
+
+    def has_history(self, user_id: str) -> bool:
+        """Whether the user's session already holds conversation turns"""
+        entry = self._entries.get(user_id)
+        return entry is not None and entry.events > 0
+
+    def history_version(self, user_id: str) -> Optional[Tuple[float, int]]:
+        """
+        Marker of the user's history that changes with every recorded turn,
+        and when the session is loaded again after an eviction
+        """
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        return (entry.created_at, entry.events)
+
+    def add(self, user_id: str, session: Any) -> None:
+        now = time.time()
+        self.pop(user_id)
+        self._entries[user_id] = SessionEntry(session, created_at=now, last_used=now)
+
+    def record_turn(self, user_id: str, events: int, size: int) -> None:
+        """Account for the events a turn appended to the user's session"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return
+        entry.events += events
+        entry.size += size
+        self._total_size += size
+
+    def pop(self, user_id: str) -> Optional[SessionEntry]:
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._total_size -= entry.size
+        return entry
+
+    def select_evictions(
+        self,
+        busy: Callable[[str], bool],
+        ttl_seconds: Optional[float] = None,
+    ) -> List[Tuple[str, SessionEntry, str]]:
+        """
+        Remove and return the sessions to evict, as (user_id, entry, reason).
+
+        Sessions idle for longer than the TTL go first, then the least recently
+        used ones until both the count and size budgets are met. Sessions for
+        which `busy(user_id)` is true (turn in flight) are never evicted.
+        """
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        cutoff = time.time() - ttl
+        evicted = []
+
+        for user_id, entry in list(self._entries.items()):
+            # Entries are in LRU order, so everything after this is fresher
+            if entry.last_used >= cutoff:
+                break
+            if not busy(user_id):
+                evicted.append((user_id, self.pop(user_id), "ttl"))
+
+        for user_id in list(self._entries):
+            if (
+                len(self._entries) <= self.max_sessions
+                and self._total_size <= self.max_bytes
+            ):
+                break
+            if not busy(user_id):
+                evicted.append((user_id, self.pop(user_id), "lru"))
+
+        return evicted
+
+    def footprint(self) -> Dict[str, int]:
+        """Current number of sessions, stored events and approximate bytes"""
+        return {
+            "sessions": len(self._entries),
+            "events": sum(entry.events for entry in self._entries.values()),
+            "bytes": self._total_size,
+        }
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
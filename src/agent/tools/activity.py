@@ -0,0 +1,195 @@
+"""
+Activity rollups
+Message counts per (user, channel, hour) kept as NumPy arrays, fed by the
+message archive as messages are ingested, so aggregate questions ("who talked
+the most this week", "when is X usually active") are answered in memory
+"""
+
+from __future__ import annotations
+
+import os
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+# Timezone used for hour-of-day and weekday breakdowns
+ACTIVITY_TIMEZONE = ZoneInfo(os.getenv("ACTIVITY_TIMEZONE", "Europe/Paris"))
+
+# Unix epoch (hour 0) was a Thursday
+_EPOCH_WEEKDAY = 3
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def hour_of(timestamp: float) -> int:
+    """Hour bucket (hours since the Unix epoch, UTC) of a timestamp"""
+    return int(timestamp // 3600)
+
+
+def _local_hours(hours: np.ndarray) -> np.ndarray:
+    """Hour buckets shifted to wall-clock hours in ACTIVITY_TIMEZONE"""
+    if not len(hours):
+        return hours
+
+    def shift(hour) -> int:
+        offset = datetime.fromtimestamp(int(hour) * 3600, ACTIVITY_TIMEZONE)
+        return int(offset.utcoffset().total_seconds() // 3600)
+
+    # Offsets change at most once a day: sample daily before going hour by hour
+    samples = {shift(hour) for hour in hours[::24]} | {shift(hours[-1])}
+    if len(samples) == 1:
+        return hours + samples.pop()
+    # The hours span a DST change: convert them one by one
+    return hours + np.array([shift(hour) for hour in hours])
+
+
+class _Series:
+    """Dense hourly counts for one (user, channel) pair, grown on demand"""
+
+    __slots__ = ("start", "counts")
+
+    def __init__(self, hour: int):
+        self.start = hour
+        self.counts = np.zeros(24, dtype=np.int32)
+
+    def add(self, hour: int, amount: int) -> None:
+        if hour < self.start:
+            grow = max(self.start - hour, len(self.counts))
+            self.counts = np.concatenate([np.zeros(grow, np.int32), self.counts])
+            self.start -= grow
+        index = hour - self.start
+        if index >= len(self.counts):
+            grow = max(index + 1 - len(self.counts), len(self.counts))
+            self.counts = np.concatenate([self.counts, np.zeros(grow, np.int32)])
+        self.counts[index] = max(0, self.counts[index] + amount)
+
+    def window(self, start: int, end: int) -> Tuple[int, np.ndarray]:
+        """(offset into [start, end), counts) for the part of the window held"""
+        low = max(start, self.start)
+        high = min(end, self.start + len(self.counts))
+        if high <= low:
+            return 0, self.counts[:0]
+        return low - start, self.counts[low - self.start : high - self.start]
+
+
+class ActivityRollups:
+    """
+    In-memory message counts per (author, channel, hour bucket).
+
+    Windows are half-open [start_hour, end_hour) in hour buckets, see hour_of.
+    """
+
+    def __init__(self):
+        self._series: Dict[Tuple[int, int], _Series] = {}
+        self.user_names: Dict[int, str] = {}
+        self.channel_names: Dict[int, str] = {}
+
+    def add(self, author_id: int, channel_id: int, hour: int, amount: int = 1):
+        series = self._series.get((author_id, channel_id))
+        if series is None:
+            if amount <= 0:
+                return
+            series = self._series[(author_id, channel_id)] = _Series(hour)
+        series.add(hour, amount)
+
+    def load(self, rows: Iterable[Tuple[int, int, int, int]]) -> None:
+        """Bulk add (author_id, channel_id, hour, count) rows"""
+        for author_id, channel_id, hour, count in rows:
+            self.add(author_id, channel_id, hour, count)
+
+    def forget_user(self, author_id: int) -> None:
+        """Drop every count of an author"""
+        for key in [key for key in self._series if key[0] == author_id]:
+            del self._series[key]
+        self.user_names.pop(author_id, None)
+
+    def first_hour(self) -> Optional[int]:
+        """Oldest hour bucket holding any message"""
+        starts = [
+            series.start + int(np.flatnonzero(series.counts)[0])
+            for series in list(self._series.values())
+            if series.counts.any()
+        ]
+        return min(starts) if starts else None
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _pairs(self, user_ids=None, channel_id=None):
+        users = set(user_ids) if user_ids else None
+        # Queries run on the tool thread pool while messages keep coming in
+        for (author_id, pair_channel), series in list(self._series.items()):
+            if users is not None and author_id not in users:
+                continue
+            if channel_id is not None and pair_channel != channel_id:
+                continue
+            yield author_id, pair_channel, series
+
+    def totals_by_user(
+        self, start: int, end: int, channel_id: Optional[int] = None
+    ) -> Dict[int, int]:
+        """Messages per author in the window"""
+        totals: Dict[int, int] = {}
+        for author_id, _, series in self._pairs(channel_id=channel_id):
+            count = int(series.window(start, end)[1].sum())
+            if count:
+                totals[author_id] = totals.get(author_id, 0) + count
+        return totals
+
+    def totals_by_channel(
+        self, start: int, end: int, user_ids: Optional[List[int]] = None
+    ) -> Dict[int, int]:
+        """Messages per channel in the window, optionally for some authors only"""
+        totals: Dict[int, int] = {}
+        for _, channel_id, series in self._pairs(user_ids=user_ids):
+            count = int(series.window(start, end)[1].sum())
+            if count:
+                totals[channel_id] = totals.get(channel_id, 0) + count
+        return totals
+
+    def hourly(
+        self,
+        start: int,
+        end: int,
+        user_ids: Optional[List[int]] = None,
+        channel_id: Optional[int] = None,
+    ) -> np.ndarray:
+        """Dense counts for every hour of the window"""
+        counts = np.zeros(max(0, end - start), dtype=np.int64)
+        for _, _, series in self._pairs(user_ids, channel_id):
+            offset, window = series.window(start, end)
+            counts[offset : offset + len(window)] += window
+        return counts
+
+    @staticmethod
+    def by_local_time(start: int, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Fold hourly counts starting at hour bucket `start` into hour-of-day
+        (24) and weekday (7, Monday first) histograms in ACTIVITY_TIMEZONE.
+        """
+        active = np.flatnonzero(counts)
+        weights = counts[active]
+        local = _local_hours(start + active)
+        by_hour = np.bincount(local % 24, weights=weights, minlength=24)
+        by_weekday = np.bincount(
+            (local // 24 + _EPOCH_WEEKDAY) % 7, weights=weights, minlength=7
+        )
+        return by_hour.astype(np.int64), by_weekday.astype(np.int64)
+
+    @staticmethod
+    def by_local_day(start: int, counts: np.ndarray) -> List[Tuple[date, int]]:
+        """Hourly counts starting at `start` summed per calendar day, oldest first"""
+        if not len(counts):
+            return []
+        local = _local_hours(np.arange(start, start + len(counts)))
+        days = local // 24
+        per_day = np.bincount(days - days[0], weights=counts)
+        return [
+            (date.fromordinal(_EPOCH_ORDINAL + int(days[0]) + index), int(n))
+            for index, n in enumerate(per_day)
+        ]
+
+    def __len__(self) -> int:
+        return len(self._series)
@@ -0,0 +1,549 @@
+"""
+Local Discord message archive
+SQLite-backed index of guild messages, fed live by the bot and filled by a
+resumable per-channel backfill, so message searches don't page channel.history,
+plus a semantic index of the message contents for topic searches
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import discord
+
+from ...event_loop import blocking_executor
+from .activity import ActivityRollups, hour_of
+from .semantic import SemanticIndex, embed
+
+logger = logging.getLogger(__name__)
+
+# Embed archived messages for search_messages_by_topic (~1 KB per message)
+SEMANTIC_INDEX = os.getenv("SEMANTIC_INDEX", "true").lower() == "true"
+
+# Messages embedded per batch when (re)building the semantic index
+_EMBED_BATCH = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    message_id INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL,
+    guild_id INTEGER,
+    author_id INTEGER NOT NULL,
+    author_name TEXT NOT NULL,
+    channel_name TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_author_time
+    ON messages (author_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_messages_channel_time
+    ON messages (channel_id, created_at);
+
+CREATE TABLE IF NOT EXISTS activity (
+    author_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    hour INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (author_id, channel_id, hour)
+);
+
+CREATE TABLE IF NOT EXISTS coverage (
+    channel_id INTEGER PRIMARY KEY,
+    covered_from REAL NOT NULL,
+    covered_until REAL NOT NULL,
+    cursor_id INTEGER,
+    complete INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class MessageArchive:
+    """
+    On-disk archive of Discord messages.
+
+    Coverage is tracked per channel as a contiguous [covered_from, covered_until]
+    window. Live ingestion keeps covered_until at "now" for channels that have
+    been caught up since startup; the backfill walks history backwards from the
+    oldest covered point and persists its cursor so it can resume after a restart.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+        # Channels whose gap since the last run has been filled; live
+        # ingestion keeps them covered up to the present
+        self._live_channels = set()
+        # Bot accounts seen since startup, whose messages are not archived
+        self._bots = set()
+        # Hourly message counts, mirrored in memory for the analytics tool
+        self.activity = ActivityRollups()
+        self._load_activity()
+        # Embeddings next to the database (messages.db -> messages.vec256)
+        self.semantic = (
+            SemanticIndex(os.path.splitext(path)[0]) if SEMANTIC_INDEX else None
+        )
+        # While the semantic index is being built (see build_semantic), the
+        # highest message ID it has indexed: newer messages are left to it
+        self._semantic_cursor: Optional[int] = None
+        if (
+            self.semantic is not None
+            and not len(self.semantic)
+            and self.conn.execute("SELECT 1 FROM messages LIMIT 1").fetchone()
+        ):
+            self._semantic_cursor = 0
+
+    # ------------------------------------------------------------------
+    # Ingestion
+    # ------------------------------------------------------------------
+
+    def ingest(self, message) -> None:
+        """Store a single live message"""
+        self._insert_many([message])
+        if message.channel.id in self._live_channels:
+            self.conn.execute(
+                "UPDATE coverage SET covered_until = ? WHERE channel_id = ?",
+                (message.created_at.timestamp(), message.channel.id),
+            )
+        self.conn.commit()
+
+    def _insert_many(self, messages: Iterable) -> int:
+        messages = [message for message in messages if not self._is_bot(message)]
+        rows = [
+            (
+                message.id,
+                message.channel.id,
+                message.guild.id if message.guild else None,
+                message.author.id,
+                message.author.display_name,
+                getattr(message.channel, "name", str(message.channel.id)),
+                message.content,
+                message.created_at.timestamp(),
+            )
+            for message in messages
+        ]
+        if not rows:
+            return 0
+
+        placeholders = ",".join("?" * len(rows))
+        known = {
+            message_id
+            for (message_id,) in self.conn.execute(
+                f"SELECT message_id FROM messages WHERE message_id IN ({placeholders})",
+                [row[0] for row in rows],
+            )
+        }
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+
+        buckets = Counter(
+            (row[3], row[1], hour_of(row[7])) for row in rows if row[0] not in known
+        )
+        self._add_activity(buckets)
+        for row in rows:
+            self.activity.user_names[row[3]] = row[4]
+            self.activity.channel_names[row[1]] = row[5]
+        self._embed(
+            [
+                row
+                for row in rows
+                if row[0] not in known and row[6] and self._indexed_live(row[0])
+            ]
+        )
+        return len(rows)
+
+    def _indexed_live(self, message_id: int) -> bool:
+        """Whether changes to a message go to the semantic index right away"""
+        return self.semantic is not None and (
+            self._semantic_cursor is None or message_id <= self._semantic_cursor
+        )
+
+    def _is_bot(self, message) -> bool:
+        """
+        Whether a message comes from a bot (this one's replies included):
+        those are not archived, so they don't count as user activity. Rows
+        archived for a bot before are dropped the first time it is seen.
+        """
+        author = message.author
+        if not getattr(author, "bot", False):
+            return False
+        if author.id not in self._bots:
+            self._bots.add(author.id)
+            deleted = self.conn.execute(
+                "DELETE FROM messages WHERE author_id = ?", (author.id,)
+            ).rowcount
+            self.conn.execute("DELETE FROM activity WHERE author_id = ?", (author.id,))
+            self.activity.forget_user(author.id)
+            if deleted:
+                logger.info("Dropped %d archived messages of bot %s", deleted, author)
+        return True
+
+    def _embed(self, rows: List[tuple], vectors=None) -> None:
+        """Append messages rows (messages table layout) to the semantic index"""
+        if rows:
+            self.semantic.add(
+                [row[0] for row in rows],
+                [row[3] for row in rows],
+                [row[1] for row in rows],
+                [row[7] for row in rows],
+                [row[6] for row in rows],
+                vectors,
+            )
+
+    async def build_semantic(self) -> None:
+        """
+        Embed every archived message (new index or embedding size change) in
+        the background: batches are embedded on the blocking pool while the
+        archive keeps ingesting, and messages the build has not reached yet
+        are left to it.
+        """
+        if self._semantic_cursor is None:
+            return
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        count = 0
+        while True:
+            batch = self.conn.execute(
+                "SELECT * FROM messages WHERE message_id > ? "
+                "ORDER BY message_id LIMIT ?",
+                (self._semantic_cursor, _EMBED_BATCH),
+            ).fetchall()
+            if not batch:
+                break
+            rows = [row for row in batch if row[6]]
+            vectors = await loop.run_in_executor(
+                blocking_executor(), embed, [row[6] for row in rows], self.semantic.dim
+            )
+            # Messages of the range archived, edited or deleted meanwhile
+            current = {
+                row[0]: row
+                for row in self.conn.execute(
+                    "SELECT * FROM messages WHERE message_id > ? AND message_id <= ?",
+                    (self._semantic_cursor, batch[-1][0]),
+                )
+            }
+            unchanged = [
+                index
+                for index, row in enumerate(rows)
+                if row[0] in current and current[row[0]][6] == row[6]
+            ]
+            embedded = {rows[index][0] for index in unchanged}
+            self._embed([rows[index] for index in unchanged], vectors[unchanged])
+            self._embed(
+                [row for key, row in current.items() if key not in embedded and row[6]]
+            )
+            self._semantic_cursor = batch[-1][0]
+            count += len(batch)
+        self._semantic_cursor = None
+        logger.info(
+            "Built the semantic index of %d messages in %.1fs",
+            count,
+            time.monotonic() - started,
+        )
+
+    def _add_activity(self, buckets: Counter) -> None:
+        """Apply {(author_id, channel_id, hour): delta} to the rollups"""
+        self.conn.executemany(
+            "INSERT INTO activity VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (author_id, channel_id, hour) "
+            "DO UPDATE SET count = max(0, count + excluded.count)",
+            [(*key, delta) for key, delta in buckets.items()],
+        )
+        for (author_id, channel_id, hour), delta in buckets.items():
+            self.activity.add(author_id, channel_id, hour, delta)
+
+    def _load_activity(self) -> None:
+        """Read the rollups into memory, building them for older archives"""
+        if self.conn.execute("SELECT 1 FROM activity LIMIT 1").fetchone() is None:
+            self.conn.execute(
+                "INSERT INTO activity SELECT author_id, channel_id, "
+                "CAST(created_at / 3600 AS INTEGER), COUNT(*) FROM messages "
+                "GROUP BY 1, 2, 3"
+            )
+            self.conn.commit()
+        self.activity.load(
+            self.conn.execute("SELECT author_id, channel_id, hour, count FROM activity")
+        )
+        # Latest known names (SQLite takes bare columns from the MAX row)
+        for author_id, name, _ in self.conn.execute(
+            "SELECT author_id, author_name, MAX(created_at) FROM messages "
+            "GROUP BY author_id"
+        ):
+            self.activity.user_names[author_id] = name
+        for channel_id, name, _ in self.conn.execute(
+            "SELECT channel_id, channel_name, MAX(created_at) FROM messages "
+            "GROUP BY channel_id"
+        ):
+            self.activity.channel_names[channel_id] = name
+
+    def update_content(self, message_id: int, content: str) -> None:
+        """Apply an edit to an archived message"""
+        updated = self.conn.execute(
+            "UPDATE messages SET content = ? WHERE message_id = ?",
+            (content, message_id),
+        ).rowcount
+        self.conn.commit()
+        if updated and self._indexed_live(message_id):
+            # Rewrites the message's row; it has none if it was empty before
+            if not self.semantic.update(message_id, content) and content:
+                self._embed(
+                    self.conn.execute(
+                        "SELECT * FROM messages WHERE message_id = ?", (message_id,)
+                    ).fetchall()
+                )
+
+    def delete(self, message_id: int) -> None:
+        """Remove a deleted message from the archive"""
+        row = self.conn.execute(
+            "SELECT author_id, channel_id, created_at FROM messages "
+            "WHERE message_id = ?",
+            (message_id,),
+        ).fetchone()
+        if row is None:
+            return
+        self.conn.execute("DELETE FROM messages WHERE message_id = ?", (message_id,))
+        self._add_activity(Counter({(row[0], row[1], hour_of(row[2])): -1}))
+        self.conn.commit()
+        if self._indexed_live(message_id):
+            self.semantic.update(message_id, "")
+
+    # ------------------------------------------------------------------
+    # Coverage and backfill
+    # ------------------------------------------------------------------
+
+    def _coverage(self, channel_id: int) -> Optional[sqlite3.Row]:
+        return self.conn.execute(
+            "SELECT covered_from, covered_until, cursor_id, complete "
+            "FROM coverage WHERE channel_id = ?",
+            (channel_id,),
+        ).fetchone()
+
+    def covered_since(self, channel_id: int) -> Optional[float]:
+        """
+        Oldest timestamp from which the archive holds every message of a channel
+        up to the present, or None if the channel is not (yet) covered.
+        """
+        if channel_id not in self._live_channels:
+            return None
+        row = self._coverage(channel_id)
+        return row[0] if row else None
+
+    async def catch_up(self, channel) -> None:
+        """
+        Fill the gap between the last archived point and now, then mark the
+        channel as live so searches can rely on the archive for recent history.
+        """
+        now = time.time()
+        row = self._coverage(channel.id)
+        if row is None:
+            self.conn.execute(
+                "INSERT INTO coverage (channel_id, covered_from, covered_until) "
+                "VALUES (?, ?, ?)",
+                (channel.id, now, now),
+            )
+        elif row[1] < now:
+            after = datetime.fromtimestamp(row[1], tz=timezone.utc)
+            batch = []
+            async for message in channel.history(
+                limit=None, after=after, oldest_first=True
+            ):
+                batch.append(message)
+                if len(batch) >= 100:
+                    self._insert_many(batch)
+                    batch.clear()
+            self._insert_many(batch)
+            self.conn.execute(
+                "UPDATE coverage SET covered_until = ? WHERE channel_id = ?",
+                (now, channel.id),
+            )
+        self.conn.commit()
+        self._live_channels.add(channel.id)
+
+    async def backfill(self, channel, horizon_hours: int, page_size: int = 100) -> int:
+        """
+        Walk a channel's history backwards until the horizon, resuming from the
+        persisted cursor. Returns the number of messages archived.
+        """
+        horizon = time.time() - horizon_hours * 3600
+        row = self._coverage(channel.id)
+        if row is None or row[3] or row[0] <= horizon:
+            return 0
+
+        archived = 0
+        before = (
+            discord.Object(id=row[2])
+            if row[2]
+            else datetime.fromtimestamp(row[0], tz=timezone.utc)
+        )
+        while True:
+            page = [
+                message
+                async for message in channel.history(limit=page_size, before=before)
+            ]
+            if not page:
+                # Reached the beginning of the channel
+                self.conn.execute(
+                    "UPDATE coverage SET covered_from = 0, complete = 1 "
+                    "WHERE channel_id = ?",
+                    (channel.id,),
+                )
+                self.conn.commit()
+                break
+
+            archived += self._insert_many(page)
+            oldest = page[-1]
+            covered_from = oldest.created_at.timestamp()
+            self.conn.execute(
+                "UPDATE coverage SET covered_from = ?, cursor_id = ? "
+                "WHERE channel_id = ?",
+                (covered_from, oldest.id, channel.id),
+            )
+            self.conn.commit()
+            if covered_from <= horizon:
+                break
+            before = oldest
+
+        return archived
+
+    async def sync_guilds(self, guilds, horizon_hours: int) -> None:
+        """
+        Catch up and backfill every readable text channel of the given guilds,
+        building the semantic index meanwhile if it is missing
+        """
+        semantic_build = asyncio.create_task(self.build_semantic())
+        channels = [
+            channel
+            for guild in guilds
+            for channel in guild.text_channels
+            if channel.permissions_for(guild.me).read_message_history
+        ]
+        for channel in channels:
+            try:
+                await self.catch_up(channel)
+            except discord.Forbidden:
+                continue
+            except Exception as e:
+                logger.error("Archive catch-up failed for #%s: %s", channel.name, e)
+
+        for channel in channels:
+            if channel.id not in self._live_channels:
+                continue
+            try:
+                count = await self.backfill(channel, horizon_hours)
+                if count:
+                    logger.debug("Archived %d messages from #%s", count, channel.name)
+            except discord.Forbidden:
+                continue
+            except Exception as e:
+                logger.error("Archive backfill failed for #%s: %s", channel.name, e)
+        await semantic_build
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def search(
+        self,
+        author_ids: List[int],
+        since: float,
+        until: Optional[float] = None,
+        channel_id: Optional[int] = None,
+        limit: int = 50,
+    ) -> List[Dict]:
+        """
+        Newest-first messages from the given authors in a time window.
+
+        Returns dicts shaped like the Discord-backed search results.
+        """
+        if not author_ids:
+            return []
+        placeholders = ",".join("?" * len(author_ids))
+        query = (
+            "SELECT author_name, content, created_at, channel_name, message_id "
+            f"FROM messages WHERE author_id IN ({placeholders}) AND created_at >= ?"
+        )
+        params: list = [*author_ids, since]
+        if until is not None:
+            query += " AND created_at < ?"
+            params.append(until)
+        if channel_id is not None:
+            query += " AND channel_id = ?"
+            params.append(channel_id)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+
+        return [
+            {
+                "author": author,
+                "content": content,
+                "timestamp": datetime.fromtimestamp(created_at, tz=timezone.utc),
+                "channel": channel,
+                "message_id": message_id,
+            }
+            for author, content, created_at, channel, message_id in self.conn.execute(
+                query, params
+            )
+        ]
+
+    def search_semantic(
+        self,
+        query: str,
+        author_ids: Optional[List[int]] = None,
+        channel_id: Optional[int] = None,
+        since: Optional[float] = None,
+        limit: int = 10,
+    ) -> List[Tuple[int, float]]:
+        """
+        (message_id, similarity) of the archived messages closest to a query,
+        best first. Only touches the memory-mapped index (no SQLite), so it
+        can run in a worker thread; see `get_messages` for the contents.
+        """
+        if self.semantic is None:
+            return []
+        # Deleted messages keep their rows: ask for a few more
+        return self.semantic.search(
+            [query],
+            k=limit + 5,
+            author_ids=author_ids,
+            channel_id=channel_id,
+            since=since,
+        )[0]
+
+    def get_messages(self, message_ids: List[int]) -> Dict[int, Dict]:
+        """Archived messages by ID, shaped like `search` results"""
+        if not message_ids:
+            return {}
+        placeholders = ",".join("?" * len(message_ids))
+        return {
+            message_id: {
+                "author": author,
+                "content": content,
+                "timestamp": datetime.fromtimestamp(created_at, tz=timezone.utc),
+                "channel": channel,
+                "message_id": message_id,
+            }
+            for author, content, created_at, channel, message_id in self.conn.execute(
+                "SELECT author_name, content, created_at, channel_name, message_id "
+                f"FROM messages WHERE message_id IN ({placeholders})",
+                list(message_ids),
+            )
+        }
+
+    def close(self) -> None:
+        self.conn.close()
+        if self.semantic is not None:
+            self.semantic.close()
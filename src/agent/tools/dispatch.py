@@ -0,0 +1,105 @@
+"""
+Tool call dispatch
+ADK runs the function calls of one model response concurrently and returns
+their results in call order, so a question about several people takes as long
+as its slowest search. The agent's tools are wrapped here so that this fan-out
+stays bounded: each tool has a concurrency cap shared by every turn, and sync
+tools that never block are answered on the event loop instead of waiting for
+a pool thread behind slow calls.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import os
+import time
+from typing import Callable, Dict
+
+from ...admission import ADMISSION_MAX_CONCURRENT
+from ...event_loop import blocking_executor
+from ...metrics import increment, observe
+
+# Calls of a tool allowed to run at once, across all turns (0 for no cap). By
+# default every admitted turn can have one call of each tool running, so only
+# fan-out within turns waits
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY") or ADMISSION_MAX_CONCURRENT)
+# Per-tool caps overriding TOOL_CONCURRENCY, e.g. "get_activity_stats=2"
+TOOL_CONCURRENCY_LIMITS = os.getenv("TOOL_CONCURRENCY_LIMITS", "")
+
+# Tool name -> semaphore, created on first use
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    limits = {}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            limits[name.strip()] = int(value)
+    return limits
+
+
+_limits = _parse_limits(TOOL_CONCURRENCY_LIMITS)
+
+
+def tool_limit(name: str) -> int:
+    """Concurrent calls allowed for the tool (0 for no cap)"""
+    return _limits.get(name, TOOL_CONCURRENCY)
+
+
+def _get_semaphore(name: str) -> asyncio.Semaphore:
+    semaphore = _semaphores.get(name)
+    if semaphore is None:
+        semaphore = _semaphores[name] = asyncio.Semaphore(tool_limit(name))
+    return semaphore
+
+
+async def _run_sync(func: Callable, *args, **kwargs):
+    """Run a blocking tool on the blocking pool, keeping the turn's deadline"""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        blocking_executor(), functools.partial(context.run, func, *args, **kwargs)
+    )
+
+
+def dispatched(tool: Callable, inline: bool = False) -> Callable:
+    """
+    Wrap a tool for the agent: calls beyond its cap wait for a free slot, sync
+    tools run on the blocking pool, or on the loop itself when `inline` (only
+    for tools that return immediately).
+
+    The wrapper is a coroutine function with the tool's name, docstring and
+    signature, which is what ADK builds the function declaration from.
+    """
+    name = tool.__name__
+    is_async = inspect.iscoroutinefunction(tool)
+
+    if inline and not is_async:
+
+        @functools.wraps(tool)
+        async def inline_call(*args, **kwargs):
+            return tool(*args, **kwargs)
+
+        return inline_call
+
+    async def invoke(*args, **kwargs):
+        if is_async:
+            return await tool(*args, **kwargs)
+        return await _run_sync(tool, *args, **kwargs)
+
+    @functools.wraps(tool)
+    async def call(*args, **kwargs):
+        if tool_limit(name) <= 0:
+            return await invoke(*args, **kwargs)
+        semaphore = _get_semaphore(name)
+        if semaphore.locked():
+            increment(f"tool.{name}.queued")
+        waited = time.perf_counter()
+        async with semaphore:
+            observe(f"tool.{name}.wait", (time.perf_counter() - waited) * 1000)
+            return await invoke(*args, **kwargs)
+
+    return call
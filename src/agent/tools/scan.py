@@ -0,0 +1,220 @@
+"""
+Concurrent Discord history scan
+Fans a message search out across channels and snowflake time slices under
+bounded concurrency, merging results newest-first as they arrive
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import math
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import discord
+
+# Maximum number of history requests in flight across all channels
+SCAN_CONCURRENCY = int(os.getenv("SCAN_CONCURRENCY", "8"))
+
+# Maximum number of history requests in flight per channel. Discord rate-limits
+# GET /channels/{id}/messages per channel, so this caps pressure on each bucket.
+SCAN_PER_CHANNEL = int(os.getenv("SCAN_PER_CHANNEL", "2"))
+
+# Windows longer than this are split into parallel slices
+SCAN_SLICE_HOURS = int(os.getenv("SCAN_SLICE_HOURS", "24"))
+SCAN_MAX_SLICES = int(os.getenv("SCAN_MAX_SLICES", "8"))
+
+# Single shared limiter so concurrent searches don't multiply API pressure
+_global_semaphore = None
+# Per-channel limiters, shared by searches running at once (one model response
+# may search several users in the same channels)
+_channel_semaphores: Dict[int, asyncio.Semaphore] = {}
+
+FetchFn = Callable[..., Awaitable[List[Dict]]]
+
+
+def _get_global_semaphore() -> asyncio.Semaphore:
+    global _global_semaphore
+    if _global_semaphore is None:
+        _global_semaphore = asyncio.Semaphore(SCAN_CONCURRENCY)
+    return _global_semaphore
+
+
+def _get_channel_semaphore(channel_id: int) -> asyncio.Semaphore:
+    semaphore = _channel_semaphores.get(channel_id)
+    if semaphore is None:
+        semaphore = _channel_semaphores[channel_id] = asyncio.Semaphore(
+            SCAN_PER_CHANNEL
+        )
+    return semaphore
+
+
+def split_window(
+    start: datetime, end: datetime, open_ended: bool = False
+) -> List[tuple]:
+    """
+    Split [start, end] into snowflake-bounded slices, newest first.
+
+    Slice boundaries sit on a fixed grid (multiples of the slice length since
+    the epoch) so concurrent searches over overlapping windows request
+    identical slices and can share them. Each slice covers [start, end) so a
+    message on a boundary belongs to exactly one of them; the newest slice
+    also includes `end`. With `open_ended`, the newest slice runs to the next
+    grid point instead of stopping at `end`.
+
+    Returns a list of (after, before, end_timestamp) where after/before are
+    discord.Object snowflakes usable directly with channel.history (which
+    excludes both bounds).
+    """
+    start_ts, end_ts = start.timestamp(), end.timestamp()
+    step = SCAN_SLICE_HOURS * 3600
+    while (end_ts - start_ts) / step > SCAN_MAX_SLICES:
+        step *= 2
+
+    slices = []
+    boundary = math.floor(start_ts / step) * step
+    while boundary < end_ts:
+        slice_start = max(boundary, start_ts)
+        slice_end = boundary + step
+        if not open_ended:
+            slice_end = min(slice_end, end_ts)
+        last = slice_end >= end_ts
+        slices.append(
+            (
+                # History bounds are exclusive: just before the start, and
+                # just past the end for the closed newest slice
+                discord.Object(id=_snowflake(slice_start, high=False) - 1),
+                discord.Object(
+                    id=(
+                        _snowflake(slice_end, high=True) + 1
+                        if last and not open_ended
+                        else _snowflake(slice_end, high=False)
+                    )
+                ),
+                slice_end,
+            )
+        )
+        boundary += step
+    slices.reverse()
+    return slices
+
+
+def _snowflake(timestamp: float, high: bool) -> int:
+    return discord.utils.time_snowflake(
+        datetime.fromtimestamp(timestamp, tz=timezone.utc), high=high
+    )
+
+
+class _NewestMessages:
+    """Bounded min-heap keeping the `limit` newest messages seen so far"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.heap = []
+        self.seen = set()
+
+    def push_many(self, messages: List[Dict]) -> None:
+        for msg in messages:
+            # Archive results and aligned API slices may overlap
+            if msg["message_id"] in self.seen:
+                continue
+            self.seen.add(msg["message_id"])
+            entry = (msg["timestamp"].timestamp(), msg["message_id"], msg)
+            if len(self.heap) < self.limit:
+                heapq.heappush(self.heap, entry)
+            elif entry[:2] > self.heap[0][:2]:
+                heapq.heapreplace(self.heap, entry)
+
+    def floor(self) -> Optional[float]:
+        """Timestamp a message must beat to make the result, once full"""
+        if len(self.heap) < self.limit:
+            return None
+        return self.heap[0][0]
+
+    def newest_first(self) -> List[Dict]:
+        return [entry[2] for entry in sorted(self.heap, reverse=True)]
+
+
+async def scan_channels(
+    channels: List,
+    fetch: FetchFn,
+    target_user_ids: List[int],
+    since: datetime,
+    limit: int,
+    archive=None,
+) -> List[Dict]:
+    """
+    Search several channels concurrently and return the `limit` newest matches.
+
+    Args:
+        channels: Channels to search
+        fetch: Slice fetcher, called as fetch(channel, user_ids, after, limit, before=...)
+        target_user_ids: Author IDs to match
+        since: Timezone-aware start of the search window
+        limit: Maximum number of messages to return
+        archive: Optional MessageArchive answering the windows it covers
+
+    Returns:
+        Matching message dicts, newest first
+    """
+    if limit <= 0:
+        return []
+
+    now = datetime.now(timezone.utc)
+    results = _NewestMessages(limit)
+    global_semaphore = _get_global_semaphore()
+
+    async def fetch_slice(channel, bucket, after, before):
+        async with global_semaphore, bucket:
+            return await fetch(channel, target_user_ids, after, limit, before=before)
+
+    # Plan: archive answers covered windows up front, the rest becomes API slices
+    tasks = {}
+    for channel in channels:
+        window_end = now
+        open_ended = True
+        covered_since = archive.covered_since(channel.id) if archive else None
+        if covered_since is not None:
+            results.push_many(
+                archive.search(
+                    target_user_ids,
+                    max(since.timestamp(), covered_since),
+                    channel_id=channel.id,
+                    limit=limit,
+                )
+            )
+            window_end = min(
+                now, datetime.fromtimestamp(covered_since, tz=timezone.utc)
+            )
+            open_ended = False
+        if window_end - since <= timedelta(0):
+            continue
+
+        bucket = _get_channel_semaphore(channel.id)
+        for after, before, end_ts in split_window(since, window_end, open_ended):
+            task = asyncio.create_task(fetch_slice(channel, bucket, after, before))
+            tasks[task] = end_ts
+
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                results.push_many(task.result())
+
+            # Slices that end before the current cutoff can't contribute anymore
+            floor = results.floor()
+            if floor is not None:
+                stale = {task for task in pending if tasks[task] <= floor}
+                for task in stale:
+                    task.cancel()
+                pending -= stale
+    finally:
+        for task in pending:
+            task.cancel()
+
+    return results.newest_first()
@@ -0,0 +1,300 @@
+"""
+Semantic message index
+Archived messages embedded with a hashing vectorizer (no model to download)
+into a memory-mapped float32 matrix, one row per message, with a sidecar of
+per-row metadata (message, author, channel, time) for pre-filtering, so topic
+searches ("what did people say about the exam") are answered locally by
+blocked dot products
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import re
+import zlib
+from collections import Counter
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .users import fold
+
+logger = logging.getLogger(__name__)
+
+# Embedding size; each dimension costs 4 bytes per message on disk
+SEMANTIC_DIM = int(os.getenv("SEMANTIC_DIM", "256"))
+
+# Rows scored at once (bounds the temporary score matrix)
+_BLOCK_ROWS = 262144
+# Below this fraction of the index, filtered rows are gathered before scoring
+_GATHER_FRACTION = 0.5
+# Message IDs compared at once when looking up a message's row
+_LOOKUP_ROWS = 65536
+
+META_DTYPE = np.dtype(
+    [
+        ("message_id", "<i8"),
+        ("author_id", "<i8"),
+        ("channel_id", "<i8"),
+        ("created_at", "<f8"),
+    ]
+)
+
+_WORD = re.compile(r"\w+")
+_STOPWORDS = set("""
+    a ai alors au aussi aux avec bien c ca ce ces cette d dans de des donc du
+    elle en est et etait il ils j je l la le les leur lui m ma mais me meme
+    mes moi mon n ne nous on ou par pas pour qu que qui s sa se ses si son
+    sur t ta te tes toi ton tu un une vos votre vous y
+    an and are as at be but by for from has have i in is it its me my not of
+    on or so that the this to was we were what with you your
+    """.split())
+
+Hit = Tuple[int, float]  # (message_id, cosine similarity)
+
+
+def _features(text: str) -> Counter:
+    """Weighted hashed features: words, 5-letter stems and word pairs"""
+    words = [
+        word
+        for word in _WORD.findall(fold(text))
+        if len(word) > 1 and word not in _STOPWORDS
+    ]
+    features: Counter = Counter()
+    for word in words:
+        features[word] += 1.0
+        if len(word) > 5:
+            # Crude stemming: examen/examens, reviser/revisions
+            features["~" + word[:5]] += 0.5
+    for first, second in zip(words, words[1:]):
+        features[first + " " + second] += 0.5
+    return features
+
+
+def embed(texts: Sequence[str], dim: int = SEMANTIC_DIM) -> np.ndarray:
+    """
+    L2-normalized signed hashing embeddings, one row per text (all zeros for
+    texts without any usable word)
+    """
+    rows, columns, values = [], [], []
+    for row, text in enumerate(texts):
+        for feature, weight in _features(text).items():
+            digest = zlib.crc32(feature.encode())
+            rows.append(row)
+            columns.append(digest % dim)
+            # Sublinear term frequency, sign from an independent hash bit
+            value = 1.0 + math.log(weight) if weight >= 1 else weight
+            values.append(value if digest & 0x80000000 else -value)
+
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    np.add.at(matrix, (rows, columns), values)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+class SemanticIndex:
+    """
+    Embedding index stored as `<prefix>.vec<dim>` (float32 rows) and
+    `<prefix>.vec<dim>.meta` (META_DTYPE rows).
+
+    New messages are appended; an edited message has its row overwritten in
+    place, and a deleted one its vector zeroed (zero rows never match).
+    Results are still deduplicated by message ID for indexes written before
+    rows were rewritten.
+    """
+
+    def __init__(self, prefix: str, dim: int = SEMANTIC_DIM):
+        self.dim = dim
+        self.vectors_path = f"{prefix}.vec{dim}"
+        self.meta_path = f"{self.vectors_path}.meta"
+        row_bytes = 4 * dim
+
+        sizes = [
+            os.path.getsize(path) if os.path.exists(path) else 0
+            for path in (self.vectors_path, self.meta_path)
+        ]
+        self._rows = min(sizes[0] // row_bytes, sizes[1] // META_DTYPE.itemsize)
+        # Drop a torn append (crash between the two files)
+        for path, size in zip((self.vectors_path, self.meta_path), sizes):
+            expected = self._rows * (
+                row_bytes if path == self.vectors_path else META_DTYPE.itemsize
+            )
+            if size != expected:
+                logger.warning("Truncating %s to %d rows", path, self._rows)
+                with open(path, "r+b") as f:
+                    f.truncate(expected)
+
+        self._vectors_file = open(self.vectors_path, "ab")
+        self._meta_file = open(self.meta_path, "ab")
+        # In-place rewrites of existing rows (edits and deletions)
+        self._rewrite_file = open(self.vectors_path, "r+b")
+        self._mapped_rows = -1
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._meta = np.zeros(0, dtype=META_DTYPE)
+
+    def add(
+        self,
+        message_ids: Sequence[int],
+        author_ids: Sequence[int],
+        channel_ids: Sequence[int],
+        created_at: Sequence[float],
+        texts: Sequence[str],
+        vectors: Optional[np.ndarray] = None,
+    ) -> int:
+        """
+        Embed and append messages; returns the number of rows written.
+        `vectors` are the texts' embeddings when already computed.
+        """
+        if not len(texts):
+            return 0
+        if vectors is None:
+            vectors = embed(texts, self.dim)
+        keep = np.flatnonzero(vectors.any(axis=1))
+        if not len(keep):
+            return 0
+        meta = np.zeros(len(keep), dtype=META_DTYPE)
+        meta["message_id"] = np.asarray(message_ids)[keep]
+        meta["author_id"] = np.asarray(author_ids)[keep]
+        meta["channel_id"] = np.asarray(channel_ids)[keep]
+        meta["created_at"] = np.asarray(created_at)[keep]
+
+        self._vectors_file.write(vectors[keep].tobytes())
+        self._meta_file.write(meta.tobytes())
+        self._vectors_file.flush()
+        self._meta_file.flush()
+        self._rows += len(keep)
+        return len(keep)
+
+    def update(self, message_id: int, text: str) -> bool:
+        """
+        Re-embed an edited message in place (an empty text clears its row).
+        Returns False when the message has no row yet.
+        """
+        row = self._find_row(message_id)
+        if row is None:
+            return False
+        vector = embed([text], self.dim) if text else np.zeros((1, self.dim))
+        self._rewrite_file.seek(row * 4 * self.dim)
+        self._rewrite_file.write(vector.astype(np.float32).tobytes())
+        self._rewrite_file.flush()
+        return True
+
+    def _find_row(self, message_id: int) -> Optional[int]:
+        """Newest row of a message, searched from the end (edits are recent)"""
+        _, meta = self._views()
+        end = len(meta)
+        while end > 0:
+            start = max(0, end - _LOOKUP_ROWS)
+            found = np.flatnonzero(meta["message_id"][start:end] == message_id)
+            if len(found):
+                return start + int(found[-1])
+            end = start
+        return None
+
+    def _views(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Read-only maps of the rows written so far"""
+        rows = self._rows
+        if rows != self._mapped_rows and rows:
+            self._vectors = np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim)
+            )
+            self._meta = np.memmap(
+                self.meta_path, dtype=META_DTYPE, mode="r", shape=(rows,)
+            )
+            self._mapped_rows = rows
+        return self._vectors, self._meta
+
+    def search(
+        self,
+        queries: Sequence[str],
+        k: int = 10,
+        author_ids: Optional[Iterable[int]] = None,
+        channel_id: Optional[int] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> List[List[Hit]]:
+        """
+        Top-k most similar messages for each query, best first, optionally
+        restricted to some authors, one channel and a time window.
+        """
+        vectors, meta = self._views()
+        query_matrix = embed(queries, self.dim)
+        if not len(vectors):
+            return [[] for _ in queries]
+
+        mask = None
+        if author_ids:
+            mask = np.isin(meta["author_id"], list(author_ids))
+        for condition in (
+            None if channel_id is None else meta["channel_id"] == channel_id,
+            None if since is None else meta["created_at"] >= since,
+            None if until is None else meta["created_at"] < until,
+        ):
+            if condition is not None:
+                mask = condition if mask is None else mask & condition
+
+        if mask is not None and mask.sum() < _GATHER_FRACTION * len(vectors):
+            rows = np.flatnonzero(mask)
+            blocks = (
+                (rows[start : start + _BLOCK_ROWS], None)
+                for start in range(0, len(rows), _BLOCK_ROWS)
+            )
+        else:
+            blocks = (
+                (slice(start, start + _BLOCK_ROWS), mask)
+                for start in range(0, len(vectors), _BLOCK_ROWS)
+            )
+
+        # Over-fetch: messages edited in older indexes can have several rows
+        fetch = 2 * k
+        candidates_rows, candidates_scores = [], []
+        for selection, block_mask in blocks:
+            block = vectors[selection]
+            if not len(block):
+                continue
+            scores = block @ query_matrix.T
+            if block_mask is not None:
+                scores[~block_mask[selection]] = -np.inf
+            row_ids = (
+                selection
+                if isinstance(selection, np.ndarray)
+                else np.arange(selection.start, selection.start + len(block))
+            )
+            if len(block) > fetch:
+                top = np.argpartition(-scores, fetch, axis=0)[:fetch]
+            else:
+                top = np.broadcast_to(
+                    np.arange(len(block))[:, None], (len(block), len(queries))
+                )
+            candidates_rows.append(row_ids[top])
+            candidates_scores.append(np.take_along_axis(scores, top, axis=0))
+
+        if not candidates_rows:
+            return [[] for _ in queries]
+        all_rows = np.concatenate(candidates_rows)
+        all_scores = np.concatenate(candidates_scores)
+        results = []
+        for q in range(len(queries)):
+            hits: List[Hit] = []
+            seen = set()
+            for index in np.argsort(-all_scores[:, q]):
+                score = float(all_scores[index, q])
+                if score <= 0 or len(hits) >= k:
+                    break
+                message_id = int(meta["message_id"][all_rows[index, q]])
+                if message_id not in seen:
+                    seen.add(message_id)
+                    hits.append((message_id, score))
+            results.append(hits)
+        return results
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def close(self) -> None:
+        self._vectors_file.close()
+        self._meta_file.close()
+        self._rewrite_file.close()
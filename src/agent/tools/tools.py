@@ -5,13 +5,49 @@ Tools for time management and Discord message searching
 
 from __future__ import annotations
 
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import aclosing
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
 import discord
-from datetime import datetime, timedelta
-from typing import List, Optional
+
+from ...event_loop import blocking_executor
+from ...metrics import increment, span
+from ..deadline import tool_time_left
+from .activity import hour_of
+from .dispatch import dispatched
+from .scan import scan_channels
+from .users import UserDirectory
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of raw messages paged per history window
+HISTORY_SCAN_LIMIT = 1000
+
+# Default size budget of a search_user_messages result, in approximate tokens
+SEARCH_RESULT_TOKENS = int(os.getenv("SEARCH_RESULT_TOKENS", "600"))
+# Message contents are never cut shorter than this when fitting the budget
+SEARCH_MIN_CONTENT_CHARS = 40
+
+# Completed history windows are reused by identical searches for a short while
+HISTORY_CACHE_TTL = float(os.getenv("HISTORY_CACHE_TTL", "30"))
+HISTORY_CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", "64"))
 
 # Global Discord client reference (will be set by the bot)
 _discord_client = None
 
+# Local message archive (optional, set by the bot)
+_message_archive = None
+
+
+# Name -> ID index (set by the bot, loaded from the alias config otherwise)
+_user_directory = None
+
 
 def set_discord_client(client):
     """Set the Discord client for use in tools"""
@@ -19,6 +55,25 @@ def set_discord_client(client):
     _discord_client = client
 
 
+def set_message_archive(archive):
+    """Set the local message archive used to answer searches without the API"""
+    global _message_archive
+    _message_archive = archive
+
+
+def set_user_directory(directory):
+    """Set the user directory used to resolve names to Discord IDs"""
+    global _user_directory
+    _user_directory = directory
+
+
+def _get_user_directory():
+    global _user_directory
+    if _user_directory is None:
+        _user_directory = UserDirectory.from_config()
+    return _user_directory
+
+
 def get_current_time() -> str:
     """
     Get the current date and time in a readable format.
@@ -26,8 +81,9 @@ def get_current_time() -> str:
     Returns:
         Current date and time as a formatted string
     """
-    now = datetime.now()
-    return now.strftime("%Y-%m-%d %H:%M:%S (%A)")
+    with span("tool.get_current_time"):
+        now = datetime.now()
+        return now.strftime("%Y-%m-%d %H:%M:%S (%A)")
 
 
 def get_time_ago(hours: int = 0, days: int = 0, minutes: int = 0) -> str:
@@ -42,8 +98,9 @@ def get_time_ago(hours: int = 0, days: int = 0, minutes: int = 0) -> str:
     Returns:
         Date and time from the specified time ago
     """
-    time_ago = datetime.now() - timedelta(hours=hours, days=days, minutes=minutes)
-    return time_ago.strftime("%Y-%m-%d %H:%M:%S (%A)")
+    with span("tool.get_time_ago"):
+        time_ago = datetime.now() - timedelta(hours=hours, days=days, minutes=minutes)
+        return time_ago.strftime("%Y-%m-%d %H:%M:%S (%A)")
 
 
 async def search_user_messages(
@@ -51,6 +108,8 @@ async def search_user_messages(
     channel_id: Optional[str] = "173025825942142977",
     hours_back: int = 240,
     limit: int = 50,
+    max_tokens: int = SEARCH_RESULT_TOKENS,
+    compact: bool = True,
 ) -> str:
     """
     Search for recent messages from specific users in Discord.
@@ -60,10 +119,23 @@ async def search_user_messages(
         channel_id: Specific channel ID to search in (optional)
         hours_back: How many hours back to search (default: 240)
         limit: Maximum number of messages to return (default: 50)
+        max_tokens: Approximate size budget of the result; message contents
+            are shortened to fit (default: 600)
+        compact: One line per message with short author/channel aliases and
+            relative times (default: True); False gives a readable listing
 
     Returns:
         Formatted string containing found messages
     """
+    with span("tool.search_user_messages"):
+        return await _search_user_messages(
+            user_ids, channel_id, hours_back, limit, max_tokens, compact
+        )
+
+
+async def _search_user_messages(
+    user_ids, channel_id, hours_back, limit, max_tokens, compact
+):
     if not _discord_client:
         return "❌ Discord client not available. Make sure the bot is running."
 
@@ -74,103 +146,634 @@ async def search_user_messages(
         # Convert string user_ids to integers for comparison
         target_user_ids = [int(uid) for uid in user_ids]
 
-        result = f"🔍 Recherche de messages de {len(user_ids)} utilisateur(s)\n"
-        result += f"📅 Période: dernières {hours_back} heures\n"
-        result += f"⏰ Depuis: {search_time.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-
-        found_messages = []
-        channels_searched = 0
+        since = search_time.astimezone(timezone.utc)
 
         # If specific channel provided, search only that channel
         if channel_id:
             try:
                 channel = _discord_client.get_channel(int(channel_id))
-                if channel:
-                    messages = await _search_channel_messages(
-                        channel, target_user_ids, search_time, limit
-                    )
-                    found_messages.extend(messages)
-                    channels_searched = 1
-                else:
+                if not channel:
                     return f"❌ Channel {channel_id} not found or not accessible."
+                channels = [channel]
             except Exception as e:
                 return f"❌ Erreur accessing channel {channel_id}: {str(e)}"
         else:
             # Search all accessible channels
-            for guild in _discord_client.guilds:
-                for channel in guild.text_channels:
-                    try:
-                        # Check if bot has permission to read message history
-                        if channel.permissions_for(guild.me).read_message_history:
-                            messages = await _search_channel_messages(
-                                channel, target_user_ids, search_time, limit // 10
-                            )
-                            found_messages.extend(messages)
-                            channels_searched += 1
-
-                            # Stop if we've found enough messages
-                            if len(found_messages) >= limit:
-                                break
-                    except discord.Forbidden:
-                        continue  # Skip channels we can't access
-                    except Exception as e:
-                        print(f"Error searching channel {channel.name}: {e}")
-                        continue
+            channels = [
+                channel
+                for guild in _discord_client.guilds
+                for channel in guild.text_channels
+                if channel.permissions_for(guild.me).read_message_history
+            ]
+        channels_searched = len(channels)
+
+        if len(channels) > 1 and _archive_covers(channels, since):
+            # The archive holds every channel for this window: one indexed query
+            found_messages = _message_archive.search(
+                target_user_ids, since.timestamp(), limit=limit
+            )
+        else:
+            found_messages = await scan_channels(
+                channels,
+                _search_channel_messages,
+                target_user_ids,
+                since,
+                limit,
+                archive=_message_archive,
+            )
+
+        result = format_search_results(
+            found_messages,
+            len(user_ids),
+            hours_back,
+            channels_searched,
+            limit=limit,
+            max_tokens=max_tokens,
+            compact=compact,
+        )
+        if tool_time_left() == 0:
+            # The scan was cut short by the turn's deadline
+            result += "\n⏱️ Recherche interrompue faute de temps: résultats partiels."
+        return result
 
-                if len(found_messages) >= limit:
-                    break
+    except Exception as e:
+        return f"❌ Erreur lors de la recherche de messages: {str(e)}"
 
-        # Format results
-        if found_messages:
-            result += f"✅ Trouvé {len(found_messages)} message(s) dans {channels_searched} canal/canaux:\n\n"
 
-            # Sort messages by timestamp (newest first)
-            found_messages.sort(key=lambda x: x["timestamp"], reverse=True)
+def _relative_time(timestamp: datetime, now: datetime) -> str:
+    """Short age of a message: 45s, 12min, 5h, 3j"""
+    seconds = max(0, int((now - timestamp).total_seconds()))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}min"
+    if seconds < 86400:
+        return f"{seconds // 3600}h"
+    return f"{seconds // 86400}j"
 
-            for i, msg in enumerate(found_messages[:limit], 1):
-                result += f"**{i}.** `{msg['author']}` dans #{msg['channel']} "
-                result += f"({msg['timestamp'].strftime('%d/%m %H:%M')}):\n"
-                result += f"   {msg['content'][:100]}{'...' if len(msg['content']) > 100 else ''}\n\n"
-        else:
-            result += f"❌ Aucun message trouvé pour les utilisateurs spécifiés dans les dernières {hours_back} heures.\n"
-            result += f"Canaux recherchés: {channels_searched}\n"
 
-        return result
+def _content_cap(lengths: List[int], available: int) -> int:
+    """
+    Largest per-message length cap such that the capped contents fit in
+    `available` characters (short messages leave room for longer ones)
+    """
+    remaining = available
+    ordered = sorted(lengths)
+    for index, length in enumerate(ordered):
+        share = remaining // (len(ordered) - index)
+        if length > share:
+            return share
+        remaining -= length
+    return max(ordered, default=0)
+
+
+def format_search_results(
+    messages: List[dict],
+    user_count: int,
+    hours_back: int,
+    channels_searched: int,
+    limit: int = 50,
+    max_tokens: int = SEARCH_RESULT_TOKENS,
+    compact: bool = True,
+) -> str:
+    """
+    Render search results within roughly `max_tokens` tokens.
 
-    except Exception as e:
-        return f"❌ Erreur lors de la recherche de messages: {str(e)}"
+    Messages are listed newest first. Their contents share the budget left
+    after the fixed parts: short messages are kept whole and long ones are
+    cut to a common length; if even SEARCH_MIN_CONTENT_CHARS per message
+    doesn't fit, the oldest messages are left out.
 
+    In compact mode authors and channels are listed once and referenced by
+    short aliases (a1, c1), with relative timestamps.
+    """
+    if not messages:
+        return (
+            f"❌ Aucun message trouvé pour les utilisateurs spécifiés dans les "
+            f"dernières {hours_back} heures. Canaux recherchés: {channels_searched}"
+        )
+
+    messages = sorted(messages, key=lambda m: m["timestamp"], reverse=True)[:limit]
+    now = datetime.now(timezone.utc)
+    budget = max_tokens * 4  # ~4 characters per token
+
+    if compact:
+        authors = {}
+        channels = {}
+        for message in messages:
+            authors.setdefault(message["author"], f"a{len(authors) + 1}")
+            channels.setdefault(message["channel"], f"c{len(channels) + 1}")
+        header = [
+            f"{len(messages)} message(s) de {user_count} utilisateur(s), "
+            f"dernières {hours_back} h, {channels_searched} canal/canaux "
+            "(plus récents d'abord, âge relatif)",
+            "auteurs: " + " ".join(f"{a}={name}" for name, a in authors.items()),
+            "canaux: " + " ".join(f"{c}=#{name}" for name, c in channels.items()),
+        ]
+        prefixes = [
+            f"{authors[m['author']]} {channels[m['channel']]} "
+            f"{_relative_time(m['timestamp'], now)}: "
+            for m in messages
+        ]
+    else:
+        header = [
+            f"🔍 {len(messages)} message(s) de {user_count} utilisateur(s) "
+            f"dans {channels_searched} canal/canaux, dernières {hours_back} heures:"
+        ]
+        prefixes = [
+            f"{i}. {m['author']} dans #{m['channel']} "
+            f"({m['timestamp'].astimezone().strftime('%d/%m %H:%M')}): "
+            for i, m in enumerate(messages, 1)
+        ]
+
+    contents = [" ".join(m["content"].split()) for m in messages]
+    fixed = sum(len(line) + 1 for line in header)
+    shown = len(messages)
+    while True:
+        overhead = fixed + sum(len(p) + 1 for p in prefixes[:shown])
+        available = budget - overhead
+        if available >= shown * SEARCH_MIN_CONTENT_CHARS or shown == 1:
+            break
+        shown -= 1
+    cap = max(
+        _content_cap([len(c) for c in contents[:shown]], available),
+        SEARCH_MIN_CONTENT_CHARS,
+    )
+
+    lines = header
+    for prefix, content in zip(prefixes[:shown], contents[:shown]):
+        if len(content) > cap:
+            content = content[: cap - 1] + "…"
+        lines.append(prefix + content)
+    if shown < len(messages):
+        lines.append(f"(+{len(messages) - shown} message(s) plus ancien(s) omis)")
+    return "\n".join(lines)
+
+
+def _archive_covers(channels, since):
+    """Whether the archive alone can answer a search of these channels since `since`"""
+    if not _message_archive:
+        return False
+
+    for channel in channels:
+        covered_since = _message_archive.covered_since(channel.id)
+        if covered_since is None or covered_since > since.timestamp():
+            return False
+    return True
+
+
+class _SharedHistory:
+    """
+    One channel.history pagination shared by every search asking for the same
+    (channel, window). Messages are buffered as pages arrive so each consumer
+    can filter them at its own pace; the pagination stops early once all
+    consumers have what they need, and can later resume from its buffer.
+    """
+
+    def __init__(self, channel, after, before, prefix=()):
+        self.messages = list(prefix)
+        self.complete = False  # Reached the end of the window
+        self.done = False  # Pagination finished, failed or was cancelled
+        self.error = None
+        self.consumers = 0
+        self._changed = asyncio.Condition()
+        if self.messages:
+            # Resume right after the already fetched (newest) messages
+            before = self.messages[-1]
+        self._task = asyncio.create_task(self._paginate(channel, after, before))
+
+    async def _paginate(self, channel, after, before):
+        remaining = HISTORY_SCAN_LIMIT - len(self.messages)
+        try:
+            if remaining > 0:
+                async for message in channel.history(
+                    limit=remaining, after=after, before=before, oldest_first=False
+                ):
+                    self.messages.append(message)
+                    async with self._changed:
+                        self._changed.notify_all()
+            self.complete = True
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            async with self._changed:
+                self._changed.notify_all()
+
+    async def iterate(self):
+        """Yield buffered and upcoming messages, newest first"""
+        index = 0
+        while True:
+            while index < len(self.messages):
+                yield self.messages[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            async with self._changed:
+                if index == len(self.messages) and not self.done:
+                    await self._changed.wait()
+
+    def cancel(self):
+        self._task.cancel()
+
+
+# In-flight and recently fetched history windows, keyed by (channel, window).
+# Cached entries are (expires_at, messages, complete).
+_inflight_history = {}
+_history_cache = OrderedDict()
+
+
+def _window_bound_key(bound):
+    """Hashable snowflake for a history() after/before bound"""
+    if bound is None:
+        return None
+    if isinstance(bound, datetime):
+        return discord.utils.time_snowflake(bound)
+    return bound.id
+
+
+def _cache_history(key, messages, complete):
+    _history_cache[key] = (time.monotonic() + HISTORY_CACHE_TTL, messages, complete)
+    _history_cache.move_to_end(key)
+    while len(_history_cache) > HISTORY_CACHE_SIZE:
+        _history_cache.popitem(last=False)
+
+
+async def _history_window(channel, after, before):
+    """
+    Yield a channel's messages in (after, before), newest first.
 
-async def _search_channel_messages(channel, target_user_ids, search_time, limit):
+    Concurrent identical requests share one underlying pagination, and
+    windows fetched in the last HISTORY_CACHE_TTL seconds are reused; a
+    window that was only partly fetched resumes where it stopped.
+    """
+    key = (channel.id, _window_bound_key(after), _window_bound_key(before))
+
+    shared = _inflight_history.get(key)
+    if shared is not None:
+        increment("history.coalesced")
+    else:
+        prefix = ()
+        cached = _history_cache.pop(key, None)
+        if cached is not None and cached[0] > time.monotonic():
+            if cached[2]:
+                increment("history.cache_hits")
+                _cache_history(key, cached[1], True)
+                for message in cached[1]:
+                    yield message
+                return
+            prefix = cached[1]
+        increment("history.fetches")
+        shared = _inflight_history[key] = _SharedHistory(channel, after, before, prefix)
+
+    shared.consumers += 1
+    try:
+        async for message in shared.iterate():
+            yield message
+    finally:
+        shared.consumers -= 1
+        if shared.consumers == 0:
+            if _inflight_history.get(key) is shared:
+                del _inflight_history[key]
+            if not shared.done:
+                # Nobody needs the rest of this window for now
+                shared.cancel()
+            if shared.error is None:
+                _cache_history(key, list(shared.messages), shared.complete)
+
+
+async def _search_channel_messages(
+    channel, target_user_ids, search_time, limit, before=None
+):
     """Helper function to search messages in a specific channel"""
+    with span("tool.search_channel"):
+        return await _collect_channel_matches(
+            channel, target_user_ids, search_time, limit, before
+        )
+
+
+async def _collect_channel_matches(
+    channel, target_user_ids, search_time, limit, before
+):
     found_messages = []
 
     try:
-        async for message in channel.history(limit=1000, after=search_time):
-            if message.author.id in target_user_ids:
-                found_messages.append(
-                    {
-                        "author": message.author.display_name,
-                        "content": message.content,
-                        "timestamp": message.created_at,
-                        "channel": channel.name,
-                        "message_id": message.id,
-                    }
-                )
-
-                if len(found_messages) >= limit:
-                    break
+        # Past the turn's tool deadline, keep what was found so far
+        async with asyncio.timeout(tool_time_left()):
+            async with aclosing(
+                _history_window(channel, search_time, before)
+            ) as history:
+                async for message in history:
+                    if message.author.id not in target_user_ids:
+                        continue
+
+                    found_messages.append(
+                        {
+                            "author": message.author.display_name,
+                            "content": message.content,
+                            "timestamp": message.created_at,
+                            "channel": channel.name,
+                            "message_id": message.id,
+                        }
+                    )
+
+                    if len(found_messages) >= limit:
+                        break
+    except TimeoutError:
+        increment("tool.scans_truncated")
     except discord.Forbidden:
         pass  # Skip channels we can't access
     except Exception as e:
-        print(f"Error in _search_channel_messages: {e}")
+        logger.error("Error in _search_channel_messages: %s", e)
 
     return found_messages
 
 
-# Tool registry for easy import
+def resolve_user(names: List[str]) -> str:
+    """
+    Find the Discord user IDs behind names, nicknames or mentions.
+
+    Args:
+        names: Names as written by the user, e.g. ["momo", "@Corbeau"]
+
+    Returns:
+        The matching user IDs for each name
+    """
+    with span("tool.resolve_user"):
+        directory = _get_user_directory()
+        lines = []
+        for name in names:
+            matches = directory.resolve(name)
+            if not matches:
+                lines.append(f"{name}: aucun utilisateur trouvé")
+                continue
+            found = ", ".join(
+                f"{display} = {user_id}" for user_id, display, _ in matches
+            )
+            how = matches[0][2]
+            lines.append(
+                f"{name}: {found}" + ("" if how in ("id", "exact") else f" ({how})")
+            )
+        return "\n".join(lines)
+
+
+async def search_messages_by_topic(
+    query: str,
+    user_ids: Optional[List[str]] = None,
+    channel_id: str = "",
+    hours_back: int = 0,
+    limit: int = 10,
+    max_tokens: int = SEARCH_RESULT_TOKENS,
+) -> str:
+    """
+    Find archived messages about a topic, by meaning rather than by author,
+    e.g. what people said about the exam. Answered from the local archive,
+    most relevant first.
+
+    Args:
+        query: Words describing the topic, e.g. "examen de maths revisions"
+        user_ids: Discord user IDs to restrict the search to (optional)
+        channel_id: Channel ID to restrict the search to (optional)
+        hours_back: Only search the last N hours (default: 0, all history)
+        limit: Maximum number of messages to return (default: 10)
+        max_tokens: Approximate size budget of the result (default: 600)
+
+    Returns:
+        Matching messages with their relevance score (0-1)
+    """
+    with span("tool.search_messages_by_topic"):
+        if not _message_archive or _message_archive.semantic is None:
+            return "❌ Recherche par sujet indisponible: l'archive des messages est désactivée."
+        try:
+            users = [int(uid) for uid in user_ids or []]
+            channel = int(channel_id) if channel_id else None
+        except ValueError as e:
+            return f"❌ Erreur dans les paramètres: {str(e)}"
+        since = time.time() - hours_back * 3600 if hours_back > 0 else None
+
+        # Scoring scans the memory-mapped index: keep it off the event loop
+        loop = asyncio.get_running_loop()
+        hits = await loop.run_in_executor(
+            blocking_executor(),
+            lambda: _message_archive.search_semantic(
+                query, users, channel, since, limit
+            ),
+        )
+        messages = _message_archive.get_messages([message_id for message_id, _ in hits])
+        found = [
+            (messages[message_id], score)
+            for message_id, score in hits
+            if message_id in messages
+        ][:limit]
+        return format_topic_results(query, found, max_tokens)
+
+
+def format_topic_results(
+    query: str, found: List[tuple], max_tokens: int = SEARCH_RESULT_TOKENS
+) -> str:
+    """
+    Render (message, score) pairs, most relevant first, in the compact
+    layout of `format_search_results` within roughly `max_tokens` tokens
+    """
+    if not found:
+        return f"❌ Aucun message trouvé sur « {query} » dans l'archive."
+
+    now = datetime.now(timezone.utc)
+    authors = {}
+    channels = {}
+    for message, _ in found:
+        authors.setdefault(message["author"], f"a{len(authors) + 1}")
+        channels.setdefault(message["channel"], f"c{len(channels) + 1}")
+    lines = [
+        f"{len(found)} message(s) sur « {query} » (plus pertinents d'abord, "
+        "score 0-1, âge relatif)",
+        "auteurs: " + " ".join(f"{a}={name}" for name, a in authors.items()),
+        "canaux: " + " ".join(f"{c}=#{name}" for name, c in channels.items()),
+    ]
+    prefixes = [
+        f"{authors[m['author']]} {channels[m['channel']]} "
+        f"{_relative_time(m['timestamp'], now)} {score:.2f}: "
+        for m, score in found
+    ]
+    contents = [" ".join(m["content"].split()) for m, _ in found]
+    available = (
+        max_tokens * 4
+        - sum(len(line) + 1 for line in lines)
+        - sum(len(p) + 1 for p in prefixes)
+    )
+    cap = max(
+        _content_cap([len(c) for c in contents], available),
+        SEARCH_MIN_CONTENT_CHARS,
+    )
+    for prefix, content in zip(prefixes, contents):
+        if len(content) > cap:
+            content = content[: cap - 1] + "…"
+        lines.append(prefix + content)
+    return "\n".join(lines)
+
+
+_WEEKDAYS = ["lun", "mar", "mer", "jeu", "ven", "sam", "dim"]
+
+
+def get_activity_stats(
+    stat: str = "top_users",
+    user_ids: Optional[List[str]] = None,
+    channel_id: str = "",
+    hours_back: int = 168,
+    limit: int = 10,
+) -> str:
+    """
+    Aggregate message activity statistics, answered instantly from precomputed
+    counts (no message search needed).
+
+    Args:
+        stat: One of "top_users" (who posted the most), "top_channels" (where
+            people post the most), "active_hours" (when users are usually
+            active, by hour of day and weekday) or "timeline" (messages per day,
+            per week or month over long windows)
+        user_ids: Discord user IDs to restrict the stats to (optional)
+        channel_id: Channel ID to restrict the stats to (optional)
+        hours_back: Size of the window in hours (default: 168, one week)
+        limit: Maximum number of ranked entries or timeline periods to return
+            (default: 10)
+
+    Returns:
+        Formatted statistics
+    """
+    with span("tool.get_activity_stats"):
+        if not _message_archive:
+            return (
+                "❌ Statistiques indisponibles: l'archive des messages est désactivée."
+            )
+        try:
+            return _activity_stats(stat, user_ids, channel_id, hours_back, limit)
+        except (ValueError, OverflowError) as e:
+            return f"❌ Erreur dans les paramètres: {str(e)}"
+
+
+# (unit, first day of the period holding a day, label format), finest first
+_TIMELINE_PERIODS = [
+    ("jour", lambda day: day, "%d/%m"),
+    ("semaine", lambda day: day - timedelta(days=day.weekday()), "sem. du %d/%m"),
+    ("mois", lambda day: day.replace(day=1), "%m/%Y"),
+]
+
+
+def _group_timeline(days: List[tuple], limit: int) -> Tuple[str, List[tuple]]:
+    """
+    Sum per-day counts into the finest periods that fit in `limit` lines
+    (months otherwise); returns the unit and (label, count) pairs, oldest first
+    """
+    for unit, period_of, label in _TIMELINE_PERIODS:
+        periods: Dict = {}
+        for day, n in days:
+            period = period_of(day)
+            periods[period] = periods.get(period, 0) + n
+        if len(periods) <= limit:
+            break
+    return unit, [(period.strftime(label), n) for period, n in periods.items()]
+
+
+def _activity_stats(stat, user_ids, channel_id, hours_back, limit):
+    rollups = _message_archive.activity
+    end = hour_of(time.time()) + 1
+    hours_back = max(1, int(hours_back))
+    limit = max(1, int(limit))
+    start = end - hours_back
+    users = [int(uid) for uid in user_ids or []]
+    channel = int(channel_id) if channel_id else None
+
+    def user_name(uid):
+        return rollups.user_names.get(uid, str(uid))
+
+    def channel_name(cid):
+        return "#" + rollups.channel_names.get(cid, str(cid))
+
+    scope = f"dernières {hours_back} heures"
+    if users:
+        scope += ", " + ", ".join(user_name(uid) for uid in users)
+    if channel is not None:
+        scope += f", {channel_name(channel)}"
+    first = rollups.first_hour()
+    if first is None:
+        return f"❌ Aucun message ({scope})."
+    note = ""
+    if first > start:
+        note = (
+            f"\n(archive locale depuis le "
+            f"{datetime.fromtimestamp(first * 3600).strftime('%d/%m/%Y')})"
+        )
+        # Nothing is rolled up before, and the hourly arrays stay that size
+        start = first
+
+    if stat in ("top_users", "top_channels"):
+        if stat == "top_users":
+            totals = rollups.totals_by_user(start, end, channel)
+            if users:
+                totals = {uid: n for uid, n in totals.items() if uid in users}
+            label = user_name
+        else:
+            totals = rollups.totals_by_channel(start, end, users or None)
+            if channel is not None:
+                totals = {cid: n for cid, n in totals.items() if cid == channel}
+            label = channel_name
+        if not totals:
+            return f"❌ Aucun message ({scope}).{note}"
+        ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+        lines = [f"📊 Messages ({scope}), total {sum(totals.values())}:"]
+        lines += [
+            f"{rank}. {label(key)}: {count}"
+            for rank, (key, count) in enumerate(ranked[:limit], 1)
+        ]
+        return "\n".join(lines) + note
+
+    counts = rollups.hourly(start, end, users or None, channel)
+    total = int(counts.sum())
+    if not total:
+        return f"❌ Aucun message ({scope}).{note}"
+
+    if stat == "active_hours":
+        by_hour, by_weekday = rollups.by_local_time(start, counts)
+        peaks = sorted(range(24), key=lambda h: by_hour[h], reverse=True)[:3]
+        lines = [
+            f"🕒 Activité ({scope}), {total} messages:",
+            "Heures de pointe: "
+            + ", ".join(f"{h}h-{h + 1}h ({int(by_hour[h])})" for h in peaks),
+            "Par heure: "
+            + " ".join(f"{h}h:{int(n)}" for h, n in enumerate(by_hour) if n),
+            "Par jour: "
+            + " ".join(f"{day}:{int(n)}" for day, n in zip(_WEEKDAYS, by_weekday)),
+        ]
+        return "\n".join(lines) + note
+
+    if stat == "timeline":
+        unit, periods = _group_timeline(rollups.by_local_day(start, counts), limit)
+        lines = [f"📈 Messages par {unit} ({scope}), total {total}:"]
+        if len(periods) > limit:
+            lines.append(f"({len(periods) - limit} périodes plus anciennes omises)")
+        lines += [f"{label}: {n}" for label, n in periods[-limit:]]
+        return "\n".join(lines) + note
+
+    raise ValueError(
+        f"stat inconnue '{stat}' (top_users, top_channels, active_hours, timeline)"
+    )
+
+
+# Tools answered on the event loop: they return at once, so they never wait
+# for a pool thread behind slow tools
+_INLINE_TOOLS = (get_current_time, get_time_ago)
+
+# Tool registry for easy import, wrapped with their concurrency caps
 DISCORD_TOOLS = [
-    get_current_time,
-    get_time_ago,
-    search_user_messages,
+    dispatched(tool, inline=tool in _INLINE_TOOLS)
+    for tool in (
+        get_current_time,
+        get_time_ago,
+        resolve_user,
+        search_user_messages,
+        search_messages_by_topic,
+        get_activity_stats,
+    )
 ]
@@ -0,0 +1,185 @@
+"""
+User directory
+Name -> Discord ID index built from the alias config file and the guild member
+cache, with accent/case folding plus prefix and fuzzy matching, so the agent
+can resolve "momo" or "@Corbeau" locally instead of carrying a mapping table
+in its prompt
+"""
+
+from __future__ import annotations
+
+import bisect
+import difflib
+import json
+import logging
+import os
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# JSON object of alias -> user ID
+USER_MAPPING_PATH = os.getenv(
+    "USER_MAPPING_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "config", "user_mapping.json"),
+)
+# Extra aliases as inline JSON, merged over the file
+USER_ID_MAPPING = os.getenv("USER_ID_MAPPING", "")
+
+# Minimum similarity for fuzzy matches (difflib ratio)
+FUZZY_CUTOFF = 0.75
+
+_MENTION = re.compile(r"^<@!?(\d{15,20})>$")
+_RAW_ID = re.compile(r"^\d{15,20}$")
+
+Match = Tuple[int, str, str]  # (user_id, name, how it matched)
+
+
+def fold(text: str) -> str:
+    """Lookup key: lowercase, accents removed, spaces collapsed, no leading @"""
+    text = unicodedata.normalize("NFKD", text.strip().lstrip("@"))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.casefold().split())
+
+
+class UserDirectory:
+    """
+    Index of the names users are known by.
+
+    Aliases from the config file take precedence over member names (display
+    name, global name, username). Lookups try, in order: a mention or raw ID,
+    an exact folded key, keys starting with the query, then fuzzy matching.
+    """
+
+    def __init__(self, aliases: Optional[Dict[str, str]] = None):
+        self._aliases: Dict[str, Set[int]] = {}
+        self._members: Dict[str, Set[int]] = {}
+        self._member_keys: Dict[int, Set[str]] = {}
+        # Display name per user: first configured alias, else member name
+        self.names: Dict[int, str] = {}
+        for alias, user_id in (aliases or {}).items():
+            user_id = int(user_id)
+            self._aliases.setdefault(fold(alias), set()).add(user_id)
+            self.names.setdefault(user_id, alias)
+        self._configured = set(self.names)
+        self._keys: List[str] = []
+        self._dirty = True
+
+    @classmethod
+    def from_config(
+        cls, path: str = USER_MAPPING_PATH, inline: str = USER_ID_MAPPING
+    ) -> "UserDirectory":
+        """Directory seeded from the alias file and USER_ID_MAPPING"""
+        aliases: Dict[str, str] = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                aliases.update(json.load(f))
+        except FileNotFoundError:
+            logger.debug("No user mapping file at %s", path)
+        except (OSError, ValueError) as e:
+            logger.error("Invalid user mapping file %s: %s", path, e)
+        if inline:
+            try:
+                aliases.update(json.loads(inline))
+            except ValueError as e:
+                logger.error("Invalid USER_ID_MAPPING: %s", e)
+        return cls(aliases)
+
+    # ------------------------------------------------------------------
+    # Member cache
+    # ------------------------------------------------------------------
+
+    def add_member(self, member) -> None:
+        """Index (or re-index after a rename) a guild member or user"""
+        names = {
+            getattr(member, attribute, None)
+            for attribute in ("display_name", "global_name", "name", "nick")
+        }
+        keys = {fold(name) for name in names if name}
+        keys.discard("")
+        if self._member_keys.get(member.id) == keys:
+            return
+        self.remove_member(member)
+        for key in keys:
+            self._members.setdefault(key, set()).add(member.id)
+        self._member_keys[member.id] = keys
+        if member.id not in self._configured:
+            self.names[member.id] = member.display_name
+        self._dirty = True
+
+    def remove_member(self, member) -> None:
+        for key in self._member_keys.pop(member.id, ()):
+            ids = self._members.get(key)
+            if ids is not None:
+                ids.discard(member.id)
+                if not ids:
+                    del self._members[key]
+        self._dirty = True
+
+    def load_guilds(self, guilds: Iterable) -> int:
+        """Index every cached member of the given guilds; returns the count"""
+        count = 0
+        for guild in guilds:
+            for member in getattr(guild, "members", ()):
+                if not getattr(member, "bot", False):
+                    self.add_member(member)
+                    count += 1
+        return count
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def _sorted_keys(self) -> List[str]:
+        if self._dirty:
+            self._keys = sorted(self._aliases.keys() | self._members.keys())
+            self._dirty = False
+        return self._keys
+
+    def _ids(self, key: str) -> Set[int]:
+        return self._aliases.get(key) or self._members.get(key, set())
+
+    def resolve(self, query: str, limit: int = 3) -> List[Match]:
+        """
+        Users matching a name, nickname, mention or ID, best match first.
+
+        Returns:
+            (user_id, name, how) tuples, `how` being "id", "exact",
+            "prefix" or "fuzzy"
+        """
+        query = query.strip()
+        mention = _MENTION.match(query)
+        if mention or _RAW_ID.match(query):
+            user_id = int(mention.group(1) if mention else query)
+            return [(user_id, self.names.get(user_id, query), "id")]
+
+        key = fold(query)
+        if not key:
+            return []
+        ids = self._ids(key)
+        if ids:
+            return self._matches(ids, "exact", limit)
+
+        keys = self._sorted_keys()
+        start = bisect.bisect_left(keys, key)
+        prefixed = set()
+        while start < len(keys) and keys[start].startswith(key):
+            prefixed |= self._ids(keys[start])
+            start += 1
+        if prefixed:
+            return self._matches(prefixed, "prefix", limit)
+
+        fuzzy: List[int] = []
+        for candidate in difflib.get_close_matches(
+            key, keys, n=limit, cutoff=FUZZY_CUTOFF
+        ):
+            fuzzy.extend(i for i in self._ids(candidate) if i not in fuzzy)
+        return [(i, self.names.get(i, str(i)), "fuzzy") for i in fuzzy[:limit]]
+
+    def _matches(self, ids: Set[int], how: str, limit: int) -> List[Match]:
+        ordered = sorted(ids, key=lambda i: self.names.get(i, ""))
+        return [(i, self.names.get(i, str(i)), how) for i in ordered[:limit]]
+
+    def __len__(self) -> int:
+        return len(self.names)
@@ -1,30 +1,259 @@
-import discord
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
-from src.agent.agent import discord_agent
-from src.agent.tools.tools import set_discord_client
 
-# Load environment variables
+# Load environment variables before the modules below read their settings
 load_dotenv()
+
+from src import footprint, startup  # noqa: E402
+
+footprint.apply_low_memory_defaults()
+footprint.start_tracing()
+
+with startup.phase("import_discord"):
+    import discord
+
+with startup.phase("import_bot_modules"):
+    from src import metrics
+    from src.admission import AdmissionController, Rejected
+    from src.agent.deadline import AGENT_TURN_TIMEOUT, deadline_scope
+    from src.agent.tools.archive import MessageArchive
+    from src.agent.tools.dispatch import dispatched
+    from src.agent.tools.tools import (
+        get_activity_stats,
+        resolve_user,
+        search_messages_by_topic,
+        search_user_messages,
+        set_discord_client,
+        set_message_archive,
+        set_user_directory,
+    )
+    from src.agent.tools.users import UserDirectory
+    from src.coalesce import Burst, MentionCoalescer
+    from src.event_loop import LoopLagMonitor
+    from src.outbound import FINAL, OutboundScheduler
+    from src.replies import ProgressiveReply
+    from src.workers import BOT_WORKERS, WorkerPool
+
 DISCORD_BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
+MESSAGE_ARCHIVE_PATH = os.getenv("MESSAGE_ARCHIVE_PATH", "data/messages.db")
+ARCHIVE_BACKFILL_HOURS = int(os.getenv("ARCHIVE_BACKFILL_HOURS", "720"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Seconds a mention waits for the agent while the bot is still starting up
+AGENT_READY_TIMEOUT = float(os.getenv("AGENT_READY_TIMEOUT", "60"))
+# Privileged intent (enable it in the developer portal first): full member
+# list and rename events for the user directory
+DISCORD_MEMBERS_INTENT = os.getenv("DISCORD_MEMBERS_INTENT", "false").lower() == "true"
+# Let discord.py pick the shard count and run every shard in this process
+DISCORD_AUTOSHARD = os.getenv("DISCORD_AUTOSHARD", "false").lower() == "true"
+# Messages kept in discord.py's cache (edits and deletes are handled from raw
+# events, 0 disables the cache)
+DISCORD_MAX_MESSAGES = int(os.getenv("DISCORD_MAX_MESSAGES", "1000"))
+
+logger = logging.getLogger(__name__)
 
 # Set up Discord client with necessary intents
 intents = discord.Intents.default()
 intents.messages = True
 intents.message_content = True
-client = discord.Client(intents=intents)
+intents.members = DISCORD_MEMBERS_INTENT
+client_options = {"intents": intents, "max_messages": DISCORD_MAX_MESSAGES or None}
+if footprint.LOW_MEMORY:
+    # Keep no member objects beyond our own and don't download member lists
+    # at startup; the user directory gets names from uncached chunks instead
+    client_options["member_cache_flags"] = discord.MemberCacheFlags.none()
+    client_options["chunk_guilds_at_startup"] = False
+if DISCORD_AUTOSHARD:
+    client = discord.AutoShardedClient(**client_options)
+else:
+    client = discord.Client(**client_options)
+
+# Local message archive used by the search tools
+message_archive = MessageArchive(MESSAGE_ARCHIVE_PATH) if MESSAGE_ARCHIVE_PATH else None
+_archive_sync_task = None
+
+# Name -> ID index for the resolve_user tool, kept up to date with members
+user_directory = UserDirectory.from_config()
+set_user_directory(user_directory)
+_session_cleanup_task = None
+_metrics_tasks = None
+_member_index_task = None
+
+# Agent turns run in worker processes when BOT_WORKERS > 0; tools needing the
+# Discord client or the archive still run here
+worker_pool = (
+    WorkerPool(
+        BOT_WORKERS,
+        gateway_tools=[
+            dispatched(tool)
+            for tool in (
+                resolve_user,
+                search_user_messages,
+                search_messages_by_topic,
+                get_activity_stats,
+            )
+        ],
+    )
+    if BOT_WORKERS > 0
+    else None
+)
+# Resolves to the agent (or the worker pool) once it is built, see _get_agent
+_agent_task = None
+
+# Caps concurrent agent turns and rate-limits users and channels
+admission = AdmissionController()
+
+# Merges quick consecutive mentions from a user in a channel into one turn
+coalescer = MentionCoalescer()
+
+# Owns every message send and edit: per-channel pacing, edit coalescing,
+# final answers first, placeholders only for slow answers
+outbound = OutboundScheduler()
+
+# Cache sizes shown in the footprint report (GET /footprint on the metrics port)
+footprint.register_probe("discord messages", lambda: len(client.cached_messages))
+footprint.register_probe("discord users", lambda: len(client.users))
+footprint.register_probe("user directory", lambda: len(user_directory))
+footprint.register_probe("mention bursts", lambda: len(coalescer))
+footprint.register_probe("outbound writes", outbound.pending)
+if message_archive is not None and message_archive.semantic is not None:
+    footprint.register_probe(
+        "semantic index rows", lambda: len(message_archive.semantic)
+    )
+metrics.add_page("/footprint", footprint.render_report)
+
+# Endings of replies to turns cut short, and how the streamed text is treated
+STOP_NOTES = {
+    "timeout": "⏱️ Desole, ca prend trop de temps. Reessaie ou precise ta question.",
+    "reasked": "↪️ Je reprends avec ta nouvelle question.",
+    "deleted": "🗑️ Question supprimee.",
+}
+STOP_MODES = {
+    "timeout": {"keep_text": True},
+    "reasked": {"keep_text": False, "quiet": True},
+    "deleted": {"keep_text": False, "quiet": True},
+}
+
+# Immediate replies when a mention is turned away
+REJECTION_REPLIES = {
+    "user_rate": "Doucement! Laisse moi souffler un peu avant de me redemander.",
+    "channel_rate": "Trop de demandes dans ce salon, reessaie dans un instant.",
+    "busy": "Je suis deborde la, reessaie dans un instant.",
+}
+
+
+def _load_agent():
+    """Import google.adk and build the agent (slow, runs in a thread)"""
+    with startup.phase("import_agent"):
+        from src.agent.agent import discord_agent, preload
+    with startup.phase("preload_agent"):
+        preload()
+    return discord_agent
+
+
+async def _start_agent():
+    try:
+        if worker_pool:
+            # Agent workers hold the sessions (and clean them up)
+            with startup.phase("start_workers"):
+                await worker_pool.start()
+            agent = worker_pool
+        else:
+            agent = await asyncio.to_thread(_load_agent)
+            # Periodically evict idle sessions so memory stays bounded
+            global _session_cleanup_task
+            if _session_cleanup_task is None:
+                _session_cleanup_task = asyncio.create_task(agent.run_session_cleanup())
+            footprint.register_probe("sessions", agent.get_session_count)
+            if agent.response_cache is not None:
+                footprint.register_probe(
+                    "response cache", lambda: agent.response_cache.stats()["entries"]
+                )
+    except Exception:
+        logger.exception("Failed to start the agent")
+        raise
+    startup.mark("agent_ready")
+    print("ADK Advisory Agent is ready to help!")
+    return agent
+
+
+def _start_agent_task():
+    global _agent_task
+    if _agent_task is None or (
+        _agent_task.done()
+        and (_agent_task.cancelled() or _agent_task.exception() is not None)
+    ):
+        # First call, or the previous attempt failed: (re)try
+        _agent_task = asyncio.create_task(_start_agent())
+
+
+async def _get_agent():
+    """The agent, waiting (up to AGENT_READY_TIMEOUT) while it is being built"""
+    _start_agent_task()
+    return await asyncio.wait_for(asyncio.shield(_agent_task), AGENT_READY_TIMEOUT)
+
+
+@client.event
+async def setup_hook():
+    """Starts building the agent while the gateway connection is set up."""
+    _start_agent_task()
 
 
 @client.event
 async def on_ready():
     """Prints a message to the console when the bot is connected to Discord."""
     print(f"{client.user} has connected to Discord!")
-    print("ADK Advisory Agent is ready to help!")
+    if startup.mark("on_ready"):
+        startup.log_report("connected")
 
     # Set the Discord client reference for tools
     set_discord_client(client)
     print("Discord client has been set for tools - message search is now available!")
 
+    members = user_directory.load_guilds(client.guilds)
+    print(f"User directory: {len(user_directory)} users ({members} cached members)")
+    global _member_index_task
+    if footprint.LOW_MEMORY and DISCORD_MEMBERS_INTENT and _member_index_task is None:
+        _member_index_task = asyncio.create_task(_index_members(client.guilds))
+
+    # Catch up and backfill the message archive once per process
+    global _archive_sync_task
+    if message_archive and _archive_sync_task is None:
+        set_message_archive(message_archive)
+        _archive_sync_task = asyncio.create_task(
+            message_archive.sync_guilds(client.guilds, ARCHIVE_BACKFILL_HOURS)
+        )
+        print(f"Message archive sync started ({MESSAGE_ARCHIVE_PATH})")
+
+    # Expose latency histograms locally, log a periodic summary and watch
+    # for code blocking the event loop
+    global _metrics_tasks
+    if _metrics_tasks is None:
+        _metrics_tasks = [
+            asyncio.create_task(metrics.log_summary_periodically()),
+            asyncio.create_task(metrics.start_metrics_server()),
+            asyncio.create_task(LoopLagMonitor().run()),
+            asyncio.create_task(footprint.log_report_periodically()),
+        ]
+
+
+async def _index_members(guilds):
+    """
+    Low-memory mode: feed the user directory from member chunks that
+    discord.py doesn't cache, one guild at a time
+    """
+    for guild in guilds:
+        try:
+            members = await guild.chunk(cache=False)
+        except Exception as e:
+            logger.error("Member chunk of %s failed: %s", guild.name, e)
+            continue
+        for member in members:
+            if not member.bot:
+                user_directory.add_member(member)
+    print(f"User directory: {len(user_directory)} users after member chunks")
+
 
 @client.event
 async def on_message(message):
@@ -34,43 +263,175 @@ async def on_message(message):
     If the bot is mentioned, it sends the message content to the ADK agent
     and responds with the agent's advice.
     """
+    if message_archive and message.guild:
+        message_archive.ingest(message)
+
     if message.author == client.user:
         return
 
+    if message.guild and not message.author.bot:
+        # Authors are indexed even without the members intent
+        user_directory.add_member(message.author)
+
     if client.user.mentioned_in(message):
         # Special handling for specific users (keeping the original functionality)
         if (
             message.author.id == 306827479484465172
             or message.author.id == 280098879293095936
         ):
-            await message.channel.send("ftg sale merde a la niche")
+            await outbound.send(message.channel, "ftg sale merde a la niche")
             return
 
         # Get the message content without the bot mention
         message_content = message.content.replace(f"<@{client.user.id}>", "").strip()
 
-        # If no content after removing mention, provide a helpful message
-        if not message_content:
-            message_content = "Salut! Comment puis-je t'aider aujourd'hui?"
+        metrics.increment("bot.mentions")
+        user_id = str(message.author.id)
+        key = (user_id, message.channel.id)
+        burst = coalescer.add(key, message, message_content)
+        if burst is None:
+            # Answered together with the earlier mentions of the burst
+            return
+
+        async with coalescer.turn(key, burst):
+            if burst.stop_reason:
+                # Deleted, or asked again, before its turn started
+                return
+            # If no content after removing mentions, provide a helpful message
+            message_content = (
+                burst.text or "Salut! Comment puis-je t'aider aujourd'hui?"
+            )
+            await _answer(message, user_id, message_content, burst)
+
+
+async def _stream_reply(agent, reply, user_id: str, message_content: str):
+    """Feeds the agent's streamed answer to the reply, under the turn deadline"""
+    # Tools called during the turn see the deadline and stop scans in time
+    with deadline_scope(AGENT_TURN_TIMEOUT):
+        async for chunk in agent.stream_advice(user_id, message_content):
+            await reply.feed(chunk)
 
-        # Send a "thinking" message to show the bot is processing
-        thinking_message = await message.channel.send("🤔 Mhh laisse moi reflechir...")
+
+async def _run_turn(burst: Burst, agent, reply, user_id: str, message_content: str):
+    """Streams the turn into the reply; returns why it was cut short, if it was"""
+    if burst.stop_reason:
+        return burst.stop_reason
+    burst.task = asyncio.create_task(
+        _stream_reply(agent, reply, user_id, message_content)
+    )
+    try:
+        done, _ = await asyncio.wait({burst.task}, timeout=AGENT_TURN_TIMEOUT)
+    finally:
+        # Also if this handler is cancelled
+        burst.task.cancel()
+    if not done:
+        metrics.increment("bot.turn_timeouts")
+        logger.warning(
+            "Turn of user %s timed out after %ss", user_id, AGENT_TURN_TIMEOUT
+        )
+    # Let a cancelled turn clean up its session
+    await asyncio.wait({burst.task})
+    if burst.task.cancelled():
+        return burst.stop_reason or "timeout"
+    burst.task.result()
+    return None
+
+
+async def _answer(message, user_id: str, message_content: str, burst: Burst):
+    """
+    Runs one agent turn for a mention (or burst of mentions) and replies.
+
+    The turn is cancelled past AGENT_TURN_TIMEOUT, keeping what was streamed,
+    or when the coalescer stops the burst (mention deleted or asked again).
+    """
+    try:
+        ticket = admission.reserve(user_id, str(message.channel.id))
+    except Rejected as rejected:
+        logger.info("Turned away user %s: %s", user_id, rejected.reason)
+        await outbound.send(message.channel, REJECTION_REPLIES[rejected.reason])
+        return
+
+    async with ticket:
+        # A "thinking" message, shown unless the answer comes right away
+        thinking_message = outbound.placeholder(
+            message.channel,
+            (
+                "⏳ Y'a du monde, je reviens vers toi..."
+                if ticket.queued
+                else "🤔 Mhh laisse moi reflechir..."
+            ),
+        )
 
         try:
-            # Get advice from the ADK agent
-            user_id = str(message.author.id)
-            advice = await discord_agent.get_advice(user_id, message_content)
+            await ticket.wait()
+            # Mentions arriving during startup wait for the agent here
+            agent = await _get_agent()
+            # Stream advice from the ADK agent into the thinking message
+            reply = ProgressiveReply(thinking_message)
+            stopped = await _run_turn(burst, agent, reply, user_id, message_content)
+            if stopped:
+                await reply.stop(STOP_NOTES[stopped], **STOP_MODES[stopped])
+                return
+            await reply.finish(fallback="Desole chui occupe.")
+            if startup.mark("first_answer"):
+                startup.log_report("first answer")
 
-            # Edit the thinking message with the agent's response
-            await thinking_message.edit(content=advice)
+        except asyncio.TimeoutError:
+            logger.error("Agent still not ready after %ss", AGENT_READY_TIMEOUT)
+            await thinking_message.update(
+                "Je demarre encore, reessaie dans un instant.", FINAL
+            )
 
         except Exception as e:
-            print(f"Error getting advice from agent: {e}")
-            await thinking_message.edit(
-                content="Sorry, I'm having trouble processing your request right now. Please try again later."
+            logger.error("Error getting advice from agent: %s", e)
+            await thinking_message.update(
+                "Sorry, I'm having trouble processing your request right now. Please try again later.",
+                FINAL,
             )
 
 
+@client.event
+async def on_member_join(member):
+    """Indexes new members in the user directory."""
+    if not member.bot:
+        user_directory.add_member(member)
+
+
+@client.event
+async def on_member_update(before, after):
+    """Re-indexes members whose nickname changed."""
+    if not after.bot:
+        user_directory.add_member(after)
+
+
+@client.event
+async def on_user_update(before, after):
+    """Re-indexes users whose username or global name changed."""
+    if not after.bot:
+        user_directory.add_member(after)
+
+
+@client.event
+async def on_member_remove(member):
+    """Forgets members who left (configured aliases are kept)."""
+    user_directory.remove_member(member)
+
+
+@client.event
+async def on_raw_message_edit(payload):
+    """Keeps archived message content in sync with edits."""
+    if message_archive and "content" in payload.data:
+        message_archive.update_content(payload.message_id, payload.data["content"])
+
+
+@client.event
+async def on_raw_message_delete(payload):
+    """Drops deleted messages from the archive and cancels their turns."""
+    coalescer.message_deleted(payload.message_id)
+    if message_archive:
+        message_archive.delete(payload.message_id)
+
+
 def main():
     """Main function to run the Discord bot"""
     if not DISCORD_BOT_TOKEN:
@@ -78,12 +439,18 @@ def main():
         print("Please make sure you have a .env file with your Discord bot token.")
         return
 
+    logging.basicConfig(
+        level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
     print("Starting Discord ADK Bot...")
     try:
         # Run the bot
         client.run(DISCORD_BOT_TOKEN)
     except Exception as e:
-        print(f"Error running bot: {e}")
+        logger.error("Error running bot: %s", e)
+    finally:
+        if worker_pool:
+            worker_pool.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+"""
+Mention coalescing
+Users often split a question across a few quick mentions. A mention waits
+for COALESCE_WINDOW of quiet before its turn starts, and the mentions sent
+meanwhile join it; mentions arriving while a turn runs are queued and merged
+the same way into the next turn, which answers them together. With
+CANCEL_ON_REASK a new mention cancels the running turn instead and the next
+turn answers both; deleting the mentions of a turn cancels it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Hashable, List, Optional
+
+from .agent.locks import KeyedLock
+from .metrics import increment, observe
+
+# Quiet time closing a burst of mentions (0 answers every mention separately
+# and at once)
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", "1"))
+# Longest a burst keeps waiting for follow-ups, from its first mention
+COALESCE_MAX_WAIT = float(os.getenv("COALESCE_MAX_WAIT", "5"))
+# Cancel a running turn when its user mentions the bot again in the channel
+# (by default the new mention is queued as the next turn)
+CANCEL_ON_REASK = os.getenv("CANCEL_ON_REASK", "false").lower() == "true"
+
+
+class Burst:
+    """Mentions answered together by one agent turn"""
+
+    def __init__(self, message, text: str):
+        self.messages: List = [message]
+        self.texts: List[str] = [text]
+        self.started = self.updated = time.monotonic()
+        # Task streaming the answer, set by the caller once the turn runs
+        self.task: Optional[asyncio.Task] = None
+        # Why the turn was cancelled ("reasked", "deleted"), if it was
+        self.stop_reason: Optional[str] = None
+
+    def add(self, message, text: str) -> None:
+        self.messages.append(message)
+        self.texts.append(text)
+        self.updated = time.monotonic()
+
+    @property
+    def text(self) -> str:
+        """The mentions' texts, one per line (empty mentions skipped)"""
+        return "\n".join(text for text in self.texts if text)
+
+    def remove(self, message_id: int) -> bool:
+        """Drop a mention from the burst; whether it was part of it"""
+        for index, message in enumerate(self.messages):
+            if message.id == message_id:
+                del self.messages[index]
+                del self.texts[index]
+                return True
+        return False
+
+    def stop(self, reason: str) -> None:
+        """Cancel the turn, or keep it from starting"""
+        if self.stop_reason is None:
+            self.stop_reason = reason
+            increment(f"coalesce.stopped_{reason}")
+        if self.task is not None:
+            self.task.cancel()
+
+
+class MentionCoalescer:
+    """
+    Per-key (user, channel) bursts of mentions.
+
+    `add()` returns a Burst for the first mention of a burst; the caller
+    answers it inside `turn()`, unless its `stop_reason` is set. Later
+    mentions join the burst while it waits for the key's previous turn and
+    then for quiet, and `add()` returns None for them.
+    """
+
+    def __init__(
+        self,
+        window: float = COALESCE_WINDOW,
+        max_wait: float = COALESCE_MAX_WAIT,
+        cancel_on_reask: bool = CANCEL_ON_REASK,
+    ):
+        self.window = window
+        self.max_wait = max_wait
+        self.cancel_on_reask = cancel_on_reask
+        self._open: Dict[Hashable, Burst] = {}
+        self._running: Dict[Hashable, Burst] = {}
+        self._turns = KeyedLock()
+
+    def add(self, key: Hashable, message, text: str) -> Optional[Burst]:
+        burst = self._open.get(key)
+        if burst is not None:
+            burst.add(message, text)
+            increment("coalesce.merged")
+            return None
+        burst = Burst(message, text)
+        running = self._running.get(key)
+        if self.cancel_on_reask and running is not None and not running.stop_reason:
+            # Asked again before the answer: answer both mentions at once
+            running.stop("reasked")
+            burst.messages[:0] = running.messages
+            burst.texts[:0] = running.texts
+        if self.window > 0:
+            self._open[key] = burst
+        return burst
+
+    def message_deleted(self, message_id: int) -> None:
+        """Forget a deleted mention; a turn left without mentions is cancelled"""
+        for burst in (*self._open.values(), *self._running.values()):
+            if burst.remove(message_id) and not burst.messages:
+                burst.stop("deleted")
+
+    @asynccontextmanager
+    async def turn(self, key: Hashable, burst: Burst):
+        """
+        Wait for the key's previous turn, if any, and then for the burst to
+        go quiet, then hold the key until the block exits; the burst is
+        complete inside
+        """
+        if self.window <= 0:
+            with self._run(key, burst):
+                yield burst
+            return
+        async with self._turns.hold(key):
+            try:
+                await self._settle(burst)
+            finally:
+                if self._open.get(key) is burst:
+                    del self._open[key]
+            increment("coalesce.turns")
+            observe("coalesce.wait", (time.monotonic() - burst.started) * 1000)
+            with self._run(key, burst):
+                yield burst
+
+    @contextmanager
+    def _run(self, key: Hashable, burst: Burst):
+        self._running[key] = burst
+        try:
+            yield
+        finally:
+            if self._running.get(key) is burst:
+                del self._running[key]
+
+    async def _settle(self, burst: Burst) -> None:
+        while True:
+            deadline = min(burst.updated + self.window, burst.started + self.max_wait)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining)
+
+    def __len__(self) -> int:
+        return len(self._open)
@@ -0,0 +1,162 @@
+"""
+Event loop health
+A bounded thread pool for the blocking calls left on the agent path, and a
+lag monitor measuring how late the loop runs scheduled callbacks, which logs
+the code holding the loop when it stalls
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterator, Optional, TypeVar
+
+from .metrics import increment, observe
+
+logger = logging.getLogger(__name__)
+
+# Threads for blocking work taken off the event loop (sync runner, sync tools)
+BLOCKING_THREADS = int(os.getenv("BLOCKING_THREADS", "4"))
+# How often the lag monitor wakes up, and the lag reported as a stall
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.25"))
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100"))
+
+# Frames of the blocked stack included in stall reports
+_STALL_STACK_FRAMES = 8
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def blocking_executor() -> ThreadPoolExecutor:
+    """The shared pool for blocking calls, created on first use"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=BLOCKING_THREADS, thread_name_prefix="blocking"
+        )
+    return _executor
+
+
+async def iterate_in_thread(
+    make_iterator: Callable[[], Iterator[T]],
+) -> AsyncIterator[T]:
+    """
+    Consume a blocking iterator on the blocking pool, yielding its items on
+    the event loop as they are produced.
+
+    Leaving the `async for` early stops the iteration after the item being
+    produced; exceptions raised by the iterator are re-raised here.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    finished = object()
+
+    def put(item, error=None) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            stop.set()  # The loop is closed, nobody is listening anymore
+
+    def produce() -> None:
+        try:
+            for item in make_iterator():
+                put(item)
+                if stop.is_set():
+                    return
+        except BaseException as e:
+            put(finished, e)
+        else:
+            put(finished)
+
+    loop.run_in_executor(blocking_executor(), produce)
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is finished:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+class LoopLagMonitor:
+    """
+    Measures event loop scheduling delay.
+
+    A task sleeps `interval` seconds at a time and records how late it wakes
+    up in the `loop.lag` histogram. A watchdog thread checks that the task
+    keeps running; when it has been held up past the threshold, the thread
+    logs the loop thread's stack and current task, i.e. the code blocking the
+    loop while it is still blocking it.
+    """
+
+    def __init__(
+        self,
+        interval: float = LOOP_LAG_INTERVAL,
+        threshold_ms: float = LOOP_LAG_THRESHOLD_MS,
+    ):
+        self.interval = interval
+        self.threshold = threshold_ms / 1000
+        self._beat = time.monotonic()
+        self._loop = None
+        self._thread_id = None
+        self._stopped = threading.Event()
+
+    async def run(self) -> None:
+        """Monitor the running loop; meant to run as a background task"""
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        threading.Thread(target=self._watch, daemon=True, name="loop-watchdog").start()
+        try:
+            while True:
+                started = time.monotonic()
+                await asyncio.sleep(self.interval)
+                self._beat = now = time.monotonic()
+                lag = now - started - self.interval
+                observe("loop.lag", lag * 1000)
+                if lag > self.threshold:
+                    increment("loop.stalls")
+        finally:
+            self._stopped.set()
+
+    def _watch(self) -> None:
+        reported = None
+        while not self._stopped.wait(self.threshold / 2):
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked <= self.threshold or reported == beat:
+                continue
+            reported = beat  # Once per stall
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            task = asyncio.current_task(self._loop)
+            stack = "".join(
+                traceback.format_stack(frame, limit=_STALL_STACK_FRAMES)
+            ).rstrip()
+            logger.warning(
+                "Event loop blocked for over %.0f ms (task %s), stack:\n%s",
+                blocked * 1000,
+                task.get_name() + " " + _coroutine_name(task) if task else "none",
+                stack,
+            )
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+def _coroutine_name(task: asyncio.Task) -> str:
+    coroutine = task.get_coro()
+    return getattr(coroutine, "__qualname__", repr(coroutine))
@@ -0,0 +1,205 @@
+"""
+Memory footprint
+Low-memory mode (smaller defaults for every cache), and a footprint report
+that breaks the process RSS down by subsystem from tracemalloc snapshots,
+alongside the size of the main caches, served on demand and logged
+periodically
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import resource
+import sysconfig
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .metrics import set_gauge
+
+logger = logging.getLogger(__name__)
+
+# Smaller caches everywhere (see LOW_MEMORY_DEFAULTS), for small hosts
+LOW_MEMORY = os.getenv("LOW_MEMORY", "false").lower() == "true"
+# Trace Python allocations from startup for the per-subsystem breakdown
+# (costs some CPU and roughly doubles the memory of traced objects)
+FOOTPRINT_TRACE = os.getenv("FOOTPRINT_TRACE", "false").lower() == "true"
+# Stack frames kept per allocation, used to attribute it to a subsystem
+FOOTPRINT_FRAMES = int(os.getenv("FOOTPRINT_FRAMES", "6"))
+# Seconds between footprint reports in the log (0 disables them)
+FOOTPRINT_LOG_INTERVAL = int(os.getenv("FOOTPRINT_LOG_INTERVAL", "3600"))
+
+# Settings applied by LOW_MEMORY unless set explicitly
+LOW_MEMORY_DEFAULTS = {
+    # discord.py message cache (edits and deletes use raw events)
+    "DISCORD_MAX_MESSAGES": "0",
+    # Agent sessions held in memory and loaded from the session store
+    "SESSION_MAX_COUNT": "100",
+    "SESSION_MAX_BYTES": str(10 * 1024 * 1024),
+    "SESSION_HOT_SET": "25",
+    "SESSION_CLEANUP_INTERVAL": "120",
+    # Answer and history window caches
+    "RESPONSE_CACHE_SIZE": "200",
+    "HISTORY_CACHE_SIZE": "16",
+    # Thread stacks
+    "BLOCKING_THREADS": "2",
+}
+
+# (subsystem, path fragments) matched against allocation frames, innermost
+# first; the first frame matching something other than the standard library
+# decides
+_SUBSYSTEMS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("sessions", ("/src/agent/session", "/src/agent/sessions.py")),
+    (
+        "archive",
+        (
+            "/src/agent/tools/archive.py",
+            "/src/agent/tools/activity.py",
+            "/src/agent/tools/semantic.py",
+        ),
+    ),
+    ("user directory", ("/src/agent/tools/users.py",)),
+    ("message search", ("/src/agent/tools/",)),
+    ("agent", ("/src/agent/",)),
+    ("bot", ("/src/",)),
+    ("discord.py", ("/discord/",)),
+    ("aiohttp", ("/aiohttp/", "/yarl/", "/multidict/")),
+    ("google adk", ("/google/adk/",)),
+    ("google genai", ("/google/genai/", "/google/auth/", "/httpx/", "/httpcore/")),
+    ("pydantic", ("/pydantic/", "/pydantic_core/")),
+    ("numpy", ("/numpy/",)),
+]
+_STDLIB = sysconfig.get_paths()["stdlib"]
+
+# name -> callable returning the current size of a cache
+_probes: Dict[str, Callable[[], float]] = {}
+
+
+def apply_low_memory_defaults() -> None:
+    """
+    Fill in the LOW_MEMORY settings; call before importing the modules that
+    read them
+    """
+    if LOW_MEMORY:
+        for name, value in LOW_MEMORY_DEFAULTS.items():
+            os.environ.setdefault(name, value)
+
+
+def start_tracing() -> None:
+    """Start tracemalloc if FOOTPRINT_TRACE is set; call as early as possible"""
+    if FOOTPRINT_TRACE and not tracemalloc.is_tracing():
+        tracemalloc.start(FOOTPRINT_FRAMES)
+
+
+def register_probe(name: str, probe: Callable[[], float]) -> None:
+    """Report `probe()` (an entry count) as the size of a cache"""
+    _probes[name] = probe
+
+
+def rss_bytes() -> Tuple[int, int]:
+    """Current and peak resident set size"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize(), peak
+    except OSError:
+        return peak, peak
+
+
+def _classify(filename: str, cache: Dict[str, Optional[str]]) -> Optional[str]:
+    if filename not in cache:
+        cache[filename] = next(
+            (
+                name
+                for name, fragments in _SUBSYSTEMS
+                if any(fragment in filename for fragment in fragments)
+            ),
+            None,
+        )
+    return cache[filename]
+
+
+def subsystem_sizes(snapshot: tracemalloc.Snapshot) -> Dict[str, int]:
+    """Traced bytes per subsystem"""
+    sizes: Dict[str, int] = {}
+    cache: Dict[str, Optional[str]] = {}
+    for stat in snapshot.statistics("traceback"):
+        subsystem = None
+        for frame in reversed(stat.traceback):
+            subsystem = _classify(frame.filename, cache)
+            if subsystem is not None:
+                break
+        if subsystem is None:
+            innermost = stat.traceback[-1].filename
+            subsystem = (
+                "python runtime"
+                if innermost.startswith((_STDLIB, "<"))
+                and "site-packages" not in innermost
+                else "other libraries"
+            )
+        sizes[subsystem] = sizes.get(subsystem, 0) + stat.size
+    return sizes
+
+
+def report() -> List[str]:
+    """Footprint report lines; the breakdown needs FOOTPRINT_TRACE"""
+    started = time.perf_counter()
+    rss, peak = rss_bytes()
+    set_gauge("memory.rss_mb", round(rss / 2**20, 1))
+    lines = [f"Memory: RSS {rss / 2**20:.1f} MB (peak {peak / 2**20:.1f} MB)"]
+
+    if tracemalloc.is_tracing():
+        snapshot = tracemalloc.take_snapshot()
+        snapshot = snapshot.filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        sizes = subsystem_sizes(snapshot)
+        traced = sum(sizes.values())
+        set_gauge("memory.traced_mb", round(traced / 2**20, 1))
+        lines.append(
+            f"  traced Python objects {traced / 2**20:.1f} MB, untraced "
+            f"(interpreter, C libraries, free lists) "
+            f"{max(0, rss - traced) / 2**20:.1f} MB"
+        )
+        for name, size in sorted(sizes.items(), key=lambda item: -item[1]):
+            set_gauge(f"memory.{name.replace(' ', '_')}_mb", round(size / 2**20, 2))
+            lines.append(
+                f"  {name:<16}{size / 2**20:8.1f} MB {size / max(rss, 1):5.0%}"
+            )
+    else:
+        lines.append("  (set FOOTPRINT_TRACE=true for the breakdown by subsystem)")
+
+    caches = []
+    for name, probe in _probes.items():
+        try:
+            caches.append(f"{name} {probe():g}")
+        except Exception as e:
+            caches.append(f"{name} ? ({e})")
+    if caches:
+        lines.append("  caches: " + ", ".join(caches))
+    lines.append(f"  (report took {(time.perf_counter() - started) * 1000:.0f} ms)")
+    return lines
+
+
+def render_report() -> str:
+    return "\n".join(report()) + "\n"
+
+
+def log_report() -> None:
+    for line in report():
+        logger.info(line)
+
+
+async def log_report_periodically(interval_seconds: int = FOOTPRINT_LOG_INTERVAL):
+    """Log the footprint every interval; meant to run as a background task"""
+    if interval_seconds <= 0:
+        return
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            # Snapshots of large heaps take a while: keep them off the loop
+            await asyncio.to_thread(log_report)
+        except Exception as e:
+            logger.error("Footprint report failed: %s", e)
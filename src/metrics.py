@@ -0,0 +1,212 @@
+"""
+In-process metrics for the bot
+Latency histograms and counters fed by timing spans on the hot path, exposed
+through a local Prometheus-style HTTP endpoint and a periodic summary log
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+# Set to 0 to disable the HTTP endpoint
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+METRICS_LOG_INTERVAL = int(os.getenv("METRICS_LOG_INTERVAL", "300"))
+
+# Upper bounds of the latency buckets, in milliseconds
+BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (milliseconds)"""
+
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return BUCKETS_MS[index] if index < len(BUCKETS_MS) else float("inf")
+        return float("inf")
+
+
+_histograms: Dict[str, Histogram] = {}
+_counters: Dict[str, int] = {}
+_gauges: Dict[str, float] = {}
+
+
+def observe(name: str, value_ms: float) -> None:
+    """Record a latency sample"""
+    histogram = _histograms.get(name)
+    if histogram is None:
+        histogram = _histograms[name] = Histogram()
+    histogram.observe(value_ms)
+
+
+def increment(name: str, amount: int = 1) -> None:
+    """Increase a counter"""
+    _counters[name] = _counters.get(name, 0) + amount
+
+
+def set_gauge(name: str, value: float) -> None:
+    """Record the current value of a level (queue depth, in-flight work...)"""
+    _gauges[name] = value
+
+
+@contextmanager
+def span(name: str):
+    """Time the enclosed block into the `name` histogram (works in async code too)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, (time.perf_counter() - started) * 1000)
+
+
+def snapshot() -> Dict[str, Dict]:
+    """Current counters and histogram summaries"""
+    return {
+        "counters": dict(_counters),
+        "gauges": dict(_gauges),
+        "histograms": {
+            name: {
+                "count": histogram.count,
+                "mean_ms": histogram.total / histogram.count if histogram.count else 0,
+                "p50_ms": histogram.quantile(0.50),
+                "p95_ms": histogram.quantile(0.95),
+                "p99_ms": histogram.quantile(0.99),
+            }
+            for name, histogram in _histograms.items()
+        },
+    }
+
+
+def render_prometheus() -> str:
+    """Metrics in the Prometheus text exposition format"""
+    lines: List[str] = []
+    for name, value in sorted(_counters.items()):
+        metric = _metric_name(name)
+        lines.append(f"# TYPE {metric}_total counter")
+        lines.append(f"{metric}_total {value}")
+    for name, value in sorted(_gauges.items()):
+        metric = _metric_name(name)
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {value}")
+    for name, histogram in sorted(_histograms.items()):
+        metric = _metric_name(name) + "_ms"
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS_MS, histogram.counts):
+            cumulative += bucket_count
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+        lines.append(f"{metric}_sum {histogram.total:.3f}")
+        lines.append(f"{metric}_count {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+def _metric_name(name: str) -> str:
+    return "discord_bot_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def summary_lines() -> List[str]:
+    lines = []
+    for name, stats in sorted(snapshot()["histograms"].items()):
+        lines.append(
+            f"{name}: n={stats['count']} mean={stats['mean_ms']:.1f}ms "
+            f"p50<={stats['p50_ms']}ms p95<={stats['p95_ms']}ms "
+            f"p99<={stats['p99_ms']}ms"
+        )
+    if _counters:
+        lines.append(
+            "counters: "
+            + ", ".join(f"{name}={value}" for name, value in sorted(_counters.items()))
+        )
+    if _gauges:
+        lines.append(
+            "gauges: "
+            + ", ".join(f"{name}={value}" for name, value in sorted(_gauges.items()))
+        )
+    return lines
+
+
+async def log_summary_periodically(interval_seconds: int = METRICS_LOG_INTERVAL):
+    """Log a metrics summary every interval; meant to run as a background task"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        for line in summary_lines():
+            logger.info(line)
+
+
+# Extra plain-text pages of the metrics endpoint: path -> render function
+# (run in a thread, they may be slow)
+_pages: Dict[str, Callable[[], str]] = {}
+
+
+def add_page(path: str, render: Callable[[], str]) -> None:
+    """Serve `render()` at `path` on the metrics endpoint"""
+    _pages[path] = render
+
+
+async def _handle_http(reader, writer):
+    try:
+        request_line = await reader.readline()
+        # Drain the headers, we don't need them
+        while (await reader.readline()).strip():
+            pass
+        path = (
+            request_line.split()[1].decode() if request_line.count(b" ") >= 2 else "/"
+        )
+        page = path.split("?")[0]
+        if path.startswith("/metrics"):
+            status, body = "200 OK", render_prometheus()
+        elif page in _pages:
+            status, body = "200 OK", await asyncio.to_thread(_pages[page])
+        else:
+            status, body = "404 Not Found", "not found\n"
+        payload = body.encode()
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            "Content-Type: text/plain; version=0.0.4\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "Connection: close\r\n\r\n".encode() + payload
+        )
+        await writer.drain()
+    except Exception as e:
+        logger.debug("Metrics request failed: %s", e)
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(
+    host: str = METRICS_HOST, port: int = METRICS_PORT
+) -> Optional[asyncio.AbstractServer]:
+    """Serve /metrics over HTTP on a local port (no-op if port is 0)"""
+    if not port:
+        return None
+    server = await asyncio.start_server(_handle_http, host, port)
+    logger.info("Metrics available at http://%s:%d/metrics", host, port)
+    return server
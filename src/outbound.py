@@ -0,0 +1,300 @@
+"""
+Outbound Discord writes
+Every send and edit goes through one scheduler: writes are queued per channel
+and paced by a local mirror of Discord's per-channel rate limit, so a busy
+channel waits in our queue (where newer edits of the same message replace
+older ones) instead of inside discord.py, and final answers go out before
+streaming updates and placeholders. Placeholders are only sent when the
+answer is not ready within a short grace period.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from .metrics import increment, observe, set_gauge, span
+
+logger = logging.getLogger(__name__)
+
+# Discord allows about 5 writes (sends and edits) per 5 seconds per channel
+OUTBOUND_CHANNEL_LIMIT = int(os.getenv("OUTBOUND_CHANNEL_LIMIT", "5"))
+OUTBOUND_CHANNEL_WINDOW = float(os.getenv("OUTBOUND_CHANNEL_WINDOW", "5"))
+# Seconds a placeholder waits; an answer ready by then replaces it unsent
+PLACEHOLDER_GRACE = float(os.getenv("PLACEHOLDER_GRACE", "0.8"))
+
+# Write priorities, most urgent first
+FINAL = 0
+UPDATE = 1
+PLACEHOLDER = 2
+
+# Idle channel buckets are dropped once this many are tracked
+_MAX_BUCKETS = 10000
+
+
+class RateBucket:
+    """
+    Local mirror of a Discord rate-limit bucket: at most `limit` writes in
+    any `window` seconds (a sliding window, never looser than Discord's)
+    """
+
+    __slots__ = ("limit", "window", "writes")
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self.writes: deque = deque()
+
+    def wait_time(self) -> float:
+        """Seconds until a write is allowed (0 if one is allowed now)"""
+        now = time.monotonic()
+        while self.writes and self.writes[0] <= now - self.window:
+            self.writes.popleft()
+        if len(self.writes) < self.limit:
+            return 0.0
+        return self.writes[0] + self.window - now
+
+    def record(self) -> None:
+        self.writes.append(time.monotonic())
+
+    def is_idle(self) -> bool:
+        return self.wait_time() == 0 and not self.writes
+
+
+class _Write:
+    """A pending send or edit of one outbound message"""
+
+    __slots__ = ("target", "priority", "seq", "queued", "not_before", "future")
+
+    def __init__(
+        self, target: "OutboundMessage", priority: int, seq: int, delay: float
+    ):
+        self.target = target
+        self.priority = priority
+        self.seq = seq
+        self.queued = time.monotonic()
+        self.not_before = self.queued + delay
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        # Failures are logged by the scheduler; streaming updates aren't awaited
+        self.future.add_done_callback(_consume_error)
+
+
+class OutboundMessage:
+    """
+    A bot message owned by the scheduler: sent on first write, edited after.
+
+    `update()` queues the new content; while a write of this message is still
+    queued, it only replaces the content that write will use.
+    """
+
+    def __init__(self, scheduler: "OutboundScheduler", channel):
+        self.scheduler = scheduler
+        self.channel = channel
+        self.message = None  # The discord.Message once sent
+        self.content = ""  # Latest requested content
+        self.written = None  # Content Discord has
+        self._pending: Optional[_Write] = None
+        self._last: Optional[asyncio.Future] = None
+
+    @property
+    def sent(self) -> bool:
+        return self.message is not None
+
+    def update(self, content: str, priority: int = UPDATE) -> asyncio.Future:
+        """Queue new content; the returned future resolves once it is written"""
+        self.content = content
+        return self.scheduler._submit(self, priority)
+
+    def discard(self) -> bool:
+        """
+        Drop the message if Discord hasn't seen it yet (its queued write is
+        cancelled); False once it is sent or being sent
+        """
+        if self.sent:
+            return False
+        if self._pending is None and self._last is not None and not self._last.done():
+            return False  # Being sent
+        if self._pending is not None:
+            self.scheduler._cancel(self._pending)
+        return True
+
+    async def wait(self):
+        """The discord.Message, once the latest write of it is done"""
+        if self._last is not None:
+            await self._last
+        return self.message
+
+
+class OutboundScheduler:
+    """
+    Per-channel write queues, each drained by a task pacing writes with a
+    mirror of the channel's rate-limit bucket.
+
+    Writes are ordered by priority then arrival. A message has at most one
+    queued write: an update arriving before it went out is merged into it
+    (counted in `outbound.writes_saved`), keeping the most urgent priority.
+    """
+
+    def __init__(
+        self,
+        limit: int = OUTBOUND_CHANNEL_LIMIT,
+        window: float = OUTBOUND_CHANNEL_WINDOW,
+        grace: float = PLACEHOLDER_GRACE,
+    ):
+        self.limit = limit
+        self.window = window
+        self.grace = grace
+        self._queues: Dict[int, List[_Write]] = {}
+        self._wakeups: Dict[int, asyncio.Event] = {}
+        self._drainers: Dict[int, asyncio.Task] = {}
+        self._buckets: Dict[int, RateBucket] = {}
+        self._seq = itertools.count()
+
+    def send(self, channel, content: str, priority: int = FINAL) -> asyncio.Future:
+        """Queue a new message; the future resolves to the discord.Message"""
+        return self.message(channel).update(content, priority)
+
+    def placeholder(self, channel, content: str) -> OutboundMessage:
+        """
+        A message shown only if nothing replaces it within the grace period:
+        updates made before then are sent in its place
+        """
+        outbound = self.message(channel)
+        outbound.content = content
+        self._submit(outbound, PLACEHOLDER, delay=self.grace)
+        return outbound
+
+    def message(self, channel) -> OutboundMessage:
+        """An unsent message of a channel, written by its first update"""
+        return OutboundMessage(self, channel)
+
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _submit(
+        self, target: OutboundMessage, priority: int, delay: float = 0.0
+    ) -> asyncio.Future:
+        write = target._pending
+        if write is not None:
+            # Not written yet: it will carry the latest content
+            increment("outbound.writes_saved")
+            if priority < write.priority:
+                if write.priority == PLACEHOLDER:
+                    # The answer arrived first: the placeholder is never shown
+                    increment("outbound.placeholders_skipped")
+                    write.not_before = 0.0
+                write.priority = priority
+                self._wake(target.channel.id)
+            return write.future
+
+        if target.sent and target.content == target.written:
+            done = asyncio.get_running_loop().create_future()
+            done.set_result(target.message)
+            return done
+
+        write = _Write(target, priority, next(self._seq), delay)
+        target._pending = write
+        target._last = write.future
+        channel_id = target.channel.id
+        self._queues.setdefault(channel_id, []).append(write)
+        self._wake(channel_id)
+        drainer = self._drainers.get(channel_id)
+        if drainer is None or drainer.done():
+            self._drainers[channel_id] = asyncio.create_task(self._drain(channel_id))
+        set_gauge("outbound.pending", self.pending())
+        return write.future
+
+    def _cancel(self, write: _Write) -> None:
+        channel_id = write.target.channel.id
+        self._queues.get(channel_id, []).remove(write)
+        write.target._pending = None
+        write.future.set_result(None)
+        increment("outbound.discarded")
+        self._wake(channel_id)
+        set_gauge("outbound.pending", self.pending())
+
+    def _wake(self, channel_id: int) -> None:
+        event = self._wakeups.get(channel_id)
+        if event is not None:
+            event.set()
+
+    def _bucket(self, channel_id: int) -> RateBucket:
+        bucket = self._buckets.get(channel_id)
+        if bucket is None:
+            if len(self._buckets) >= _MAX_BUCKETS:
+                self._buckets = {
+                    key: value
+                    for key, value in self._buckets.items()
+                    if not value.is_idle()
+                }
+            bucket = self._buckets[channel_id] = RateBucket(self.limit, self.window)
+        return bucket
+
+    async def _drain(self, channel_id: int) -> None:
+        queue = self._queues[channel_id]
+        wakeup = self._wakeups.setdefault(channel_id, asyncio.Event())
+        bucket = self._bucket(channel_id)
+        try:
+            while queue:
+                now = time.monotonic()
+                ready = [write for write in queue if write.not_before <= now]
+                if not ready:
+                    # Only placeholders still in their grace period
+                    wakeup.clear()
+                    delay = min(write.not_before for write in queue) - now
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                delay = bucket.wait_time()
+                if delay > 0:
+                    # Wait here rather than in discord.py: updates queued
+                    # meanwhile are merged, and the most urgent goes first
+                    await asyncio.sleep(delay)
+                    continue
+                write = min(ready, key=lambda w: (w.priority, w.seq))
+                queue.remove(write)
+                bucket.record()
+                await self._write(write)
+        finally:
+            if not queue:
+                self._queues.pop(channel_id, None)
+                self._wakeups.pop(channel_id, None)
+                self._drainers.pop(channel_id, None)
+            set_gauge("outbound.pending", self.pending())
+
+    async def _write(self, write: _Write) -> None:
+        target = write.target
+        # Later updates start a new write from here on
+        target._pending = None
+        # From when the write could go out (placeholders: end of the grace)
+        ready = max(write.queued, write.not_before)
+        observe("outbound.queue_delay", (time.monotonic() - ready) * 1000)
+        content = target.content
+        try:
+            if target.message is None:
+                with span("discord.send"):
+                    target.message = await target.channel.send(content)
+            else:
+                with span("discord.edit"):
+                    await target.message.edit(content=content)
+        except Exception as e:
+            logger.error("Discord write to channel %s failed: %s", target.channel.id, e)
+            increment("outbound.errors")
+            write.future.set_exception(e)
+            return
+        target.written = content
+        increment("outbound.writes")
+        write.future.set_result(target.message)
+
+
+def _consume_error(future: asyncio.Future) -> None:
+    """Placeholder failures are logged by the scheduler, nobody awaits them"""
+    if not future.cancelled():
+        future.exception()
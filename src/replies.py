@@ -0,0 +1,109 @@
+"""
+Progressive Discord replies
+Edits a placeholder message as streamed text arrives, debounced to stay within
+Discord's edit rate limits, rolling over into follow-up messages past 2000 chars;
+writes go through the outbound scheduler
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from typing import List
+
+from .outbound import FINAL, UPDATE, OutboundMessage
+
+DISCORD_MESSAGE_LIMIT = 2000
+
+# Minimum delay between two edits of the reply (Discord allows ~5 edits / 5s
+# per channel, this leaves headroom for other turns in the same channel)
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.5"))
+
+
+def split_message(text: str, limit: int = DISCORD_MESSAGE_LIMIT) -> List[str]:
+    """
+    Split text into Discord-sized pages, preferring line then word boundaries.
+
+    Splitting only depends on the text before each boundary, so pages stay
+    stable as more text is appended.
+    """
+    pages = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = text.rfind(" ", 0, limit)
+        if cut <= 0:
+            cut = limit
+        pages.append(text[:cut])
+        text = text[cut:].lstrip("\n ")
+    pages.append(text)
+    return pages
+
+
+class ProgressiveReply:
+    """Reply that grows in place as the agent streams its answer"""
+
+    def __init__(
+        self, placeholder: OutboundMessage, interval: float = STREAM_EDIT_INTERVAL
+    ):
+        self.channel = placeholder.channel
+        self.outbound = placeholder.scheduler
+        self.messages = [placeholder]
+        self.interval = interval
+        self.text = ""
+        self._last_flush = 0.0
+        self._pending_flush = None
+
+    async def feed(self, chunk: str) -> None:
+        """Append streamed text, scheduling a debounced edit"""
+        self.text += chunk
+        if self._pending_flush is None or self._pending_flush.done():
+            delay = max(0.0, self._last_flush + self.interval - time.monotonic())
+            self._pending_flush = asyncio.create_task(self._flush_after(delay))
+
+    async def finish(self, fallback: str = "") -> None:
+        """Write the final text, or the fallback if nothing was streamed"""
+        if self._pending_flush is not None:
+            self._pending_flush.cancel()
+        if not self.text.strip():
+            self.text = fallback
+        await asyncio.gather(*self._flush(FINAL))
+
+    async def stop(self, note: str, keep_text: bool = True, quiet: bool = False):
+        """
+        End a reply cut short with a note, after the streamed text if
+        `keep_text`. When `quiet`, a reply nobody has seen yet is dropped
+        instead.
+        """
+        if self._pending_flush is not None:
+            self._pending_flush.cancel()
+        if keep_text and self.text.strip():
+            self.text += f"\n\n{note}"
+        else:
+            if quiet:
+                shown = [message for message in self.messages if not message.discard()]
+                if not shown:
+                    return
+                self.messages = shown
+            self.text = note
+        await asyncio.gather(*self._flush(FINAL))
+
+    async def _flush_after(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._flush(UPDATE)
+
+    def _flush(self, priority: int) -> List[asyncio.Future]:
+        """
+        Queue the current pages; updates still waiting in the outbound queue
+        are replaced rather than written twice
+        """
+        writes = []
+        for index, page in enumerate(split_message(self.text)):
+            if not page:
+                continue
+            if index == len(self.messages):
+                self.messages.append(self.outbound.message(self.channel))
+            writes.append(self.messages[index].update(page, priority))
+        self._last_flush = time.monotonic()
+        return writes
@@ -0,0 +1,63 @@
+"""
+Startup timing
+Records how long each startup phase takes (module imports, agent construction)
+and when milestones are reached (on_ready, agent ready, first answer), relative
+to the moment the bot module started loading, so cold-start regressions show
+up in the logs and as `startup.*` gauges
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+from .metrics import set_gauge
+
+logger = logging.getLogger(__name__)
+
+# Reference point: import of this module, the first thing src.bot does
+STARTED = time.perf_counter()
+
+_phases: Dict[str, float] = {}
+_milestones: Dict[str, float] = {}
+
+
+def _since_start() -> float:
+    return (time.perf_counter() - STARTED) * 1000
+
+
+@contextmanager
+def phase(name: str):
+    """
+    Time the enclosed block (an import, a constructor...) as a startup phase;
+    only the first run of a phase is kept
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        if name not in _phases:
+            _phases[name] = elapsed
+            set_gauge(f"startup.{name}_ms", round(elapsed, 1))
+
+
+def mark(name: str) -> bool:
+    """Record a milestone the first time it is reached; returns whether it was"""
+    if name in _milestones:
+        return False
+    _milestones[name] = _since_start()
+    set_gauge(f"startup.{name}_ms", round(_milestones[name], 1))
+    return True
+
+
+def report_lines() -> List[str]:
+    lines = [f"{name}: {ms:.0f} ms" for name, ms in _phases.items()]
+    lines += [f"{name} at +{ms:.0f} ms" for name, ms in _milestones.items()]
+    return lines
+
+
+def log_report(reason: str) -> None:
+    logger.info("Startup (%s): %s", reason, ", ".join(report_lines()))
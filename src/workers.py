@@ -0,0 +1,385 @@
+"""
+Agent worker processes
+Runs DiscordAdvisoryAgent turns in a pool of worker processes so the gateway
+process only handles Discord events. Jobs are routed by a hash of the user ID
+(each user's session lives in one worker), streamed text comes back to the
+gateway for sending, and tools that need Discord state are executed by the
+gateway on the workers' behalf.
+
+Workers are started by WorkerPool as `python -m src.workers` and connect back
+over a local socket (multiprocessing.connection).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import importlib
+import inspect
+import itertools
+import logging
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from multiprocessing.connection import Client, Listener
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from .agent.deadline import deadline_scope, time_left, tool_time_left
+from .event_loop import LoopLagMonitor, blocking_executor
+from .metrics import increment, observe
+
+logger = logging.getLogger(__name__)
+
+# Number of agent worker processes (0 runs turns in the gateway process)
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "0"))
+# Seconds between liveness checks while waiting on a worker
+WORKER_POLL_INTERVAL = 1.0
+# Seconds to wait for a worker to connect after starting it
+WORKER_START_TIMEOUT = 60.0
+
+
+def _time_left() -> tuple:
+    """The current turn's deadlines, sent along with jobs and tool calls"""
+    return (time_left(), tool_time_left())
+
+
+def worker_for(user_id: str, count: int) -> int:
+    """Index of the worker owning a user's session (stable across restarts)"""
+    return zlib.crc32(user_id.encode()) % count
+
+
+def worker_store_path(path: str, index: int, count: int) -> str:
+    """
+    Session database of one worker. Each worker only holds the users routed
+    to it, so its cleanup never deletes or unloads another worker's sessions;
+    the pool size is part of the name since it decides the routing.
+    """
+    if not path:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.worker{index}-of-{count}{ext}"
+
+
+class _Worker:
+    """Gateway-side handle on one worker process"""
+
+    def __init__(self, index: int, process: subprocess.Popen, connection):
+        self.index = index
+        self.process = process
+        self.connection = connection
+        self._send_lock = threading.Lock()
+
+    def send(self, message: tuple) -> None:
+        with self._send_lock:
+            self.connection.send(message)
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+
+class WorkerPool:
+    """
+    Pool of agent worker processes.
+
+    `stream_advice(user_id, message)` has the same shape as
+    DiscordAdvisoryAgent.stream_advice. Tools passed as `gateway_tools` run
+    in this process when a worker's agent calls them (they need the Discord
+    client, the message archive...); the others run in the worker.
+    """
+
+    def __init__(
+        self,
+        count: int,
+        gateway_tools: Optional[List[Callable]] = None,
+        setup: Optional[str] = None,
+    ):
+        self.count = count
+        self.setup = setup
+        self._tools = {tool.__name__: tool for tool in gateway_tools or []}
+        self._workers: List[Optional[_Worker]] = [None] * count
+        self._jobs: Dict[int, asyncio.Queue] = {}
+        self._job_ids = itertools.count()
+        self._authkey = secrets.token_bytes(16)
+        self._listener = None
+        self._loop = None
+        self._spawn_lock = None
+        self._closing = False
+
+    async def start(self) -> None:
+        """Start every worker and wait until they are connected"""
+        self._loop = asyncio.get_running_loop()
+        self._spawn_lock = asyncio.Lock()
+        self._listener = Listener(authkey=self._authkey)
+        started = time.perf_counter()
+        for index in range(self.count):
+            await self._spawn(index)
+        logger.info(
+            "Started %d agent workers in %.1fs",
+            self.count,
+            time.perf_counter() - started,
+        )
+
+    async def _spawn(self, index: int) -> _Worker:
+        async with self._spawn_lock:
+            worker = self._workers[index]
+            if worker is not None and worker.alive():
+                return worker
+            env = dict(
+                os.environ,
+                WORKER_AUTHKEY=self._authkey.hex(),
+                # Same default as src/agent/agent.py
+                SESSION_STORE_PATH=worker_store_path(
+                    os.getenv("SESSION_STORE_PATH", "data/sessions.db"),
+                    index,
+                    self.count,
+                ),
+            )
+            command = [sys.executable, "-m", "src.workers", str(index)]
+            command.append(str(self._listener.address))
+            if self.setup:
+                command.append(self.setup)
+            process = subprocess.Popen(command, env=env)
+            connection = await asyncio.wait_for(
+                self._loop.run_in_executor(None, self._listener.accept),
+                WORKER_START_TIMEOUT,
+            )
+            connection.send(sorted(self._tools))
+            worker = self._workers[index] = _Worker(index, process, connection)
+            threading.Thread(
+                target=self._read, args=(worker,), daemon=True, name=f"worker-{index}"
+            ).start()
+            increment("workers.started")
+            return worker
+
+    def _read(self, worker: _Worker) -> None:
+        """Reader thread: hand everything a worker sends to the event loop"""
+        while True:
+            try:
+                message = worker.connection.recv()
+            except (EOFError, OSError):
+                break
+            self._loop.call_soon_threadsafe(self._dispatch, worker, message)
+        # Fail the jobs still waiting on this worker
+        self._loop.call_soon_threadsafe(self._worker_lost, worker)
+
+    def _dispatch(self, worker: _Worker, message: tuple) -> None:
+        kind = message[0]
+        if kind == "tool":
+            asyncio.create_task(self._run_tool(worker, *message[1:]))
+            return
+        queue = self._jobs.get(message[1])
+        if queue is not None:
+            queue.put_nowait((kind, message[2]))
+
+    def _worker_lost(self, worker: _Worker) -> None:
+        if self._workers[worker.index] is worker and not self._closing:
+            logger.error("Agent worker %d exited", worker.index)
+            increment("workers.lost")
+
+    async def _run_tool(
+        self, worker: _Worker, call_id: int, name: str, kwargs, time_left
+    ):
+        started = time.perf_counter()
+        tool = self._tools[name]
+        try:
+            if inspect.iscoroutinefunction(tool):
+                # Under the deadline of the worker's turn
+                with deadline_scope(*time_left):
+                    result = await tool(**kwargs)
+            else:
+                result = await self._loop.run_in_executor(
+                    blocking_executor(), functools.partial(tool, **kwargs)
+                )
+            reply = ("tool_result", call_id, True, result)
+        except Exception as e:
+            logger.exception("Gateway tool %s failed", name)
+            reply = ("tool_result", call_id, False, str(e))
+        observe("workers.tool_call", (time.perf_counter() - started) * 1000)
+        try:
+            worker.send(reply)
+        except OSError:
+            pass  # The worker is gone, its job fails on its own
+
+    async def stream_advice(self, user_id: str, message: str) -> AsyncIterator[str]:
+        """Run a turn on the user's worker, yielding the streamed text"""
+        index = worker_for(user_id, self.count)
+        worker = self._workers[index]
+        if worker is None or not worker.alive():
+            logger.warning("Restarting agent worker %d", index)
+            worker = await self._spawn(index)
+
+        job_id = next(self._job_ids)
+        queue = self._jobs[job_id] = asyncio.Queue()
+        finished = False
+        try:
+            worker.send(("job", job_id, user_id, message, _time_left()))
+            while True:
+                try:
+                    kind, payload = await asyncio.wait_for(
+                        queue.get(), WORKER_POLL_INTERVAL
+                    )
+                except asyncio.TimeoutError:
+                    if not worker.alive():
+                        raise RuntimeError(f"Agent worker {index} exited")
+                    continue
+                if kind == "chunk":
+                    yield payload
+                elif kind == "done":
+                    finished = True
+                    return
+                else:
+                    finished = True
+                    raise RuntimeError(payload)
+        finally:
+            del self._jobs[job_id]
+            if not finished and worker.alive():
+                # The caller gave up on the turn
+                try:
+                    worker.send(("cancel", job_id))
+                except OSError:
+                    pass
+
+    def close(self) -> None:
+        """Stop the workers"""
+        self._closing = True
+        for worker in self._workers:
+            if worker is None:
+                continue
+            try:
+                worker.send(("stop",))
+            except OSError:
+                pass
+        for worker in self._workers:
+            if worker is None:
+                continue
+            try:
+                worker.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                worker.process.kill()
+        if self._listener is not None:
+            self._listener.close()
+
+
+# ----------------------------------------------------------------------
+# Worker process
+# ----------------------------------------------------------------------
+
+
+async def _serve(index: int, connection, setup: Optional[str]) -> None:
+    from .agent.agent import advisory_agent, discord_agent, preload
+
+    preload()
+
+    if setup:
+        module, _, function = setup.partition(":")
+        getattr(importlib.import_module(module), function)()
+
+    loop = asyncio.get_running_loop()
+    proxied = set(connection.recv())
+    pending_calls: Dict[int, asyncio.Future] = {}
+    call_ids = itertools.count()
+    jobs: Dict[int, asyncio.Task] = {}
+    send_lock = threading.Lock()
+
+    def send(message: tuple) -> None:
+        with send_lock:
+            connection.send(message)
+
+    def gateway_tool(tool):
+        """Stand-in running `tool` in the gateway, same signature for ADK"""
+        signature = inspect.signature(tool)
+
+        @functools.wraps(tool)
+        async def call(*args, **kwargs):
+            call_id = next(call_ids)
+            future = pending_calls[call_id] = loop.create_future()
+            arguments = dict(signature.bind(*args, **kwargs).arguments)
+            send(("tool", call_id, tool.__name__, arguments, _time_left()))
+            try:
+                ok, result = await future
+            finally:
+                pending_calls.pop(call_id, None)
+            if not ok:
+                raise RuntimeError(result)
+            return result
+
+        return call
+
+    advisory_agent.tools = [
+        gateway_tool(tool) if getattr(tool, "__name__", "") in proxied else tool
+        for tool in advisory_agent.tools
+    ]
+
+    async def run_job(job_id: int, user_id: str, message: str, left) -> None:
+        try:
+            with deadline_scope(*left):
+                async for chunk in discord_agent.stream_advice(user_id, message):
+                    send(("chunk", job_id, chunk))
+            send(("done", job_id, None))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.exception("Worker %d job failed", index)
+            send(("error", job_id, str(e)))
+        finally:
+            jobs.pop(job_id, None)
+
+    cleanup = asyncio.create_task(discord_agent.run_session_cleanup())
+    lag_monitor = asyncio.create_task(LoopLagMonitor().run())
+    stopped = asyncio.Event()
+
+    def handle(message: tuple) -> None:
+        kind = message[0]
+        if kind == "job":
+            _, job_id, user_id, text, left = message
+            jobs[job_id] = asyncio.create_task(run_job(job_id, user_id, text, left))
+        elif kind == "tool_result":
+            future = pending_calls.get(message[1])
+            if future is not None and not future.done():
+                future.set_result((message[2], message[3]))
+        elif kind == "cancel":
+            task = jobs.get(message[1])
+            if task is not None:
+                task.cancel()
+        elif kind == "stop":
+            stopped.set()
+
+    def read() -> None:
+        while True:
+            try:
+                message = connection.recv()
+            except (EOFError, OSError):
+                break
+            loop.call_soon_threadsafe(handle, message)
+        # The gateway is gone
+        loop.call_soon_threadsafe(stopped.set)
+
+    threading.Thread(target=read, daemon=True, name="gateway-reader").start()
+    await stopped.wait()
+    cleanup.cancel()
+    lag_monitor.cancel()
+    for task in list(jobs.values()):
+        task.cancel()
+
+
+def main() -> None:
+    index = int(sys.argv[1])
+    address = sys.argv[2]
+    setup = sys.argv[3] if len(sys.argv) > 3 else None
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format=f"%(asctime)s %(levelname)s worker-{index} %(name)s: %(message)s",
+    )
+    connection = Client(address, authkey=bytes.fromhex(os.environ["WORKER_AUTHKEY"]))
+    try:
+        asyncio.run(_serve(index, connection, setup))
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
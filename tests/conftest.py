@@ -0,0 +1,12 @@
+"""
+Test environment: set before the modules under test read their settings
+at import time
+"""
+
+import os
+import tempfile
+
+_data = tempfile.mkdtemp(prefix="bot-tests-")
+os.environ["SESSION_STORE_PATH"] = os.path.join(_data, "sessions.db")
+os.environ["MESSAGE_ARCHIVE_PATH"] = ""
+os.environ.setdefault("LOG_LEVEL", "ERROR")
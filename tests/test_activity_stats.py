@@ -0,0 +1,61 @@
+"""Activity statistics tool"""
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from src.agent.tools import tools
+from src.agent.tools.archive import MessageArchive
+
+_channel = SimpleNamespace(id=10, name="general")
+_alice = SimpleNamespace(id=1, display_name="alice", bot=False)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = MessageArchive(str(tmp_path / "messages.db"))
+    now = datetime.now(timezone.utc)
+    for day in range(90):
+        archive.ingest(
+            SimpleNamespace(
+                id=day + 1,
+                channel=_channel,
+                guild=None,
+                author=_alice,
+                content=f"message du jour {day}",
+                created_at=now - timedelta(days=day),
+            )
+        )
+    tools.set_message_archive(archive)
+    yield archive
+    tools.set_message_archive(None)
+    archive.close()
+
+
+def _periods(result):
+    return [line for line in result.splitlines()[1:] if ": " in line]
+
+
+def test_huge_window_is_clamped_to_the_archive(archive):
+    result = tools.get_activity_stats("timeline", hours_back=10**9, limit=100)
+    assert result.startswith("📈 Messages par jour")
+    assert "archive locale depuis" in result
+    assert "total 90" in result
+    result = tools.get_activity_stats("top_users", hours_back=10**9)
+    assert "alice: 90" in result
+
+
+def test_timeline_fits_in_limit(archive):
+    result = tools.get_activity_stats("timeline", hours_back=24 * 7)
+    assert result.startswith("📈 Messages par jour")
+    assert 7 <= len(_periods(result)) <= 8
+
+    result = tools.get_activity_stats("timeline", hours_back=24 * 50)
+    assert result.startswith("📈 Messages par semaine")
+    assert len(_periods(result)) <= 10
+
+    result = tools.get_activity_stats("timeline", hours_back=24 * 90, limit=2)
+    assert result.startswith("📈 Messages par mois")
+    assert len(_periods(result)) == 2
+    assert "plus anciennes omises" in result
@@ -0,0 +1,96 @@
+"""Agent turns against the SQLite session store"""
+
+import asyncio
+import importlib
+
+import pytest
+
+from benchmarks.fakes import ScriptedLlm
+
+
+@pytest.fixture(scope="module")
+def agent_module():
+    # Imported on a worker thread, as the bot does while the gateway connects
+    module = asyncio.run(asyncio.to_thread(importlib.import_module, "src.agent.agent"))
+    module.advisory_agent.model = ScriptedLlm(
+        model="scripted", first_token_latency=0.0, chunk_latency=0.0
+    )
+    return module
+
+
+def _ask(agent, user_id, message):
+    async def turn():
+        return "".join([chunk async for chunk in agent.stream_advice(user_id, message)])
+
+    return asyncio.run(turn())
+
+
+def test_turn_uses_store_built_on_another_thread(agent_module):
+    agent = agent_module.DiscordAdvisoryAgent()
+    assert agent_module.SESSION_STORE_PATH
+    reply = _ask(agent, "store-user", "donne moi un conseil pour le sport")
+    assert reply
+    assert "session" not in reply.lower()
+
+    # The turn was written to the store, and a fresh agent resumes it
+    resumed = agent_module.DiscordAdvisoryAgent()
+    reply = _ask(resumed, "store-user", "et pour les maths ?")
+    assert "session" not in reply.lower()
+    assert resumed.sessions.has_history("store-user")
+
+
+def test_persisted_history_keeps_answers_private(agent_module):
+    from src.agent.cache import ResponseCache, normalize_prompt
+
+    prompt = "donne moi un conseil pour la physique"
+    _ask(agent_module.DiscordAdvisoryAgent(), "known-user", "salut, moi c'est Alex")
+
+    # After a restart the history is on disk only, not in the session table
+    agent = agent_module.DiscordAdvisoryAgent()
+    agent.response_cache = ResponseCache(100, 600)
+    _ask(agent, "known-user", prompt)
+    version = agent.sessions.history_version("known-user")
+    assert agent.response_cache.get((normalize_prompt(prompt), "known-user", version))
+    assert agent.response_cache.get((normalize_prompt(prompt), None)) is None
+
+    # A user without history still shares answers to context-free prompts
+    _ask(agent, "new-user", prompt)
+    assert agent.response_cache.get((normalize_prompt(prompt), None))
+
+
+def _stored_texts(agent, user_id):
+    session = asyncio.run(
+        agent.runner.session_service.get_session(
+            app_name=agent.runner.app_name, user_id=user_id, session_id=user_id
+        )
+    )
+    return [
+        part.text
+        for event in session.events
+        if event.content
+        for part in event.content.parts
+        if part.text
+    ]
+
+
+def test_cached_answers_follow_the_conversation(agent_module):
+    from src.agent.cache import ResponseCache
+
+    model = agent_module.advisory_agent.model
+    agent = agent_module.DiscordAdvisoryAgent()
+    agent.response_cache = ResponseCache(100, 600)
+    prompt = "donne moi un conseil pour la chimie"
+    _ask(agent, "chatty-user", "salut, moi c'est Sam")
+    answer = _ask(agent, "chatty-user", prompt)
+
+    # Asked again right away: served from the cache, and kept in the session
+    calls = model.calls
+    assert _ask(agent, "chatty-user", prompt) == answer
+    assert model.calls == calls
+    assert _stored_texts(agent, "chatty-user")[-2:] == [prompt, answer]
+
+    # Once the conversation moved on, the question goes to the model again
+    _ask(agent, "chatty-user", "et pour la biologie ?")
+    calls = model.calls
+    _ask(agent, "chatty-user", prompt)
+    assert model.calls > calls
@@ -0,0 +1,114 @@
+"""Local message archive"""
+
+import asyncio
+import itertools
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from src.agent.tools.activity import hour_of
+from src.agent.tools import archive as archive_module
+from src.agent.tools.archive import MessageArchive
+
+_ids = itertools.count(1)
+_channel = SimpleNamespace(id=10, name="general")
+_alice = SimpleNamespace(id=1, display_name="alice", bot=False)
+_bot = SimpleNamespace(id=2, display_name="advisor", bot=True)
+
+
+def _message(author, content, created_at=None):
+    return SimpleNamespace(
+        id=next(_ids),
+        channel=_channel,
+        guild=None,
+        author=author,
+        content=content,
+        created_at=created_at or datetime.now(timezone.utc),
+    )
+
+
+def _user_totals(archive):
+    end = hour_of(time.time()) + 1
+    return archive.activity.totals_by_user(end - 24, end)
+
+
+def test_bot_messages_are_not_counted_as_activity(tmp_path):
+    archive = MessageArchive(str(tmp_path / "messages.db"))
+    archive.ingest(_message(_alice, "bonjour"))
+    archive.ingest(_message(_bot, "Salut alice !"))
+    archive.ingest(_message(_bot, "Salut alice ! Comment"))
+    assert _user_totals(archive) == {1: 1}
+
+
+def test_bot_rows_archived_earlier_are_dropped(tmp_path):
+    path = str(tmp_path / "messages.db")
+    archive = MessageArchive(path)
+    archive.ingest(_message(_alice, "bonjour"))
+    # As archived by an earlier version, before bots were skipped
+    archive.conn.execute(
+        "INSERT INTO activity VALUES (?, ?, ?, 5)",
+        (_bot.id, _channel.id, hour_of(time.time())),
+    )
+    archive.conn.commit()
+    archive.close()
+
+    reopened = MessageArchive(path)
+    assert set(_user_totals(reopened)) == {1, 2}
+    reopened.ingest(_message(_bot, "Salut"))
+    assert _user_totals(reopened) == {1: 1}
+
+
+def _topic_hits(archive, query):
+    return {message_id for message_id, _ in archive.search_semantic(query)}
+
+
+def test_edits_rewrite_the_semantic_row(tmp_path):
+    archive = MessageArchive(str(tmp_path / "messages.db"))
+    message = _message(_alice, "revisions du partiel de physique")
+    archive.ingest(message)
+    rows = len(archive.semantic)
+
+    for content in ("recette de gateau au chocolat", "recette de crepes"):
+        archive.update_content(message.id, content)
+    assert len(archive.semantic) == rows
+    assert message.id not in _topic_hits(archive, "partiel de physique")
+    assert message.id in _topic_hits(archive, "recette de crepes")
+
+    archive.delete(message.id)
+    assert message.id not in _topic_hits(archive, "recette de crepes")
+
+
+def test_streamed_bot_replies_leave_the_index_alone(tmp_path):
+    archive = MessageArchive(str(tmp_path / "messages.db"))
+    reply = _message(_bot, "Voici")
+    archive.ingest(reply)
+    for length in range(1, 20):
+        archive.update_content(reply.id, "Voici mes conseils " * length)
+    assert len(archive.semantic) == 0
+
+
+def test_semantic_index_is_built_in_the_background(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive_module, "_EMBED_BATCH", 10)
+    path = str(tmp_path / "messages.db")
+    archive = MessageArchive(path)
+    messages = [_message(_alice, f"message numero {n} sur le sport") for n in range(50)]
+    for message in messages:
+        archive.ingest(message)
+    archive.close()
+    for suffix in ("vec256", "vec256.meta"):
+        (tmp_path / f"messages.{suffix}").unlink()
+
+    reopened = MessageArchive(path)
+    assert len(reopened.semantic) == 0  # Nothing embedded at startup
+
+    async def build_while_ingesting():
+        build = asyncio.create_task(reopened.build_semantic())
+        await asyncio.sleep(0.01)  # Changes while batches are being embedded
+        reopened.ingest(_message(_alice, "le match de foot de ce soir"))
+        reopened.update_content(messages[0].id, "le tournoi de tennis")
+        await build
+
+    asyncio.run(build_while_ingesting())
+    assert len(reopened.semantic) == 51
+    assert messages[0].id in _topic_hits(reopened, "tournoi de tennis")
+    assert _topic_hits(reopened, "match de foot")
@@ -0,0 +1,59 @@
+"""Mention coalescing"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from src.coalesce import MentionCoalescer
+
+
+def _turns(coalescer, mentions):
+    """Send (delay, text) mentions, return the (start time, text) of each turn"""
+
+    async def scenario():
+        started = time.monotonic()
+        turns = []
+
+        async def mention(message_id, text):
+            burst = coalescer.add("key", SimpleNamespace(id=message_id), text)
+            if burst is None:
+                return
+            async with coalescer.turn("key", burst):
+                turns.append((time.monotonic() - started, burst.text))
+                await asyncio.sleep(0.4)
+                assert burst.stop_reason is None
+
+        tasks = []
+        for message_id, (delay, text) in enumerate(mentions):
+            await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(mention(message_id, text)))
+        await asyncio.gather(*tasks)
+        return turns
+
+    return asyncio.run(scenario())
+
+
+def test_split_question_is_one_turn():
+    coalescer = MentionCoalescer(window=0.2, max_wait=2)
+    [(started_at, text)] = _turns(
+        coalescer, [(0, "qu'a dit Momo"), (0.1, "hier soir ?")]
+    )
+    assert text == "qu'a dit Momo\nhier soir ?"
+    assert 0.3 <= started_at < 0.4
+
+
+def test_no_window_answers_at_once():
+    coalescer = MentionCoalescer(window=0, max_wait=2)
+    [(started_at, text)] = _turns(coalescer, [(0, "salut")])
+    assert text == "salut" and started_at < 0.1
+
+
+def test_mentions_queue_behind_the_running_turn():
+    coalescer = MentionCoalescer(window=0.2, max_wait=2)
+    (first_at, first), (second_at, second) = _turns(
+        coalescer, [(0, "a"), (0.3, "b"), (0.05, "c")]
+    )
+    # The re-asks don't cancel the running turn and are answered together by
+    # the next one
+    assert first == "a" and 0.2 <= first_at < 0.3
+    assert second == "b\nc" and second_at >= 0.6
@@ -0,0 +1,42 @@
+"""Conversation history compaction"""
+
+from google.genai import types
+
+from src.agent import compaction
+from src.agent.compaction import compact_contents, content_tokens
+
+
+def _conversation(turns: int):
+    contents = []
+    for index in range(turns):
+        contents.append(
+            types.Content(
+                role="user",
+                parts=[types.Part(text=f"question {index} " + "detail " * 15)],
+            )
+        )
+        contents.append(
+            types.Content(
+                role="model", parts=[types.Part(text=f"answer {index} " + "x" * 400)]
+            )
+        )
+    return contents
+
+
+def test_long_session_fits_budget_after_compaction():
+    contents, saved = compact_contents(_conversation(2000), budget=6000)
+    assert saved > 0
+    assert sum(content_tokens(content) for content in contents) <= 6000
+
+
+def test_summary_is_capped():
+    contents, _ = compact_contents(_conversation(2000), budget=6000)
+    summary = contents[0].parts[0].text
+    assert "2000" not in summary  # Count of dropped turns, not the total
+    assert summary.count("\n- ") == compaction.SUMMARY_MAX_QUESTIONS
+    assert "question 1999" in contents[-2].parts[0].text
+
+
+def test_short_session_is_untouched():
+    contents = _conversation(3)
+    assert compact_contents(contents, budget=6000) == (contents, 0)
@@ -0,0 +1,59 @@
+"""Low-memory mode"""
+
+import json
+import os
+import subprocess
+import sys
+
+from src.footprint import LOW_MEMORY_DEFAULTS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loads .env the way src/bot.py does, then prints the settings LOW_MEMORY covers
+_PROBE = """
+import json, os
+from dotenv import load_dotenv
+load_dotenv()
+from src import footprint
+footprint.apply_low_memory_defaults()
+print(json.dumps({name: os.environ.get(name) for name in footprint.LOW_MEMORY_DEFAULTS}))
+"""
+
+
+def _settings_from_env_file(tmp_path, edit):
+    with open(os.path.join(ROOT, ".env.template")) as f:
+        template = f.read()
+    (tmp_path / ".env").write_text(edit(template))
+    env = {
+        name: value
+        for name, value in os.environ.items()
+        if name not in LOW_MEMORY_DEFAULTS and name != "LOW_MEMORY"
+    }
+    env["PYTHONPATH"] = ROOT
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def test_template_with_low_memory_gets_reduced_sizes(tmp_path):
+    settings = _settings_from_env_file(
+        tmp_path, lambda text: text.replace("LOW_MEMORY=false", "LOW_MEMORY=true")
+    )
+    assert settings == LOW_MEMORY_DEFAULTS
+
+
+def test_uncommented_template_setting_wins(tmp_path):
+    settings = _settings_from_env_file(
+        tmp_path,
+        lambda text: text.replace("LOW_MEMORY=false", "LOW_MEMORY=true").replace(
+            "# SESSION_HOT_SET=200", "SESSION_HOT_SET=200"
+        ),
+    )
+    assert settings["SESSION_HOT_SET"] == "200"
+    assert settings["BLOCKING_THREADS"] == LOW_MEMORY_DEFAULTS["BLOCKING_THREADS"]
@@ -0,0 +1,81 @@
+"""Concurrent history scan: slice boundaries"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import discord
+
+from src.agent.tools import scan
+
+
+def _message(at: datetime, low: bool = True) -> dict:
+    return {
+        "message_id": discord.utils.time_snowflake(at, high=not low),
+        "timestamp": at,
+        "author": "a",
+        "content": at.isoformat(),
+    }
+
+
+def _slice_fetch(messages):
+    """fetch() over `messages` with channel.history's exclusive bounds"""
+
+    async def fetch(channel, user_ids, after, limit, before=None):
+        return [
+            message
+            for message in messages
+            if after.id < message["message_id"] < before.id
+        ]
+
+    return fetch
+
+
+def _grid_window():
+    """A 48 h window ending now with a slice boundary strictly inside it"""
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    step = scan.SCAN_SLICE_HOURS * 3600
+    boundary = (int(now.timestamp()) // step) * step
+    if now.timestamp() - boundary < 1:
+        boundary -= step
+    return (
+        now - timedelta(hours=48),
+        now,
+        datetime.fromtimestamp(boundary, tz=timezone.utc),
+    )
+
+
+def test_boundary_message_is_in_exactly_one_slice():
+    start, end, boundary = _grid_window()
+    slices = scan.split_window(start, end)
+    assert len(slices) > 1
+    for low in (True, False):  # First and last snowflake of the boundary ms
+        message_id = _message(boundary, low)["message_id"]
+        covering = [s for s in slices if s[0].id < message_id < s[1].id]
+        assert len(covering) == 1
+
+
+def test_window_bounds_are_included():
+    start, end, _ = _grid_window()
+    slices = scan.split_window(start, end)
+    for at in (start, end):
+        for low in (True, False):
+            message_id = _message(at, low)["message_id"]
+            assert any(s[0].id < message_id < s[1].id for s in slices)
+
+
+def test_scan_returns_message_on_slice_boundary():
+    start, end, boundary = _grid_window()
+    messages = [
+        _message(boundary),
+        _message(boundary - timedelta(hours=1)),
+        _message(boundary + timedelta(hours=1)),
+    ]
+    found = asyncio.run(
+        scan.scan_channels(
+            [SimpleNamespace(id=1)], _slice_fetch(messages), [1], start, limit=10
+        )
+    )
+    assert [m["timestamp"] for m in found] == sorted(
+        (m["timestamp"] for m in messages), reverse=True
+    )